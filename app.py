@@ -1,11 +1,23 @@
 import os
+import time
 import streamlit as st
 from dotenv import load_dotenv
-from map import map_url
+from map import map_url, build_map_payload, render_multi_site_map
 from crawl import parse_crawl_results
+from manifest import sync_markdown
+from result_viewer import ResultIndex, render_result_browser, render_export_panel
+from export import RecordSpool
+from corpus import get_corpus
+from page_analysis import annotate_index
+from url_canon import dedup_urls
+from pipeline import map_and_scrape
 from async_utils import AsyncFirecrawlClient
 import asyncio
 from batch_scrape import batch_scrape
+from job_manager import get_job_manager
+from job_panel import follow_job_documents, render_jobs_panel, select_job
+from metrics import start_metrics_server
+from metrics_panel import render_metrics_panel
 
 # 加载环境变量
 load_dotenv()
@@ -16,8 +28,18 @@ API_KEY = os.getenv('FIRECRAWL_API_KEY')
 st.set_page_config(page_title="Firecrawl工具集", layout="wide")
 st.title("Firecrawl工具集")
 
+# 后台任务管理器, 在独立线程中轮询所有已提交的任务
+job_manager = get_job_manager(API_URL, API_KEY)
+# 设置 METRICS_PORT 时提供 Prometheus 抓取端点
+metrics_url = start_metrics_server()
+with st.sidebar:
+    st.subheader("后台任务")
+    render_jobs_panel(job_manager)
+    st.subheader("请求指标")
+    render_metrics_panel(metrics_url)
+
 # 创建标签页
-tab1, tab2, tab3 = st.tabs(["批量抓取", "网站映射", "网站爬取"])
+tab1, tab2, tab3, tab4 = st.tabs(["批量抓取", "网站映射", "网站爬取", "语料检索"])
 
 with tab1:
     async def run_batch_scrape():
@@ -31,6 +53,8 @@ with tab2:
     # 初始化session_state
     if 'mapped_links' not in st.session_state:
         st.session_state.mapped_links = []
+    if 'pipeline_index' not in st.session_state:
+        st.session_state.pipeline_index = None
     
     with st.form("map_form"):
         url = st.text_input(
@@ -41,18 +65,74 @@ with tab2:
             "搜索关键词(可选)",
             placeholder="docs"
         )
+        col1, col2 = st.columns(2)
+        with col1:
+            include_subdomains = st.checkbox("包含子域名", value=False)
+            pipeline_mode = st.checkbox("映射后立即抓取", value=False,
+                                        help="边发现链接边抓取, 无需复制到批量抓取页")
+            sitemap_first = st.checkbox("先读站点地图", value=False,
+                                        help="映射后立即抓取时先单独读取站点地图以尽早开始抓取, 会多一次映射请求")
+        with col2:
+            map_limit = st.number_input("最大链接数", min_value=1, max_value=5000, value=100)
+            map_only_main = st.checkbox("仅主要内容", value=True, key="map_only_main")
         submitted = st.form_submit_button("开始映射")
         
         if submitted:
             if not url:
                 st.error("请输入网站URL")
+            elif pipeline_mode:
+                map_options = build_map_payload(url, {
+                    "include_subdomains": include_subdomains,
+                    "limit": map_limit,
+                    "search": search or None,
+                })
+                map_options.pop("url")
+                scrape_options = {"formats": ["markdown"], "onlyMainContent": map_only_main}
+                if st.session_state.pipeline_index is not None:
+                    st.session_state.pipeline_index.close()
+                index = ResultIndex(prefix="firecrawl_pipeline_")
+                
+                map_text = st.empty()
+                scrape_bar = st.progress(0)
+                scrape_text = st.empty()
+                
+                def show_progress(stats):
+                    stage = "已完成" if stats['map_done'] else {"sitemap": "读取站点地图", "map": "完整映射"}.get(stats['stage'], "")
+                    map_text.info(f"映射: {stage} | 发现 {stats['discovered']} 个URL, "
+                                  f"重复 {stats['duplicates']} 个, 排队 {stats['queued']} 个")
+                    done = stats['scraped'] + stats['failed']
+                    if stats['discovered']:
+                        scrape_bar.progress(min(done / stats['discovered'], 1.0))
+                    scrape_text.text(f"抓取: {done}/{stats['discovered']} | 失败 {stats['failed']}")
+                
+                async def run_pipeline():
+                    async with AsyncFirecrawlClient(API_URL, API_KEY) as client:
+                        async for link, result in map_and_scrape(
+                            client, url, map_options, scrape_options, on_progress=show_progress,
+                            sitemap_first=sitemap_first,
+                        ):
+                            doc = result.get('data') or {}
+                            if doc.get('markdown'):
+                                metadata = doc.get('metadata', {})
+                                index.add(metadata.get('sourceURL') or link, metadata.get('title'), doc['markdown'])
+                
+                asyncio.run(run_pipeline())
+                if len(index):
+                    get_corpus().add_pages(index.iter_pages(), source="map")
+                    st.session_state.pipeline_index = index
+                    st.success(f"映射并抓取完成, 共 {len(index)} 个页面")
+                else:
+                    index.close()
+                    st.session_state.pipeline_index = None
+                    st.warning("没有抓取到任何页面")
             else:
                 with st.spinner("正在映射网站URL..."):
-                    result = map_url(url, search if search else None, API_URL, API_KEY)
+                    result = map_url(url, search if search else None, API_URL, API_KEY,
+                                     include_subdomains=include_subdomains, limit=map_limit)
                     if result:
                         if result.get('status') == 'success' or result.get('success'):
-                            links = result.get('links', [])
-                            st.success(f"找到 {len(links)} 个URL")
+                            links, dedup_stats = dedup_urls(result.get('links', []))
+                            st.success(f"找到 {dedup_stats['input']} 个URL, 规范化去重后剩余 {len(links)} 个")
                             st.session_state.mapped_links = links
                             st.dataframe({"URL": links})
                         else:
@@ -74,6 +154,19 @@ with tab2:
                 file_name="url_list.txt",
                 mime="text/plain"
             )
+    
+    # 流水线抓取结果
+    pipeline_index = st.session_state.get('pipeline_index')
+    if pipeline_index is not None:
+        st.divider()
+        st.subheader("抓取结果")
+        render_export_panel("pipeline", "map_scrape_results",
+                            records=pipeline_index.iter_pages, pages=pipeline_index.iter_pages)
+        render_result_browser(pipeline_index, key="pipeline_results")
+    
+    st.divider()
+    st.subheader("多站点映射")
+    render_multi_site_map(API_URL, API_KEY)
 
 with tab3:
     # 网站爬取功能
@@ -85,7 +178,11 @@ with tab3:
     if 'crawl_status' not in st.session_state:
         st.session_state.crawl_status = None
     if 'crawl_results' not in st.session_state:
-        st.session_state.crawl_results = []
+        st.session_state.crawl_results = None
+    if 'crawl_index' not in st.session_state:
+        st.session_state.crawl_index = None
+    if 'crawl_loaded_job' not in st.session_state:
+        st.session_state.crawl_loaded_job = None
     
     with st.form("crawl_form"):
         url = st.text_input(
@@ -99,7 +196,6 @@ with tab3:
             max_pages = st.number_input("最大页面数", min_value=1, value=100)
             only_main_content = st.checkbox("仅主要内容", value=True)
         with col2:
-            include_metadata = st.checkbox("包含元数据", value=False)
             mobile = st.checkbox("移动端模式", value=False)
         
         submitted = st.form_submit_button("开始爬取")
@@ -110,76 +206,159 @@ with tab3:
             else:
                 with st.spinner("正在提交爬取任务..."):
                     options = {
-                        "max_pages": max_pages,
-                        "page_options": {
+                        "limit": max_pages,
+                        "scrapeOptions": {
+                            "formats": ["markdown"],
                             "onlyMainContent": only_main_content,
-                            "includeMetadata": include_metadata,
                             "mobile": mobile
                         }
                     }
-                    async def run_crawl():
+                    # 启用 webhook 接收器时由回调推送页面, 不再定时轮询
+                    webhook = job_manager.webhook_spec()
+                    if webhook:
+                        options["webhook"] = webhook
+                    async def start_crawl():
                         async with AsyncFirecrawlClient(API_URL, API_KEY) as client:
-                            # 启动爬取任务
-                            result = await client.start_crawl(url, options)
-                            if result and result.get('jobId'):
-                                st.session_state.crawl_job_id = result['jobId']
-                                st.session_state.crawl_results = []
-                                st.success(f"爬取任务已提交! 任务ID: {result['jobId']}")
-                                
-                                # 检查状态直到完成
-                                st.session_state.crawl_status = "running"
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                
-                                while st.session_state.crawl_status == "running":
-                                    status = await client.check_crawl_status(st.session_state.crawl_job_id)
-                                    if status:
-                                        if status.get('status') == 'completed':
-                                            st.session_state.crawl_status = "completed"
-                                            st.session_state.crawl_results = status.get('data', [])
-                                            progress_bar.progress(100)
-                                            status_text.success("爬取完成!")
-                                            break
-                                        elif status.get('status') == 'failed':
-                                            st.session_state.crawl_status = "failed"
-                                            progress_bar.progress(100)
-                                            status_text.error(f"爬取失败: {status.get('message', '未知错误')}")
-                                            break
-                                        else:
-                                            progress = status.get('progress', 0)
-                                            progress_bar.progress(progress)
-                                            status_text.info(f"正在爬取... 进度: {progress}%")
-                                            await asyncio.sleep(2)
-                                    else:
-                                        st.session_state.crawl_status = "error"
-                                        progress_bar.progress(100)
-                                        status_text.error("获取状态失败")
-                                        break
-                                
-                                st.rerun()
-                    
-                    asyncio.run(run_crawl())
+                            return await client.start_crawl(url, options)
+                    result = asyncio.run(start_crawl())
+                if result and result.get('id'):
+                    # 由后台任务管理器轮询并保存结果, 关闭页面后任务仍在登记表中
+                    job_manager.submit("crawl", result['id'], label=url, webhook=bool(webhook))
+                    st.session_state.crawl_job_id = result['id']
+                    st.session_state.crawl_status = "running"
+                    st.success(f"爬取任务已提交! 任务ID: {result['id']}")
+                else:
+                    st.error(f"爬取任务提交失败: {result.get('message', '未知错误')}")
+
+    reopened = select_job(job_manager, "crawl", key="crawl_jobs")
+    if reopened:
+        st.session_state.crawl_job_id = reopened
+        st.session_state.crawl_status = "running"
+        st.session_state.crawl_loaded_job = None
+
+    # 任务由管理器轮询并写入结果文件; 状态片段每个刷新周期只载入新增的页面
+    # 后返回, 不阻塞脚本运行, 任务结束时再统计页面并写入语料库
+    crawl_job_id = st.session_state.crawl_job_id
+    if crawl_job_id and st.session_state.crawl_status == "running":
+        if st.session_state.crawl_loaded_job != crawl_job_id:
+            # 原始文档逐条写入磁盘, 不在会话中保留完整列表
+            if st.session_state.crawl_results is not None:
+                st.session_state.crawl_results.close()
+            st.session_state.crawl_results = RecordSpool(prefix="firecrawl_crawl_")
+            if st.session_state.crawl_index is not None:
+                st.session_state.crawl_index.close()
+            st.session_state.crawl_index = ResultIndex(prefix="firecrawl_crawl_")
+            st.session_state.pop("crawl_follow", None)
+            st.session_state.crawl_loaded_job = crawl_job_id
+        spool = st.session_state.crawl_results
+        crawl_index = st.session_state.crawl_index
+
+        def load_pages(docs):
+            for doc in docs:
+                spool.append(doc)
+                for page in parse_crawl_results([doc]):
+                    crawl_index.add(page['url'], page['title'], page['markdown'])
+
+        def finish_crawl(job):
+            st.session_state.crawl_status = job['status']
+            if job['status'] != "completed":
+                st.session_state.crawl_error = job.get('error') or job['status']
+                return
+            with st.spinner("正在分析页面..."):
+                # 统计字数/token/链接数, 分块交给进程池并按内容哈希缓存
+                annotate_index(crawl_index)
+                # 写入本地语料库, 便于之后全文检索
+                get_corpus().add_pages(
+                    (page for doc in spool for page in parse_crawl_results([doc])),
+                    source="crawl",
+                    job_id=job['id'],
+                )
+
+        follow_job_documents(job_manager, crawl_job_id, "crawl_follow", load_pages, finish_crawl)
+    elif crawl_job_id and st.session_state.crawl_status in ("failed", "cancelled"):
+        st.error(f"爬取失败: {st.session_state.get('crawl_error')}")
 
     # 显示爬取结果
     if st.session_state.get('crawl_results'):
         st.divider()
         st.subheader("爬取结果")
         
-        # 解析结果
-        parsed_results = parse_crawl_results(st.session_state.crawl_results)
-        st.info(f"共爬取 {len(parsed_results)} 个页面")
+        st.info(f"共爬取 {len(st.session_state.crawl_results)} 个页面")
         
-        # 显示结果表格
-        st.dataframe({
-            "URL": [r['url'] for r in parsed_results],
-            "标题": [r['title'] for r in parsed_results],
-            "字数": [r['word_count'] for r in parsed_results]
-        })
+        # 分页浏览结果, 只渲染当前页
+        crawl_index = st.session_state.crawl_index
+        if crawl_index is not None:
+            analyzed = [e for e in crawl_index.entries if 'word_count' in e]
+            if analyzed:
+                col1, col2, col3 = st.columns(3)
+                col1.metric("总字数", sum(e['word_count'] for e in analyzed))
+                col2.metric("估算Token数", sum(e['token_count'] for e in analyzed))
+                col3.metric("链接数", sum(e['link_count'] for e in analyzed))
+            render_result_browser(
+                crawl_index,
+                key="crawl_results",
+                columns={"word_count": "字数", "token_count": "Token", "link_count": "链接"},
+            )
+        
+        # 导出: 从磁盘上的原始结果流式生成文件
+        crawl_results = st.session_state.crawl_results
+        render_export_panel(
+            "crawl",
+            "crawl_results",
+            records=lambda: iter(crawl_results),
+            pages=lambda: (page for doc in crawl_results for page in parse_crawl_results([doc])),
+        )
         
-        # 下载按钮
-        st.download_button(
-            label="下载完整结果(JSON)",
-            data=str(st.session_state.crawl_results),
-            file_name="crawl_results.json",
-            mime="application/json"
-        )
\ No newline at end of file
+        # 增量保存: 按输出目录中的清单只写入新增或变化的页面
+        crawl_job = job_manager.get(st.session_state.crawl_job_id) if st.session_state.crawl_job_id else None
+        crawl_root = crawl_job['label'] if crawl_job else None
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            output_dir = st.text_input("保存目录", value="output", key="crawl_output_dir")
+            prune = st.checkbox(
+                "删除本次爬取中已不存在的页面", value=False, key="crawl_prune", disabled=not crawl_root,
+                help=f"只删除之前从 {crawl_root or '同一起始URL'} 爬取并保存、本次结果中已没有的页面, "
+                     "保存目录中其他站点的页面不受影响",
+            )
+        with col2:
+            if st.button("增量保存", key="crawl_save"):
+                with st.spinner("正在保存..."):
+                    report = sync_markdown(
+                        (page for doc in crawl_results for page in parse_crawl_results([doc])),
+                        output_dir,
+                        prune=prune and bool(crawl_root),
+                        root=crawl_root,
+                    )
+                st.session_state.crawl_save_report = report
+        report = st.session_state.get('crawl_save_report')
+        if report:
+            st.caption(
+                f"新增 {len(report['added'])} 个, 变化 {len(report['changed'])} 个, "
+                f"删除 {len(report['removed'])} 个, 未变化 {report['unchanged']} 个; "
+                f"变化报告已写入 {output_dir}/changes.json"
+            )
+
+with tab4:
+    # 本地语料库全文检索
+    st.subheader("本地语料检索")
+    
+    corpus = get_corpus()
+    stats = corpus.stats()
+    st.caption(f"语料库共 {stats['pages']} 个页面 " +
+               " ".join(f"{source}: {count}" for source, count in stats['by_source'].items()))
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("检索关键词", placeholder="多个关键词用空格分隔")
+    with col2:
+        source = st.selectbox("来源", ["全部", "crawl", "batch", "map", "search"])
+    
+    if query:
+        start = time.perf_counter()
+        hits = corpus.search(query, limit=50, source=None if source == "全部" else source)
+        elapsed = (time.perf_counter() - start) * 1000
+        st.info(f"找到 {len(hits)} 条结果, 用时 {elapsed:.1f} 毫秒")
+        for hit in hits:
+            with st.expander(f"{hit['title'] or hit['url']} · {hit['source']}"):
+                st.markdown(f"**URL**: {hit['url']}")
+                st.markdown(hit['snippet'])
@@ -1,82 +1,323 @@
-import aiohttp
+import time
 import asyncio
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator, Awaitable, Callable
 import logging
+import http_pool
+import resilience
+import rate_limit
+import metrics
+from concurrency import AdaptiveLimiter
+from scrape_cache import ScrapeCache
 
 logger = logging.getLogger(__name__)
 
 class AsyncFirecrawlClient:
     """异步Firecrawl API客户端"""
     
-    def __init__(self, api_url: str, api_key: str, max_concurrency: int = 10):
+    def __init__(self, api_url: str, api_key: str, max_concurrency: int = 10,
+                 cache: Optional[ScrapeCache] = None, max_concurrency_ceiling: int = 64,
+                 retry_policy: Optional[resilience.RetryPolicy] = None):
+        # 兼容 .env 中带 /v1 后缀的地址, 各接口路径统一自带 /v1
         self.api_url = api_url.rstrip('/')
+        if self.api_url.endswith('/v1'):
+            self.api_url = self.api_url[:-3]
         self.api_key = api_key
         self.max_concurrency = max_concurrency
-        self.session = None
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        # max_concurrency 为初始并发, 运行中按 AIMD 在 [1, ceiling] 内调整
+        self.limiter = AdaptiveLimiter(
+            initial=max_concurrency,
+            max_limit=max(max_concurrency, max_concurrency_ceiling),
+        )
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-        )
+        # 连接由 http_pool 的进程级会话持有, 退出时不关闭
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        pass
             
-    async def scrape(self, url: str) -> Dict:
-        """异步抓取单个URL"""
-        async with self.session.post(
-            f"{self.api_url}/v1/scrape",
-            json={"url": url}
-        ) as response:
-            return await self._handle_response(response)
+    async def scrape(self, url: str, options: Optional[Dict] = None) -> Dict:
+        """异步抓取单个URL, 命中缓存时不发起网络请求
+        
+        网络请求受自适应并发限制器约束。
+        """
+        if self.cache:
+            cached = await self.cache.get_async(url, options)
+            if cached is not None:
+                return {"success": True, "data": cached, "cached": True}
+        result = await self._request(
+            "POST", f"{self.api_url}/v1/scrape", json={"url": url, **(options or {})},
+            limited=True
+        )
+        if self.cache and result.get("success") and result.get("data"):
+            await self.cache.set_async(url, options, result["data"])
+        return result
             
     async def batch_scrape(self, urls: List[str], options: Optional[Dict] = None) -> List[Dict]:
-        """异步批量抓取多个URL"""
-        semaphore = asyncio.Semaphore(self.max_concurrency)
-        
-        async def limited_scrape(url):
-            async with semaphore:
-                return await self.scrape(url, options)
-                
-        tasks = [limited_scrape(url) for url in urls]
+        """异步批量抓取多个URL(逐个调用 /v1/scrape, 作为批量任务接口的后备方案)"""
+        tasks = [self.scrape(url, options) for url in urls]
         return await asyncio.gather(*tasks, return_exceptions=True)
         
+    async def start_batch_scrape(self, urls: List[str], options: Optional[Dict] = None) -> Dict:
+        """提交服务端批量抓取任务"""
+        data = {"urls": urls, **(options or {})}
+        return await self._request("POST", f"{self.api_url}/v1/batch/scrape", json=data, idempotent=False)
+            
+    async def check_batch_scrape_status(self, job_id: str, skip: int = 0) -> Dict:
+        """异步检查批量抓取任务状态, skip 为已取得的文档数"""
+        return await self._get_job_status(f"/v1/batch/scrape/{job_id}", skip)
+            
+    async def get_next_page(self, next_url: str) -> Dict:
+        """按 next 游标获取下一页结果"""
+        return await self._request("GET", next_url)
+            
+    async def iter_batch_scrape(
+        self,
+        urls: List[str],
+        options: Optional[Dict] = None,
+        poll_interval: float = 2.0,
+        on_status: Optional[Callable[[Dict], None]] = None,
+        on_job: Optional[Callable[[Dict], None]] = None,
+        webhook: Optional[Dict] = None,
+        follow: Optional[Callable[[str], AsyncIterator[Dict]]] = None,
+        wait: Optional[Callable[[Dict], Awaitable]] = None,
+    ) -> AsyncIterator[Dict]:
+        """提交批量抓取任务并轮询, 文档完成后立即逐个产出
+        
+        命中缓存的URL直接产出, 只有未命中的URL提交到服务端。
+        on_job(任务提交响应) 在任务提交成功后调用, 用于登记任务ID。
+        webhook 为提交时附带的回调选项(不参与缓存键); 给出 follow(任务ID)
+        时从其产出的文档流读取结果, 不再轮询任务状态。
+        任务失败或请求出错时抛出 RuntimeError。
+        """
+        if self.cache:
+            pending = []
+            for url in urls:
+                cached = await self.cache.get_async(url, options)
+                if cached is not None:
+                    yield cached
+                else:
+                    pending.append(url)
+            urls = pending
+            if not urls:
+                return
+        
+        job = await self.start_batch_scrape(urls, {**(options or {}), "webhook": webhook} if webhook else options)
+        if job.get("error") or not job.get("id"):
+            raise RuntimeError(f"批量任务提交失败: {job.get('message', job)}")
+        if on_job:
+            on_job(job)
+        if follow:
+            documents = follow(job["id"])
+        else:
+            documents = self._iter_job_documents(
+                f"/v1/batch/scrape/{job['id']}", poll_interval, on_status, wait=wait
+            )
+        async for doc in documents:
+            source_url = doc.get("metadata", {}).get("sourceURL")
+            if self.cache and source_url and doc.get("markdown"):
+                await self.cache.set_async(source_url, options, doc)
+            yield doc
+        
+    async def iter_batch_results(
+        self,
+        job_id: str,
+        poll_interval: float = 2.0,
+        on_status: Optional[Callable[[Dict], None]] = None,
+        skip: int = 0,
+        wait: Optional[Callable[[Dict], Awaitable]] = None,
+    ) -> AsyncIterator[Dict]:
+        """跟踪已提交的批量抓取任务, 从第 skip 个文档开始流式产出"""
+        async for doc in self._iter_job_documents(
+            f"/v1/batch/scrape/{job_id}", poll_interval, on_status, skip, wait
+        ):
+            yield doc
+
     async def start_crawl(self, url: str, options: Optional[Dict] = None) -> Dict:
         """异步启动爬取任务"""
-        data = {
-            "url": url,
-            "options": options or {}
-        }
-        async with self.session.post(
-            f"{self.api_url}/v1/crawl",
-            json=data
-        ) as response:
-            return await self._handle_response(response)
+        data = {"url": url, **(options or {})}
+        return await self._request("POST", f"{self.api_url}/v1/crawl", json=data, idempotent=False)
             
-    async def check_crawl_status(self, job_id: str) -> Dict:
-        """异步检查爬取任务状态"""
-        async with self.session.get(
-            f"{self.api_url}/v1/crawl/status/{job_id}"
-        ) as response:
-            return await self._handle_response(response)
+    async def map(self, url: str, options: Optional[Dict] = None) -> Dict:
+        """异步映射网站URL, options 为 /v1/map 请求体中除 url 外的字段"""
+        data = {"url": url, **(options or {})}
+        return await self._request("POST", f"{self.api_url}/v1/map", json=data)
+
+    async def search(self, query: str, options: Optional[Dict] = None) -> Dict:
+        """异步搜索, options 为 /v1/search 请求体中除 query 外的字段"""
+        data = {"query": query, **(options or {})}
+        return await self._request("POST", f"{self.api_url}/v1/search", json=data, limited=True)
             
-    async def _handle_response(self, response) -> Dict:
-        """处理API响应"""
-        if response.status == 200:
-            return await response.json()
-        else:
-            error = await response.text()
-            logger.error(f"API请求失败: {response.status} - {error}")
+    async def check_crawl_status(self, job_id: str, skip: int = 0) -> Dict:
+        """异步检查爬取任务状态, skip 为已取得的文档数"""
+        return await self._get_job_status(f"/v1/crawl/{job_id}", skip)
+            
+    async def iter_crawl_results(
+        self,
+        job_id: str,
+        poll_interval: float = 2.0,
+        on_status: Optional[Callable[[Dict], None]] = None,
+        skip: int = 0,
+        wait: Optional[Callable[[Dict], Awaitable]] = None,
+    ) -> AsyncIterator[Dict]:
+        """在爬取进行中按页流式产出文档, 直到任务完成
+        
+        skip 为已取得的文档数, 用于恢复跟踪。任务失败或请求出错时抛出 RuntimeError。
+        """
+        async for doc in self._iter_job_documents(
+            f"/v1/crawl/{job_id}", poll_interval, on_status, skip, wait
+        ):
+            yield doc
+
+    async def check_deep_research_status(self, job_id: str) -> Dict:
+        """异步查询深度研究任务状态"""
+        return await self._get_job_status(f"/v1/deep-research/{job_id}")
+
+    async def check_llmstxt_status(self, job_id: str) -> Dict:
+        """异步查询 LLMs.txt 生成任务状态"""
+        return await self._get_job_status(f"/v1/llmstxt/{job_id}")
+            
+    async def _get_job_status(self, path: str, skip: int = 0) -> Dict:
+        """获取异步任务状态, 以 skip 跳过已取得的文档"""
+        params = {"skip": skip} if skip else None
+        return await self._request("GET", f"{self.api_url}{path}", params=params)
+            
+    async def _iter_job_documents(
+        self,
+        path: str,
+        poll_interval: float,
+        on_status: Optional[Callable[[Dict], None]],
+        skip: int = 0,
+        wait: Optional[Callable[[Dict], Awaitable]] = None,
+    ) -> AsyncIterator[Dict]:
+        """轮询任务状态并产出新完成的文档
+        
+        每次轮询以 skip 跳过已产出的文档, 沿 next 游标读完所有分页;
+        处理当前页时预取下一页, 使网络等待与下游处理重叠。
+        任务进行中服务端每次都会返回 next, 因此只有任务已完成或当前页有数据时
+        才立即跟随 next, 否则等到下次轮询, 避免空页连续请求。
+        给出 wait(本次状态) 时由它决定两次轮询的间隔, 否则固定等待 poll_interval。
+        """
+        yielded = skip
+        while True:
+            status = await self._get_job_status(path, skip=yielded)
+            if status.get("error"):
+                raise RuntimeError(f"获取任务状态失败: {status.get('message')}")
+            if on_status:
+                on_status(status)
+            
+            page = status
+            prefetch = None
+            try:
+                while True:
+                    next_url = page.get("next")
+                    follow = next_url and (
+                        page.get("status", status.get("status")) == "completed" or page.get("data")
+                    )
+                    prefetch = asyncio.ensure_future(self.get_next_page(next_url)) if follow else None
+                    for doc in page.get("data") or []:
+                        yielded += 1
+                        yield doc
+                    if prefetch is None:
+                        break
+                    page = await prefetch
+                    if page.get("error"):
+                        raise RuntimeError(f"获取分页结果失败: {page.get('message')}")
+            finally:
+                if prefetch is not None and not prefetch.done():
+                    prefetch.cancel()
+            
+            state = status.get("status")
+            if state == "failed":
+                raise RuntimeError(f"任务失败: {status.get('error', '未知错误')}")
+            if state == "completed":
+                break
+            if wait:
+                await wait(status)
+            else:
+                await asyncio.sleep(poll_interval)
+            
+    async def _request(self, method: str, url: str, limited: bool = False, idempotent: bool = True,
+                       **kwargs) -> Dict:
+        """经共享连接池发送请求, 可在任意事件循环中调用
+        
+        每次尝试前先从进程级限流器取得令牌; 可重试的错误按 retry_policy
+        退避重试, 并受接口熔断器保护;
+        limited 为真时每次尝试都占用自适应并发名额。每次尝试的排队和发送
+        耗时记入进程级指标。提交任务等非幂等请求传 idempotent=False, 只重试
+        确定未被受理的失败。失败时返回错误字典, 其中带有重试次数和熔断器状态。
+        """
+        endpoint = resilience.endpoint_name(url)
+        
+        async def send(timer):
+            async with http_pool.get_session().request(
+                method, url, headers=self.headers, **kwargs
+            ) as response:
+                # 先读完响应体以统计字节数, 之后的 json()/text() 复用已读内容
+                timer.received(len(await response.read()))
+                return await self._handle_response(response)
+        
+        async def attempt():
+            # 先取得按密钥共享的限流令牌, 再占用并发名额; 两者的等待计为排队时间
+            timer = metrics.get_metrics().start(endpoint, method)
+            status, retry_after = 0, None
+            try:
+                await rate_limit.get_rate_limiter().acquire(self.api_key, endpoint, method)
+                if limited:
+                    await self.limiter.acquire()
+            except BaseException:
+                timer.finish(status)
+                raise
+            timer.dispatch()
+            start = time.monotonic()
+            try:
+                result = await http_pool.run_async(send(timer))
+                status = 200
+                return result
+            except http_pool.HTTPStatusError as e:
+                status, retry_after = e.status, e.retry_after
+                raise
+            finally:
+                timer.finish(status)
+                if limited:
+                    await self.limiter.release(time.monotonic() - start, status, retry_after)
+        
+        try:
+            result, retries = await resilience.call_with_retry(
+                endpoint, attempt, self.retry_policy, idempotent
+            )
+        except Exception as e:
+            status = getattr(e, "status", 0)
+            message = getattr(e, "message", None) or str(e) or type(e).__name__
+            metrics.get_metrics().record_call(endpoint, False, getattr(e, "retries", 0))
+            logger.error(f"API请求失败: {endpoint} {status} - {message}")
             return {
                 "error": True,
-                "status_code": response.status,
-                "message": error
+                "status_code": status,
+                "message": message,
+                "retries": getattr(e, "retries", 0),
+                "breaker": resilience.get_breaker(endpoint).state,
             }
+        metrics.get_metrics().record_call(endpoint, True, retries)
+        if retries and isinstance(result, dict):
+            result["retries"] = retries
+        return result
+            
+    async def _handle_response(self, response) -> Dict:
+        """处理API响应, 非200状态抛出 HTTPStatusError"""
+        if response.status == 200:
+            return await response.json()
+        raise http_pool.HTTPStatusError(
+            response.status,
+            await response.text(),
+            http_pool.parse_retry_after(response.headers.get("Retry-After")),
+        )
 
 async def run_async_tasks(tasks, progress_callback=None):
     """运行异步任务并处理进度"""
@@ -94,4 +335,4 @@ async def run_async_tasks(tasks, progress_callback=None):
             logger.error(f"任务执行失败: {str(e)}")
             results.append({"error": str(e)})
             
-    return results
\ No newline at end of file
+    return results
@@ -1,12 +1,80 @@
+import os
 import streamlit as st
 import pyperclip
-import asyncio
 from async_utils import AsyncFirecrawlClient
+from scrape_cache import ScrapeCache, normalize_url
+from result_viewer import ResultIndex, render_result_browser, render_export_panel
+from ordered_output import ReorderBuffer, SlotMatcher, iter_ordered
+from corpus import get_corpus
+from url_canon import dedup_urls
+from job_manager import get_job_manager
+from job_panel import follow_job_documents
+
+# 重排序缓冲区上限, 同时也是逐个抓取时的最大在途条目数
+REORDER_BUFFER_SIZE = 500
+
+@st.cache_resource
+def get_scrape_cache():
+    """进程级共享的抓取缓存"""
+    return ScrapeCache(
+        cache_dir=os.getenv("SCRAPE_CACHE_DIR", ".scrape_cache"),
+        ttl=float(os.getenv("SCRAPE_CACHE_TTL", 24 * 3600)),
+        max_bytes=int(os.getenv("SCRAPE_CACHE_MAX_MB", 512)) * 1024 * 1024,
+    )
+
+def _add_page(index, i, url, doc, include_metadata, warnings):
+    """按输入顺序写入一页结果, 没有 markdown 的页面记入 warnings"""
+    metadata = doc.get('metadata', {})
+    if doc.get('markdown'):
+        extra = {'metadata': metadata} if include_metadata else {}
+        index.add(metadata.get('sourceURL') or url, metadata.get('title'), doc['markdown'], **extra)
+    else:
+        error = metadata.get('error')
+        warnings.append(f"URL {i+1} ({url}): 未返回markdown内容" + (f" ({error})" if error else ""))
+
+
+def _add_batch_page(batch, j, page):
+    # 按到达顺序补位的文档不一定对应该下标的输入URL
+    url_list = batch["url_list"]
+    url = page.get('metadata', {}).get('sourceURL') or (url_list[j] if j < len(url_list) else '')
+    _add_page(batch["index"], j, url, page, batch["include_metadata"], batch["warnings"])
+
+
+def _accept_batch_documents(batch, docs, store=True):
+    """按 sourceURL 找回输入下标, 经重排序缓冲区按输入顺序写入结果; store 时写入本地缓存"""
+    cache = get_scrape_cache() if batch["use_cache"] and store else None
+    for doc in docs:
+        source_url = doc.get('metadata', {}).get('sourceURL', '')
+        if cache and source_url and doc.get('markdown'):
+            cache.set(source_url, batch["options"], doc)
+        i = batch["slots"].claim(normalize_url(source_url) if source_url else None)
+        for j, page in batch["reorder"].push(i, doc):
+            _add_batch_page(batch, j, page)
+
+
+def _finish_batch(batch, job=None):
+    """批量任务结束或无需提交时释放剩余结果并展示"""
+    for j, page in batch["reorder"].flush():
+        _add_batch_page(batch, j, page)
+    if job is not None and job["status"] != "completed":
+        batch["error"] = f"批量任务出错: {job.get('error') or job['status']}"
+    batch["done"] = True
+    _publish_index(batch["index"])
+
+
+def _publish_index(index):
+    """写入本地语料库并作为当前结果展示, 没有结果时删除索引"""
+    if len(index):
+        get_corpus().add_pages(index.iter_pages(), source="batch")
+    st.session_state.batch_index = index if len(index) else None
+    if not len(index):
+        index.close()
+
 
 async def batch_scrape(api_url, api_key):
     # 初始化session_state
-    if 'combined_markdown' not in st.session_state:
-        st.session_state.combined_markdown = ""
+    if 'batch_index' not in st.session_state:
+        st.session_state.batch_index = None
 
     # 创建表单
     with st.form("scrape_form"):
@@ -22,10 +90,18 @@ async def batch_scrape(api_url, api_key):
         col1, col2 = st.columns(2)
         with col1:
             only_main_content = st.checkbox("仅主要内容", value=True)
-            include_metadata = st.checkbox("包含元数据", value=False)
+            include_metadata = st.checkbox("包含元数据", value=False,
+                                           help="在结果和导出文件中保留每页的 metadata(描述、语言、状态码等)")
+            use_batch_api = st.checkbox("使用服务端批量任务", value=True,
+                                        help="通过 /v1/batch/scrape 提交整批URL; 取消则逐个调用 /v1/scrape")
         with col2:
             wait_for = st.number_input("等待时间(毫秒)", min_value=0, value=0)
             mobile = st.checkbox("移动端模式", value=False)
+            use_cache = st.checkbox("使用本地缓存", value=True,
+                                    help="相同URL和选项在有效期内直接返回缓存结果")
+            canonicalize = st.checkbox("规范化并去重URL", value=True,
+                                       help="统一协议和主机大小写, 去掉片段、末尾斜杠和 utm_* 等跟踪参数后比较, "
+                                            "每组只抓取首次出现的原始URL")
         
         submitted = st.form_submit_button("开始批量抓取")
 
@@ -34,61 +110,135 @@ async def batch_scrape(api_url, api_key):
                 st.error("请输入至少一个URL")
             else:
                 url_list = [url.strip() for url in urls.split('\n') if url.strip()]
-                all_markdown = []
+                if canonicalize:
+                    url_list, dedup_stats = dedup_urls(url_list)
+                    if dedup_stats["duplicates"]:
+                        st.info(f"规范化后去除 {dedup_stats['duplicates']} 个重复URL, 剩余 {len(url_list)} 个")
+                # 新的提交取代之前的结果; 之前仍在进行的批量任务继续由管理器跟踪
+                st.session_state.batch_job = None
+                if st.session_state.batch_index is not None:
+                    st.session_state.batch_index.close()
+                # 结果写入磁盘索引, 会话中只保留每页的元信息
+                index = ResultIndex()
                 
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
                 # 准备抓取选项
                 options = {
-                    "pageOptions": {
-                        "onlyMainContent": only_main_content,
-                        "includeMetadata": include_metadata,
-                        "waitFor": wait_for,
-                        "mobile": mobile
-                    }
+                    "formats": ["markdown"],
+                    "onlyMainContent": only_main_content,
+                    "waitFor": wait_for,
+                    "mobile": mobile
                 }
                 
-                # 异步处理所有URL
-                async with AsyncFirecrawlClient(api_url, api_key) as client:
-                    tasks = [client.scrape(url, options) for url in url_list]
-                    
-                    for i, task in enumerate(asyncio.as_completed(tasks)):
-                        try:
-                            result = await task
-                            status_text.text(f"正在处理: {i+1}/{len(url_list)}")
-                            progress_bar.progress((i+1)/len(url_list))
-                            
-                            if isinstance(result, dict) and not result.get('error'):
-                                if 'markdown' in result.get('data', {}):
-                                    url = result['data'].get('url', url_list[i])
-                                    all_markdown.append(f"# {url}\n\n{result['data']['markdown']}\n\n---\n")
-                                else:
-                                    st.warning(f"URL {i+1}: 未返回markdown内容")
+                cache = get_scrape_cache() if use_cache else None
+                warnings = []
+                def add_page(i, url, doc):
+                    _add_page(index, i, url, doc, include_metadata, warnings)
+                    for warning in warnings:
+                        st.warning(warning)
+                    warnings.clear()
+                
+                async with AsyncFirecrawlClient(api_url, api_key, cache=cache) as client:
+                    if use_batch_api:
+                        # 服务端批量任务: 命中缓存的URL直接按顺序写入, 其余提交后交给后台任务
+                        # 管理器跟踪(轮询或接收 webhook 回调)并写入结果文件, 由下方的状态片段
+                        # 逐步载入; 提交后脚本即返回, 页面关闭或重跑时任务仍由管理器继续
+                        batch = {
+                            "url_list": url_list,
+                            "options": options,
+                            "use_cache": use_cache,
+                            "include_metadata": include_metadata,
+                            "index": index,
+                            "slots": SlotMatcher(normalize_url(url) for url in url_list),
+                            "reorder": ReorderBuffer(max_size=REORDER_BUFFER_SIZE),
+                            "warnings": [],
+                            "job_id": None,
+                            "error": None,
+                            "done": False,
+                        }
+                        pending = []
+                        for url in url_list:
+                            cached = await cache.get_async(url, options) if cache else None
+                            if cached is not None:
+                                _accept_batch_documents(batch, [cached], store=False)
+                            else:
+                                pending.append(url)
+                        if pending:
+                            job_manager = get_job_manager(api_url, api_key)
+                            webhook = job_manager.webhook_spec()
+                            job = await client.start_batch_scrape(
+                                pending, {**options, "webhook": webhook} if webhook else options
+                            )
+                            if job.get("error") or not job.get("id"):
+                                batch["error"] = f"批量任务提交失败: {job.get('message', job)}"
                             else:
-                                st.error(f"URL {i+1}: 请求失败 - {result.get('message', '未知错误')}")
-                                
-                        except Exception as e:
-                            st.error(f"URL {i+1}: 发生错误 - {str(e)}")
+                                job_manager.submit("batch", job['id'], label=f"{len(url_list)} 个URL",
+                                                   webhook=bool(webhook))
+                                batch["job_id"] = job['id']
+                        st.session_state.batch_job = batch
+                        if not batch["job_id"]:
+                            _finish_batch(batch)
+                    else:
+                        # 逐个URL抓取, 并发窗口由客户端按 AIMD 自适应调整, 结果按输入顺序输出
+                        def show_progress(completed, buffered):
+                            window = client.limiter.snapshot()
+                            status_text.text(
+                                f"正在处理: {completed}/{len(url_list)} | "
+                                f"并发窗口: {window['limit']} (进行中 {window['in_flight']}) | "
+                                f"等待排序: {buffered}"
+                            )
+                            progress_bar.progress(completed / len(url_list))
+                        
+                        async for i, url, result in iter_ordered(
+                            url_list,
+                            lambda url: client.scrape(url, options),
+                            window=REORDER_BUFFER_SIZE,
+                            on_complete=show_progress,
+                        ):
+                            if isinstance(result, Exception):
+                                st.error(f"URL {i+1} ({url}): 发生错误 - {str(result)}")
+                            elif result.get('error'):
+                                st.error(
+                                    f"URL {i+1} ({url}): 请求失败 - {result.get('message', '未知错误')} "
+                                    f"(重试 {result.get('retries', 0)} 次, 熔断器: {result.get('breaker', 'closed')})"
+                                )
+                            else:
+                                add_page(i, url, result.get('data', {}))
+                
+                if cache:
+                    stats = cache.stats()
+                    st.caption(f"缓存命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                               f"命中率 {stats['hit_rate']:.0%}")
                 
-                if all_markdown:
-                    st.session_state.combined_markdown = "\n".join(all_markdown)
+                if not use_batch_api:
+                    _publish_index(index)
+
+    # 服务端批量任务进行中: 状态片段每个刷新周期载入新增的文档后返回, 不阻塞脚本
+    batch = st.session_state.get('batch_job')
+    if batch and batch["job_id"] and not batch["done"]:
+        follow_job_documents(
+            get_job_manager(api_url, api_key), batch["job_id"], "batch_follow",
+            on_documents=lambda docs: _accept_batch_documents(batch, docs),
+            on_finish=lambda job: _finish_batch(batch, job),
+        )
+    if batch:
+        if batch["error"]:
+            st.error(batch["error"])
+        if batch["warnings"]:
+            with st.expander(f"{len(batch['warnings'])} 个URL未返回markdown内容"):
+                for warning in batch["warnings"]:
+                    st.warning(warning)
 
     # 显示结果和操作按钮
-    if st.session_state.combined_markdown:
-        # 下载和复制按钮（放在结果上方）
-        col1, col2 = st.columns(2)
-        with col1:
-            st.download_button(
-                label="下载Markdown",
-                data=st.session_state.combined_markdown,
-                file_name="firecrawl_results.md",
-                mime="text/markdown"
-            )
-        with col2:
-            if st.button("复制到剪贴板"):
-                pyperclip.copy(st.session_state.combined_markdown)
-                st.success("已复制到剪贴板!")
+    index = st.session_state.batch_index
+    if index is not None:
+        # 导出和复制按钮（放在结果上方）
+        render_export_panel("batch", "firecrawl_results", records=index.iter_pages, pages=index.iter_pages)
+        if st.button("复制到剪贴板"):
+            pyperclip.copy(index.read_all())
+            st.success("已复制到剪贴板!")
         
-        st.markdown("### 合并后的抓取结果")
-        st.markdown(st.session_state.combined_markdown)
\ No newline at end of file
+        st.markdown("### 抓取结果")
+        render_result_browser(index, key="batch_results")
\ No newline at end of file
@@ -0,0 +1,428 @@
+"""基准测试: 在本地模拟服务上测量客户端吞吐、延迟和内存
+
+示例:
+    python bench.py                                   # 运行全部场景
+    python bench.py scrape crawl --latency lognormal:80,0.5 --error-rate 0.02
+    python bench.py --save bench_results/main.json
+    python bench.py --compare bench_results/main.json --fail-on-regression
+
+每个场景在单独的子进程中运行, 峰值 RSS 只反映该场景; 模拟服务也在
+独立进程中运行, 不占用被测进程的 CPU 和内存。
+"""
+import os
+import sys
+import json
+import math
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+import urllib.request
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+from mock_firecrawl import MockConfig
+
+SCENARIOS = ["scrape", "batch", "crawl", "map", "search", "deep-research", "llmstxt", "parse", "concat"]
+# 比较基线时, 指标变差超过该比例视为回归
+REGRESSION_THRESHOLD = 0.10
+# 参与基线比较的指标; 除 throughput 越大越好外, 其余越小越好
+COMPARED_METRICS = ["throughput", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "alloc_bytes_per_page",
+                    "blocks_per_page"]
+HIGHER_IS_BETTER = {"throughput"}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1
+    return ordered[rank]
+
+
+def latency_stats(latencies: List[float]) -> Dict:
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存; Linux 下 ru_maxrss 单位为KB, macOS 下为字节"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Timed:
+    """记录每次调用的耗时"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+
+    async def __call__(self, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def _client(base_url: str, concurrency: int):
+    from async_utils import AsyncFirecrawlClient
+    return AsyncFirecrawlClient(base_url, "bench", max_concurrency=concurrency)
+
+
+async def bench_scrape(args) -> Dict:
+    from ordered_output import iter_ordered
+    client = _client(args.base_url, args.concurrency)
+    timed = Timed()
+    urls = [f"https://bench.example/{i}" for i in range(args.pages)]
+    failed = 0
+    async for _, _, result in iter_ordered(
+        urls, lambda url: timed(client.scrape(url, {"formats": ["markdown"]})), window=args.concurrency * 4
+    ):
+        failed += isinstance(result, Exception) or bool(result.get("error"))
+    return {"pages": len(urls), "failed": failed, "latencies": timed.latencies}
+
+
+async def bench_batch(args) -> Dict:
+    client = _client(args.base_url, args.concurrency)
+    timed = _TimedStatus()
+    urls = [f"https://bench.example/{i}" for i in range(args.pages)]
+    pages = 0
+    try:
+        async for _ in client.iter_batch_scrape(urls, {"formats": ["markdown"]}, poll_interval=0.2,
+                                                on_status=timed.on_status):
+            pages += 1
+    except RuntimeError:
+        pass
+    return {"pages": pages, "failed": len(urls) - pages, "latencies": timed.latencies(), "polls": timed.polls}
+
+
+async def bench_crawl(args) -> Dict:
+    from poll_scheduler import PollScheduler
+    client = _client(args.base_url, args.concurrency)
+    job = await client.start_crawl("https://bench.example", {"limit": args.pages})
+    if not job.get("id"):
+        return {"pages": 0, "failed": args.pages, "latencies": []}
+    scheduler = PollScheduler()
+    scheduler.track(job["id"], 2.0)
+    timed = _TimedStatus()
+    pages = 0
+    try:
+        async for _ in client.iter_crawl_results(
+            job["id"], on_status=timed.on_status, wait=lambda status: scheduler.wait(job["id"], status)
+        ):
+            pages += 1
+    except RuntimeError:
+        pass
+    finally:
+        scheduler.close()
+    return {"pages": pages, "failed": args.pages - pages, "latencies": timed.latencies(),
+            "polls": timed.polls, "polls_saved": scheduler.forget(job["id"]).get("polls_saved")}
+
+
+async def bench_map(args) -> Dict:
+    client = _client(args.base_url, args.concurrency)
+    timed = Timed()
+    results = await asyncio.gather(*(
+        timed(client.map(f"https://site{i}.example", {"limit": args.pages})) for i in range(args.requests)
+    ))
+    links = sum(len(r.get("links") or []) for r in results)
+    return {"pages": links, "failed": sum(bool(r.get("error")) for r in results), "latencies": timed.latencies}
+
+
+async def bench_search(args) -> Dict:
+    client = _client(args.base_url, args.concurrency)
+    timed = Timed()
+    results = await asyncio.gather(*(
+        timed(client._request("POST", f"{client.api_url}/v1/search", json={"query": f"q{i}", "limit": 10},
+                              limited=True))
+        for i in range(args.requests)
+    ))
+    docs = sum(len(r.get("data") or []) for r in results)
+    return {"pages": docs, "failed": sum(bool(r.get("error")) for r in results), "latencies": timed.latencies}
+
+
+async def _bench_status_job(args, path: str, check: str) -> Dict:
+    from poll_scheduler import PollScheduler
+    client = _client(args.base_url, args.concurrency)
+    scheduler = PollScheduler()
+    timed = Timed()
+
+    async def run(i: int) -> bool:
+        job = await timed(client._request("POST", f"{client.api_url}{path}", json={"query": f"q{i}", "url": "x"},
+                                          idempotent=False))
+        if not job.get("id"):
+            return False
+        scheduler.track(job["id"], 2.0)
+        while True:
+            status = await timed(getattr(client, check)(job["id"]))
+            if status.get("status") == "completed":
+                return True
+            if status.get("status") == "failed":
+                return False
+            await scheduler.wait(job["id"], status)
+
+    results = await asyncio.gather(*(run(i) for i in range(args.jobs)), return_exceptions=True)
+    scheduler.close()
+    summary = scheduler.summary()
+    return {"pages": sum(r is True for r in results), "failed": sum(r is not True for r in results),
+            "latencies": timed.latencies, "polls": summary["polls"], "coalesced": summary["coalesced"]}
+
+
+async def bench_deep_research(args) -> Dict:
+    return await _bench_status_job(args, "/v1/deep-research", "check_deep_research_status")
+
+
+async def bench_llmstxt(args) -> Dict:
+    return await _bench_status_job(args, "/v1/llmstxt", "check_llmstxt_status")
+
+
+class _TimedStatus:
+    """用状态回调之间的间隔近似状态查询耗时, 同时统计轮询次数"""
+
+    def __init__(self):
+        self.polls = 0
+        self._times: List[float] = []
+
+    def on_status(self, status: Dict):
+        self.polls += 1
+        self._times.append(time.perf_counter())
+
+    def latencies(self) -> List[float]:
+        return [b - a for a, b in zip(self._times, self._times[1:])]
+
+
+def _documents(count: int, page_bytes: int) -> List[Dict]:
+    from mock_firecrawl import MockFirecrawl
+    mock = MockFirecrawl(MockConfig(page_bytes=page_bytes))
+    return [mock._document(f"https://bench.example/{i}") for i in range(count)]
+
+
+def bench_parse(args) -> Dict:
+    """parse_crawl_results 处理大结果时的内存占用"""
+    from crawl import parse_crawl_results
+    docs = _documents(args.pages, args.page_bytes)
+    tracemalloc.start()
+    start = time.perf_counter()
+    pages = parse_crawl_results(docs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    return {"pages": len(pages), "failed": 0, "elapsed": elapsed,
+            "alloc_bytes_per_page": round(peak / max(len(pages), 1)),
+            "blocks_per_page": round(blocks / max(len(pages), 1), 1)}
+
+
+def bench_concat(args) -> Dict:
+    """批量抓取结果合并为一个 markdown 时的内存占用"""
+    from export import ResultIndex
+    docs = _documents(args.pages, args.page_bytes)
+    index = ResultIndex(prefix="firecrawl_bench_")
+    try:
+        for doc in docs:
+            index.add(doc["metadata"]["sourceURL"], doc["metadata"]["title"], doc["markdown"])
+        del docs
+        tracemalloc.start()
+        start = time.perf_counter()
+        combined = index.read_all()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pages = len(index)
+    finally:
+        index.close()
+    return {"pages": pages, "failed": 0, "elapsed": elapsed, "alloc_bytes_per_page": round(peak / max(pages, 1)), "output_bytes": len(combined)}
+
+
+RUNNERS = {
+    "scrape": bench_scrape,
+    "batch": bench_batch,
+    "crawl": bench_crawl,
+    "map": bench_map,
+    "search": bench_search,
+    "deep-research": bench_deep_research,
+    "llmstxt": bench_llmstxt,
+    "parse": bench_parse,
+    "concat": bench_concat,
+}
+
+
+def run_scenario(name: str, args: argparse.Namespace) -> Dict:
+    """在子进程中运行单个场景, 返回指标
+
+    parse/concat 场景自行用 tracemalloc 测量; 网络场景默认不开 tracemalloc,
+    以免拖慢吞吐, 指定 --trace-alloc 时才统计每页分配。
+    """
+    runner = RUNNERS[name]
+    trace = args.trace_alloc and asyncio.iscoroutinefunction(runner)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if asyncio.iscoroutinefunction(runner):
+        result = asyncio.run(runner(args))
+    else:
+        result = runner(args)
+    elapsed = result.pop("elapsed", None) or (time.perf_counter() - start)
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["alloc_bytes_per_page"] = round(peak / max(result["pages"], 1))
+    latencies = result.pop("latencies", None)
+    metrics = {
+        **result,
+        "seconds": round(elapsed, 3),
+        "throughput": round(result["pages"] / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if latencies:
+        metrics.update(latency_stats(latencies))
+    return metrics
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(config: MockConfig) -> Tuple[subprocess.Popen, str]:
+    """在子进程中启动模拟服务, 就绪后返回进程和地址"""
+    port = free_port()
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_firecrawl.py"),
+               "--port", str(port)]
+    for key, value in config.to_dict().items():
+        command += [f"--{key.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("模拟服务启动失败")
+        try:
+            urllib.request.urlopen(f"{base_url}/health", timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("模拟服务启动超时")
+
+
+def server_stats(base_url: str) -> Dict:
+    with urllib.request.urlopen(f"{base_url}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """逐项比较两次运行的指标, 返回变化列表, 变差超过 threshold 的标记为回归"""
+    rows = []
+    for name, metrics in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            value, old = metrics.get(metric), base.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append({"scenario": name, "metric": metric, "baseline": old, "current": value,
+                         "change": round(change * 100, 1), "regression": worse > threshold})
+    return rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Firecrawl 客户端基准测试")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"要运行的场景, 默认全部: {', '.join(SCENARIOS)}")
+    parser.add_argument("--pages", type=int, default=1000, help="每个场景的页面/URL数")
+    parser.add_argument("--requests", type=int, default=50, help="map/search 场景的请求数")
+    parser.add_argument("--jobs", type=int, default=20, help="deep-research/llmstxt 场景的并发任务数")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("--trace-alloc", action="store_true", help="网络场景也用 tracemalloc 统计每页分配")
+    parser.add_argument("--save", default=None, help="将结果保存为JSON基线")
+    parser.add_argument("--compare", default=None, help="与该基线比较")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true", help="有回归时以退出码 1 结束")
+    defaults = MockConfig(latency="lognormal:50,0.5", research_seconds=3.0)
+    for key, value in defaults.to_dict().items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                            help="模拟服务参数")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    config = MockConfig(**{k: getattr(args, k) for k in MockConfig().to_dict()})
+    # 模拟服务按 job_rate 推进, 任务型场景的规模与 --pages 一致
+    config.crawl_pages = max(config.crawl_pages, args.pages)
+    names = args.scenarios or SCENARIOS
+    unknown = [name for name in names if name not in RUNNERS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    process, args.base_url = start_mock_server(config)
+    context = multiprocessing.get_context("spawn")
+    scenarios = {}
+    try:
+        for name in names:
+            with context.Pool(1) as pool:
+                scenarios[name] = pool.apply(run_scenario, (name, args))
+            print(f"{name:>14}: " + ", ".join(f"{k}={v}" for k, v in scenarios[name].items()), file=sys.stderr)
+        requests = server_stats(args.base_url)["requests"]
+    finally:
+        process.terminate()
+        process.wait()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "pages": args.pages,
+            "mock": config.to_dict(),
+        },
+        "scenarios": scenarios,
+        "server_requests": requests,
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    code = 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(baseline, result, args.threshold)
+        for row in rows:
+            flag = "回归" if row["regression"] else ""
+            print(f"{row['scenario']:>14} {row['metric']:<22} {row['baseline']:>12} -> {row['current']:>12}"
+                  f" ({row['change']:+.1f}%) {flag}", file=sys.stderr)
+        if args.fail_on_regression and any(row["regression"] for row in rows):
+            code = 1
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
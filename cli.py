@@ -0,0 +1,316 @@
+"""Firecrawl 命令行工具, 不依赖 Streamlit, 可用于定时任务和 ETL
+
+示例:
+    python cli.py scrape -i urls.txt -c 20 -o results.ndjson
+    cat urls.txt | python cli.py scrape --batch-api --output-dir output
+    python cli.py crawl https://example.com --limit 200 > pages.ndjson
+    python cli.py map https://example.com --limit 1000 --scrape
+
+结果逐条以 NDJSON 写到标准输出或 -o 指定的文件, 汇总信息写到标准错误。
+退出码: 0 全部成功, 1 部分失败, 2 参数错误, 3 全部失败或任务失败, 130 被中断。
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from async_utils import AsyncFirecrawlClient
+from crawl import parse_crawl_results
+from map import map_url
+from url_canon import dedup_urls
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+logger = logging.getLogger("firecrawl.cli")
+
+
+class ResultWriter:
+    """把结果逐条写为 NDJSON, 可选同时按清单增量保存 markdown
+
+    指定 output_dir 时每页 markdown 收到即写入文件, 不在内存中累积。
+    """
+
+    def __init__(self, output: str = "-", output_dir: Optional[str] = None):
+        self.file = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+        self.sync = None
+        if output_dir:
+            from manifest import MarkdownSync
+            # 只保存本次结果, 不删除之前运行保存的页面
+            self.sync = MarkdownSync(output_dir, prune=False)
+        self.counts = {"ok": 0, "failed": 0}
+
+    def write(self, record: Dict):
+        self.counts["failed" if record.get("error") else "ok"] += 1
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        if self.sync and record.get("markdown"):
+            self.sync.add(record)
+
+    def close(self) -> Optional[Dict]:
+        """关闭输出, 指定了 output_dir 时保存清单并返回变化报告"""
+        if self.file is not sys.stdout:
+            self.file.close()
+        if not self.sync:
+            return None
+        report = self.sync.close()
+        return {k: len(v) if isinstance(v, list) else v for k, v in report.items() if k != "files"}
+
+
+def read_urls(inputs: List[str], path: Optional[str]) -> List[str]:
+    """合并命令行参数和文件/标准输入中的URL, 忽略空行和 # 开头的注释"""
+    lines = list(inputs)
+    if path == "-" or (path is None and not inputs and not sys.stdin.isatty()):
+        lines.extend(sys.stdin)
+    elif path:
+        with open(path, "r", encoding="utf-8") as f:
+            lines.extend(f)
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+def page_record(doc: Dict, source: Optional[str] = None) -> Dict:
+    """将抓取文档转为输出记录, 字段与 parse_crawl_results 一致"""
+    pages = parse_crawl_results([doc])
+    record = pages[0] if pages else {"url": source or ""}
+    record.pop("html", None)
+    if source:
+        record["input"] = source
+    error = (doc.get("metadata") or {}).get("error")
+    if error and not record.get("markdown"):
+        record["error"] = error
+    return record
+
+
+def error_record(url: str, result) -> Dict:
+    message = str(result) if isinstance(result, Exception) else (result.get("message") or result.get("error"))
+    return {"url": url, "input": url, "error": message or "未知错误"}
+
+
+def scrape_options(args) -> Dict:
+    options = {"formats": ["markdown"], "onlyMainContent": args.only_main, "mobile": args.mobile}
+    if args.wait_for:
+        options["waitFor"] = args.wait_for
+    return options
+
+
+def make_client(args) -> AsyncFirecrawlClient:
+    cache = None
+    if getattr(args, "cache", False):
+        from scrape_cache import ScrapeCache
+        cache = ScrapeCache(
+            cache_dir=os.getenv("SCRAPE_CACHE_DIR", ".scrape_cache"),
+            ttl=float(os.getenv("SCRAPE_CACHE_TTL", 24 * 3600)),
+            max_bytes=int(os.getenv("SCRAPE_CACHE_MAX_MB", 512)) * 1024 * 1024,
+        )
+    return AsyncFirecrawlClient(args.api_url, args.api_key, max_concurrency=args.concurrency, cache=cache)
+
+
+async def run_scrape(args, writer: ResultWriter) -> int:
+    urls = read_urls(args.urls, args.input)
+    if not urls:
+        logger.error("没有输入URL")
+        return EXIT_USAGE
+    if args.dedup:
+        urls, stats = dedup_urls(urls)
+        logger.info(f"规范化去重: 输入 {stats['input']} 个, 保留 {stats['unique']} 个")
+    options = scrape_options(args)
+
+    async with make_client(args) as client:
+        if args.batch_api:
+            try:
+                async for doc in client.iter_batch_scrape(urls, options):
+                    writer.write(page_record(doc))
+            except RuntimeError as e:
+                logger.error(str(e))
+                return EXIT_FAILED
+        else:
+            # 结果按输入顺序输出, 在途条目数有界
+            from ordered_output import iter_ordered
+            async for _, url, result in iter_ordered(
+                urls, lambda url: client.scrape(url, options), window=args.concurrency * 4
+            ):
+                if isinstance(result, Exception) or result.get("error") or not result.get("data"):
+                    writer.write(error_record(url, result))
+                else:
+                    writer.write(page_record(result["data"], url))
+    return exit_code(writer.counts)
+
+
+async def run_crawl(args, writer: ResultWriter) -> int:
+    from poll_scheduler import PollScheduler
+    options = {"limit": args.limit, "scrapeOptions": scrape_options(args)}
+    if args.max_depth:
+        options["maxDepth"] = args.max_depth
+    scheduler = PollScheduler()
+    async with make_client(args) as client:
+        job = await client.start_crawl(args.url, options)
+        if job.get("error") or not job.get("id"):
+            logger.error(f"爬取任务提交失败: {job.get('message', job)}")
+            return EXIT_FAILED
+        logger.info(f"爬取任务已提交: {job['id']}")
+        scheduler.track(job["id"], 2.0)
+
+        def show_status(status: Dict):
+            logger.info(f"爬取进度: {status.get('completed', 0)}/{status.get('total', 0)}")
+
+        try:
+            async for doc in client.iter_crawl_results(
+                job["id"], on_status=show_status, wait=lambda status: scheduler.wait(job["id"], status)
+            ):
+                writer.write(page_record(doc))
+        except RuntimeError as e:
+            logger.error(str(e))
+            return EXIT_FAILED
+        finally:
+            scheduler.close()
+    return exit_code(writer.counts)
+
+
+async def run_map(args, writer: ResultWriter) -> int:
+    if args.scrape:
+        return await run_map_scrape(args, writer)
+    # map_url 为同步调用, 放到线程中执行
+    result = await asyncio.to_thread(
+        map_url, args.url, search=args.search, api_url=v1_url(args.api_url), api_key=args.api_key,
+        limit=args.limit, include_subdomains=args.include_subdomains,
+        sitemap_only=args.sitemap_only, ignore_sitemap=args.ignore_sitemap,
+    )
+    if not result or result.get("error") or not result.get("success", True):
+        logger.error(f"映射失败: {(result or {}).get('message', '无响应')}")
+        return EXIT_FAILED
+    links = result.get("links") or []
+    if args.dedup:
+        links, _ = dedup_urls(links)
+    for link in links:
+        writer.write({"url": link})
+    return EXIT_OK
+
+
+async def run_map_scrape(args, writer: ResultWriter) -> int:
+    from map import build_map_payload
+    from pipeline import map_and_scrape
+    payload = build_map_payload(args.url, {
+        "limit": args.limit, "search": args.search, "include_subdomains": args.include_subdomains,
+        "sitemap_only": args.sitemap_only, "ignore_sitemap": args.ignore_sitemap,
+    })
+    payload.pop("url")
+    progress = {}
+    async with make_client(args) as client:
+        async for url, result in map_and_scrape(
+            client, args.url, payload, scrape_options(args), on_progress=progress.update,
+            sitemap_first=args.sitemap_first,
+        ):
+            if result.get("error") or not result.get("data"):
+                writer.write(error_record(url, result))
+            else:
+                writer.write(page_record(result["data"], url))
+    for error in progress.get("errors", []):
+        logger.error(f"映射失败: {error}")
+    if not progress.get("discovered") and progress.get("errors"):
+        return EXIT_FAILED
+    return exit_code(writer.counts)
+
+
+def exit_code(counts: Dict) -> int:
+    if counts["failed"] and not counts["ok"]:
+        return EXIT_FAILED
+    return EXIT_PARTIAL if counts["failed"] else EXIT_OK
+
+
+def v1_url(api_url: str) -> str:
+    """同步接口函数的地址需要带 /v1, 异步客户端会自行去掉"""
+    api_url = api_url.rstrip("/")
+    return api_url if api_url.endswith("/v1") else f"{api_url}/v1"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="firecrawl", description="Firecrawl 命令行工具")
+    parser.add_argument("--api-url", default=None, help="默认读取 FIRECRAWL_API_URL")
+    parser.add_argument("--api-key", default=None, help="默认读取 FIRECRAWL_API_KEY")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON 输出文件, 默认标准输出")
+    parser.add_argument("--output-dir", default=None, help="同时将 markdown 增量保存到该目录")
+    parser.add_argument("-c", "--concurrency", type=int, default=10, help="初始并发数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出进度日志")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_scrape_options(p):
+        p.add_argument("--no-main-only", dest="only_main", action="store_false", help="保留页面全部内容")
+        p.add_argument("--mobile", action="store_true", help="模拟移动端")
+        p.add_argument("--wait-for", type=int, default=0, help="页面加载后等待的毫秒数")
+
+    scrape = sub.add_parser("scrape", help="抓取URL列表")
+    scrape.add_argument("urls", nargs="*", help="要抓取的URL, 也可通过 -i 或标准输入提供")
+    scrape.add_argument("-i", "--input", default=None, help="URL列表文件, 每行一个, - 表示标准输入")
+    scrape.add_argument("--batch-api", action="store_true", help="使用服务端批量任务接口")
+    scrape.add_argument("--cache", action="store_true", help="使用本地抓取缓存")
+    scrape.add_argument("--dedup", action="store_true", help="按规范化形式去重URL, 保留每组首次出现的原始URL")
+    add_scrape_options(scrape)
+
+    crawl = sub.add_parser("crawl", help="爬取网站")
+    crawl.add_argument("url")
+    crawl.add_argument("--limit", type=int, default=100, help="最大页面数")
+    crawl.add_argument("--max-depth", type=int, default=None, help="最大爬取深度")
+    add_scrape_options(crawl)
+
+    mapping = sub.add_parser("map", help="映射网站链接")
+    mapping.add_argument("url")
+    mapping.add_argument("--search", default=None, help="搜索关键词")
+    mapping.add_argument("--limit", type=int, default=5000, help="最大链接数")
+    mapping.add_argument("--include-subdomains", action="store_true")
+    mapping.add_argument("--sitemap-only", action="store_true")
+    mapping.add_argument("--ignore-sitemap", action="store_true")
+    mapping.add_argument("--dedup", action="store_true", help="按规范化形式去重链接, 保留每组首次出现的原始链接")
+    mapping.add_argument("--scrape", action="store_true", help="边映射边抓取发现的链接, 输出页面内容")
+    mapping.add_argument("--sitemap-first", action="store_true",
+                         help="与 --scrape 同用: 先读站点地图尽早开始抓取, 会多一次映射请求")
+    add_scrape_options(mapping)
+    return parser
+
+
+COMMANDS = {"scrape": run_scrape, "crawl": run_crawl, "map": run_map}
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    load_dotenv()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+        stream=sys.stderr,
+    )
+    args.api_url = args.api_url or os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev/v1")
+    args.api_key = args.api_key or os.getenv("FIRECRAWL_API_KEY", "")
+    if args.concurrency < 1:
+        parser.error("--concurrency 必须大于 0")
+
+    try:
+        writer = ResultWriter(args.output, args.output_dir)
+    except OSError as e:
+        logger.error(f"无法打开输出文件: {e}")
+        return EXIT_USAGE
+    try:
+        code = asyncio.run(COMMANDS[args.command](args, writer))
+    except KeyboardInterrupt:
+        # 中断时同样保存清单和变化报告, 下次增量运行不必重写已保存的页面
+        code = EXIT_INTERRUPTED
+    except BrokenPipeError:
+        # 下游提前关闭管道(如 | head), 把剩余输出丢弃, 避免退出时再次报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        code = EXIT_OK
+    report = writer.close()
+    summary = {"command": args.command, **writer.counts, "exit_code": code}
+    if report:
+        summary["saved"] = report
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Optional
+
+# 触发乘性减小的状态码; 0 表示请求未得到响应(网络异常)
+OVERLOAD_STATUS = {0, 429, 502, 503, 504}
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器
+
+    每完成一个窗口(约等于当前并发数)的请求评估一次: p95 延迟和错误率健康时
+    并发加一; 遇到 429/503 等过载响应或延迟突增时并发减半。
+    收到 Retry-After 时, 在指定时间前暂停发放新的并发名额。
+    """
+
+    def __init__(self, initial: int = 10, min_limit: int = 1, max_limit: int = 64,
+                 backoff: float = 0.5, spike_factor: float = 3.0,
+                 max_error_rate: float = 0.05, sample_size: int = 200):
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.spike_factor = spike_factor
+        self.max_error_rate = max_error_rate
+        self.in_flight = 0
+        self._latencies = deque(maxlen=sample_size)
+        self._baseline = None
+        self._window_done = 0
+        self._window_errors = 0
+        self._window_latencies = []
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._condition = None
+
+    async def acquire(self):
+        """等待可用的并发名额"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        while True:
+            delay = self._blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            async with self._condition:
+                if self.in_flight < max(int(self.limit), self.min_limit):
+                    self.in_flight += 1
+                    return
+                await self._condition.wait()
+
+    async def release(self, latency: float, status: int, retry_after: Optional[float] = None):
+        """归还名额并记录本次请求的延迟和状态码"""
+        now = time.monotonic()
+        self.in_flight -= 1
+        overloaded = status in OVERLOAD_STATUS
+
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+        if overloaded:
+            self._window_errors += 1
+            self._decrease(now)
+        else:
+            self._latencies.append(latency)
+            self._window_latencies.append(latency)
+        self._window_done += 1
+
+        if self._window_done >= max(int(self.limit), 1):
+            self._evaluate_window(now)
+
+        async with self._condition:
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict:
+        """当前并发窗口和统计信息, 供进度显示使用"""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "p95": _percentile(self._latencies, 0.95),
+            "baseline": self._baseline,
+            "paused": max(0.0, self._blocked_until - time.monotonic()),
+        }
+
+    def _evaluate_window(self, now: float):
+        latencies = self._window_latencies
+        error_rate = self._window_errors / self._window_done
+        self._window_done = 0
+        self._window_errors = 0
+        self._window_latencies = []
+        if not latencies:
+            return
+
+        p50 = _percentile(latencies, 0.5)
+        p95 = _percentile(latencies, 0.95)
+        # 基线取各窗口 p50 的较低平滑值, 延迟整体抬升时缓慢跟随
+        if self._baseline is None:
+            self._baseline = p50
+        else:
+            self._baseline = min(p50, self._baseline * 0.9 + p50 * 0.1)
+
+        if p95 > self._baseline * self.spike_factor:
+            self._decrease(now)
+        elif error_rate <= self.max_error_rate:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def _decrease(self, now: float):
+        # 同一批过载响应只减一次, 避免并发被连续减到最小
+        cooldown = self._baseline or 1.0
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,251 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from page_analysis import _CJK
+
+# 单个事务写入的页面数
+INSERT_BATCH_SIZE = 500
+# 少于该字符数的检索词无法用 trigram 索引, 改查二元词索引
+TRIGRAM_MIN = 3
+
+_CJK_RUN_RE = re.compile(rf"[{_CJK}]+")
+_TOKEN_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    markdown TEXT,
+    source_url TEXT,
+    status_code INTEGER,
+    job_id TEXT,
+    source TEXT,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS pages_job ON pages(job_id);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, title, markdown) VALUES (new.id, new.title, new.markdown);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, title, markdown) VALUES ('delete', old.id, old.title, old.markdown);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, title, markdown) VALUES ('delete', old.id, old.title, old.markdown);
+    INSERT INTO pages_fts(rowid, title, markdown) VALUES (new.id, new.title, new.markdown);
+END;
+"""
+
+# 短词索引: 无内容表, 写入经 cjk_segment() 切分后的文本, 由 unicode61 分词
+BIGRAM_SCHEMA = """
+CREATE VIRTUAL TABLE pages_bigram USING fts5(title, markdown, content='', tokenize='unicode61');
+CREATE TRIGGER pages_bigram_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_bigram(rowid, title, markdown)
+    VALUES (new.id, cjk_segment(new.title), cjk_segment(new.markdown));
+END;
+CREATE TRIGGER pages_bigram_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_bigram(pages_bigram, rowid, title, markdown)
+    VALUES ('delete', old.id, cjk_segment(old.title), cjk_segment(old.markdown));
+END;
+CREATE TRIGGER pages_bigram_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_bigram(pages_bigram, rowid, title, markdown)
+    VALUES ('delete', old.id, cjk_segment(old.title), cjk_segment(old.markdown));
+    INSERT INTO pages_bigram(rowid, title, markdown)
+    VALUES (new.id, cjk_segment(new.title), cjk_segment(new.markdown));
+END;
+INSERT INTO pages_bigram(rowid, title, markdown)
+SELECT id, cjk_segment(title), cjk_segment(markdown) FROM pages;
+"""
+
+UPSERT = """
+INSERT INTO pages (url, title, markdown, source_url, status_code, job_id, source, fetched_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(url) DO UPDATE SET
+    title = excluded.title,
+    markdown = excluded.markdown,
+    source_url = excluded.source_url,
+    status_code = excluded.status_code,
+    job_id = excluded.job_id,
+    source = excluded.source,
+    fetched_at = excluded.fetched_at
+"""
+
+
+class CorpusIndex:
+    """基于 SQLite FTS5 的本地页面语料库
+
+    标题和 markdown 建立两个全文索引: pages_fts 使用 trigram 分词, 支持
+    3 个字符以上的子串检索; pages_bigram 把中日韩文字切成以每个字开头的
+    二元词(连续段的最后一个字单独成词)后用 unicode61 分词, 用于两个汉字等
+    短词的检索。sourceURL、statusCode 和任务ID作为元数据列保存。
+    """
+
+    def __init__(self, path: str = "corpus.db"):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5("
+                "title, markdown, content='pages', content_rowid='id', tokenize='trigram')"
+            )
+            conn.executescript(SCHEMA)
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'pages_bigram'"
+            ).fetchone()
+            if not exists:
+                # 新库或旧版本的库: 建表并为已有页面补建短词索引
+                conn.executescript(BIGRAM_SCHEMA)
+
+    def add_pages(self, pages: Iterable[Dict], source: str, job_id: Optional[str] = None) -> int:
+        """批量写入页面, 每 INSERT_BATCH_SIZE 条一个事务, 返回写入数量
+
+        页面为 parse_crawl_results 的输出或含 url/title/markdown 的字典,
+        同一URL再次写入时覆盖旧内容。
+        """
+        count = 0
+        rows = []
+        with self._connect() as conn:
+            for page in pages:
+                url = page.get("url")
+                if not url or not page.get("markdown"):
+                    continue
+                metadata = page.get("metadata") or {}
+                rows.append((
+                    url,
+                    page.get("title") or metadata.get("title"),
+                    page["markdown"],
+                    metadata.get("sourceURL", url),
+                    page.get("status_code", metadata.get("statusCode")),
+                    job_id,
+                    source,
+                    time.time(),
+                ))
+                if len(rows) >= INSERT_BATCH_SIZE:
+                    count += self._flush(conn, rows)
+            count += self._flush(conn, rows)
+        return count
+
+    def search(self, query: str, limit: int = 20, source: Optional[str] = None) -> List[Dict]:
+        """全文检索, 按 bm25 相关度排序并返回高亮片段
+
+        检索词之间为 AND。3 个字符以上的词在 trigram 索引中按子串匹配;
+        更短的词(如两个汉字、AI)在二元词索引中按词前缀匹配, 同样走索引
+        并参与 bm25 排序。
+        """
+        terms = [t for t in query.split() if t]
+        long_terms = [t for t in terms if len(t) >= TRIGRAM_MIN]
+        short_terms = [t for t in terms if len(t) < TRIGRAM_MIN]
+        short_query = _bigram_query(short_terms)
+        if not long_terms and not short_query:
+            return []
+
+        tables, where, ranks, params = [], [], [], []
+        if long_terms:
+            snippet = "snippet(pages_fts, 1, '**', '**', '…', 24)"
+            tables.append("JOIN pages_fts ON pages_fts.rowid = p.id")
+            where.append("pages_fts MATCH ?")
+            ranks.append("bm25(pages_fts, 5.0, 1.0)")
+            params.append(_quote(long_terms))
+        else:
+            # 无内容的二元词表不能生成片段, 按第一个短词截取上下文
+            snippet = "substr(p.markdown, max(1, instr(p.markdown, ?) - 40), 120)"
+            params.append(short_terms[0])
+        if short_query:
+            tables.append("JOIN pages_bigram ON pages_bigram.rowid = p.id")
+            where.append("pages_bigram MATCH ?")
+            ranks.append("bm25(pages_bigram, 5.0, 1.0)")
+            params.append(short_query)
+        if source:
+            where.append("p.source = ?")
+            params.append(source)
+        sql = (
+            "SELECT p.url, p.title, p.source, p.job_id, p.status_code, "
+            f"{snippet} AS snippet, {' + '.join(ranks)} AS rank "
+            f"FROM pages p {' '.join(tables)} WHERE {' AND '.join(where)} "
+            "ORDER BY rank, p.fetched_at DESC LIMIT ?"
+        )
+        params.append(limit)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def get_markdown(self, url: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT markdown FROM pages WHERE url = ?", (url,)).fetchone()
+            return row[0] if row else None
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            by_source = dict(conn.execute("SELECT source, COUNT(*) FROM pages GROUP BY source"))
+        return {"pages": total, "by_source": by_source, "bytes": os.path.getsize(self.path)}
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        # 短词索引的触发器在写入时调用
+        conn.create_function("cjk_segment", 1, cjk_segment, deterministic=True)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _flush(conn: sqlite3.Connection, rows: List) -> int:
+        if not rows:
+            return 0
+        with conn:
+            conn.executemany(UPSERT, rows)
+        count = len(rows)
+        rows.clear()
+        return count
+
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus() -> CorpusIndex:
+    """返回进程级共享的语料库, 路径由 CORPUS_DB 环境变量指定"""
+    global _corpus
+    with _corpus_lock:
+        if _corpus is None:
+            _corpus = CorpusIndex(os.getenv("CORPUS_DB", "corpus.db"))
+        return _corpus
+
+
+def _quote(terms: List[str]) -> str:
+    """将检索词转为 FTS5 短语查询, 各词之间为 AND"""
+    return " ".join('"{}"'.format(t.replace('"', '""')) for t in terms)
+
+
+def cjk_segment(text: Optional[str]) -> str:
+    """把中日韩文字的连续段切成以每个字开头的二元词, 段末的字单独成词, 以空格分隔
+
+    例如 "数据分析" 切为 "数据 据分 分析 析", 其他文字保持原样。
+    """
+    if not text:
+        return ""
+    return _CJK_RUN_RE.sub(
+        lambda m: " " + " ".join(m.group(0)[i:i + 2] for i in range(len(m.group(0)))) + " ", text
+    )
+
+
+def _bigram_query(terms: List[str]) -> str:
+    """将短检索词转为二元词索引上的短语前缀查询, 各词之间为 AND
+
+    检索词按与页面相同的规则切分, 最后一个词加前缀匹配, 因此单个汉字、
+    两个汉字和短英文词都能命中以其开头的词。
+    """
+    phrases = []
+    for term in terms:
+        tokens = _TOKEN_RE.findall(cjk_segment(term))
+        if tokens:
+            phrases.append('"{}"*'.format(" ".join(tokens)))
+    return " ".join(phrases)
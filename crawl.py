@@ -18,41 +18,28 @@ def parse_crawl_results(results):
         if not isinstance(content, dict):
             content = {}
 
+        metadata = content.get("metadata") or {}
         parsed.append(
             {
-                "url": content.get("url", ""),
+                "url": content.get("url") or metadata.get("sourceURL", ""),
                 "title": content.get("title")
-                or content.get("metadata", {}).get("title", "无标题"),
+                or metadata.get("title", "无标题"),
                 "markdown": content.get("markdown", ""),
                 "html": content.get("html", ""),
-                "metadata": content.get("metadata", {}),
+                "metadata": metadata,
             }
         )
     return parsed
 
 
-def save_markdown(results, output_dir="output"):
-    """将markdown内容保存到文件"""
-    import os
-    import hashlib
+def save_markdown(results, output_dir="output", root=None, prune=False):
+    """将markdown内容保存到文件, 只写入新增或变化的页面, 返回本次写入的文件列表
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    prune 为 True 时同时删除以同一起始URL root 爬取、本次已不存在的页面。
+    """
+    from manifest import sync_markdown
 
-    saved_files = []
-    for result in results:
-        if not result.get("markdown"):
-            continue
-
-        # 使用URL生成文件名
-        url_hash = hashlib.md5(result["url"].encode()).hexdigest()
-        filename = f"{output_dir}/{url_hash}.md"
-
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(result["markdown"])
-            saved_files.append(filename)
-
-    return saved_files
+    return sync_markdown(results, output_dir, prune=prune, root=root)["files"]
 
 
 def copy_markdown(results):
@@ -0,0 +1,159 @@
+import re
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from urllib.parse import urlsplit
+from page_analysis import _CJK, _CJK_RE, _WORD_RE, estimate_tokens, get_process_pool
+
+# 判定为近似重复的最大汉明距离; 无关页面的期望距离约为32
+MAX_DISTANCE = 4
+# 每个 shingle 包含的词数
+SHINGLE_SIZE = 4
+# 每块交给进程池计算指纹的页面数
+FINGERPRINT_CHUNK_SIZE = 2000
+# 同一分桶内最多比较的候选数, 防止模板化页面形成超大桶
+MAX_BUCKET_COMPARISONS = 128
+
+# 与页面统计相同的分词: 中日韩单字或其他连续字母数字
+_TOKEN_RE = re.compile(rf"[{_CJK}]|{_WORD_RE.pattern}")
+# _BIT_TABLES[j] 将字节映射为其第 j 位, 配合 bytes.translate/count 在C层统计位计数
+_BIT_TABLES = [bytes((v >> j) & 1 for v in range(256)) for j in range(8)]
+
+
+def fingerprint(markdown: str) -> Tuple[int, int]:
+    """计算 64 位 SimHash 指纹, 同时返回近似 token 数
+
+    词按中日韩单字或其他连续字母数字切分, 每 SHINGLE_SIZE 个词组成一个
+    shingle, 用 8 字节 blake2b 作为稳定哈希(不受进程哈希随机化影响)。
+    """
+    tokens = _TOKEN_RE.findall(markdown.lower())
+    cjk = len(_CJK_RE.findall(markdown))
+    token_count = estimate_tokens(cjk, len(tokens) - cjk)
+    if not tokens:
+        return 0, 0
+
+    shingles = {
+        " ".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8")
+        for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))
+    }
+    data = b"".join(hashlib.blake2b(s, digest_size=8).digest() for s in shingles)
+    half = len(shingles) / 2
+    value = 0
+    for k in range(8):
+        column = data[k::8]
+        for j in range(7, -1, -1):
+            value = (value << 1) | (column.translate(_BIT_TABLES[j]).count(1) > half)
+    return value, token_count
+
+
+def _fingerprint_chunk(markdowns: List[str]) -> List[Tuple[int, int]]:
+    return [fingerprint(md) for md in markdowns]
+
+
+def _iter_fingerprints(pages: Iterable[Dict]) -> Iterator[Tuple[Dict, int, int]]:
+    """分块计算指纹, 页面较多时交给进程池; 产出 (页面, 指纹, token数)"""
+    chunk = []
+
+    def flush():
+        markdowns = [page.get("markdown") or "" for page in chunk]
+        if len(markdowns) >= 64:
+            step = max(1, len(markdowns) // 16)
+            parts = [markdowns[i:i + step] for i in range(0, len(markdowns), step)]
+            results = [fp for part in get_process_pool().map(_fingerprint_chunk, parts) for fp in part]
+        else:
+            results = _fingerprint_chunk(markdowns)
+        for page, (fp, tokens) in zip(chunk, results):
+            yield page, fp, tokens
+        chunk.clear()
+
+    for page in pages:
+        chunk.append(page)
+        if len(chunk) >= FINGERPRINT_CHUNK_SIZE:
+            yield from flush()
+    if chunk:
+        yield from flush()
+
+
+def _canonical_key(page: Tuple[str, int]):
+    """簇内挑选规范页面: 优先无查询参数、URL较短、内容较长"""
+    url, size = page
+    return (bool(urlsplit(url).query), len(url), -size)
+
+
+def find_duplicates(pages: Iterable[Dict], max_distance: int = MAX_DISTANCE) -> Dict:
+    """流式扫描页面, 找出近似重复簇
+
+    将 64 位指纹分成 max_distance+1 段, 汉明距离不超过 max_distance 的两个
+    指纹至少有一段完全相同(抽屉原理), 因此只需比较同段同值的候选, 总体接近线性。
+    内存中每页只保留URL、大小和指纹。返回的 removed 为应去除的页面下标集合。
+    """
+    bands = max_distance + 1
+    width = 64 // bands
+    mask = (1 << width) - 1
+
+    meta = []          # 下标 -> (url, size, tokens)
+    parent = []        # 并查集
+    exact = {}         # 指纹 -> 首个下标
+    buckets = {}       # (段号, 段值) -> [(指纹, 下标)]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+
+    for i, (page, fp, tokens) in enumerate(_iter_fingerprints(pages)):
+        markdown = page.get("markdown") or ""
+        meta.append((page.get("url", ""), len(markdown.encode("utf-8")), tokens))
+        parent.append(i)
+        if not markdown:
+            continue
+        if fp in exact:
+            union(exact[fp], i)
+            continue
+        exact[fp] = i
+        for band in range(bands):
+            key = (band, (fp >> (band * width)) & mask)
+            candidates = buckets.setdefault(key, [])
+            for other_fp, j in candidates[-MAX_BUCKET_COMPARISONS:]:
+                if bin(fp ^ other_fp).count("1") <= max_distance:
+                    union(j, i)
+            candidates.append((fp, i))
+
+    clusters = {}
+    for i in range(len(meta)):
+        clusters.setdefault(find(i), []).append(i)
+
+    removed: Set[int] = set()
+    duplicates = []
+    bytes_saved = tokens_saved = 0
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        canonical = min(members, key=lambda i: _canonical_key(meta[i][:2]))
+        dups = [i for i in members if i != canonical]
+        removed.update(dups)
+        bytes_saved += sum(meta[i][1] for i in dups)
+        tokens_saved += sum(meta[i][2] for i in dups)
+        duplicates.append({"canonical": meta[canonical][0], "duplicates": [meta[i][0] for i in dups]})
+
+    return {
+        "pages": len(meta),
+        "kept": len(meta) - len(removed),
+        "removed": removed,
+        "clusters": len(duplicates),
+        "bytes_saved": bytes_saved,
+        "tokens_saved": tokens_saved,
+        "duplicates": duplicates,
+    }
+
+
+def skip_indices(items: Iterable, removed: Set[int]) -> Iterator:
+    """按下标跳过 find_duplicates 标记的页面, 适用于与页面一一对应的记录"""
+    for i, item in enumerate(items):
+        if i not in removed:
+            yield item
@@ -1,13 +1,15 @@
 import os
-import requests
+from http_pool import request_json
 import streamlit as st
 from dotenv import load_dotenv
-from time import sleep
+from job_manager import get_job_manager, TERMINAL_STATUS
+from job_panel import render_job_status, select_job
 
 # 加载环境变量
 load_dotenv()
 API_URL = os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev/v1")
 API_KEY = os.getenv("FIRECRAWL_API_KEY")
+job_manager = get_job_manager(API_URL, API_KEY)
 
 # 初始化session状态
 if 'job_id' not in st.session_state:
@@ -29,64 +31,17 @@ def submit_deep_research(query, options):
     }
 
     try:
-        response = requests.post(
+        return request_json(
+            "POST",
             f"{API_URL}/deep-research",
             headers=headers,
-            json=payload
+            json=payload,
+            idempotent=False
         )
-        response.raise_for_status()
-        return response.json()
     except Exception as e:
         st.error(f"提交失败: {str(e)}")
         return None
 
-def get_job_results(job_id):
-    """获取任务结果"""
-    headers = {"Authorization": f"Bearer {API_KEY}"}
-    try:
-        response = requests.get(
-            f"{API_URL}/deep-research/{job_id}",
-            headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        st.error(f"获取结果失败: {str(e)}")
-        return None
-
-def poll_job_status(job_id):
-    """轮询任务状态直到完成或失败"""
-    placeholder = st.empty()
-    max_attempts = 60  # 最大尝试次数 (约10分钟，每10秒检查一次)
-    attempts = 0
-    
-    while attempts < max_attempts:
-        results = get_job_results(job_id)
-        if not results:
-            placeholder.error("无法获取任务状态")
-            return None
-            
-        status = results.get("status")
-        if status == "completed":
-            placeholder.empty()
-            return results
-        elif status == "failed":
-            placeholder.error(f"研究任务失败: {results.get('message', '未知错误')}")
-            return None
-            
-        # 显示当前活动状态
-        current_activity = results.get("data", {}).get("activities", [{}])[-1]
-        status_text = f"处理中...\n当前深度: {results.get('currentDepth', 0)}/{results.get('maxDepth', 0)}\n"
-        status_text += f"活动: {current_activity.get('type', 'unknown')} - {current_activity.get('message', '')}"
-        status_text += f"\n尝试 {attempts+1}/{max_attempts}"
-        
-        placeholder.text(status_text)
-        sleep(10)  # 每10秒检查一次
-        attempts += 1
-        
-    placeholder.error("研究任务超时")
-    return None
-
 # Streamlit界面
 st.title("🔍 Firecrawl 深度研究工具")
 
@@ -126,44 +81,56 @@ if st.button("开始研究") and query:
         st.error(f"任务提交失败: {result.get('message', '未知错误')}")
     elif not result.get("id"):
         st.error("任务提交失败: 未返回作业ID")
-        
-    st.session_state.job_id = result["id"]
-    st.success(f"研究任务已提交！作业ID: {result['id']}")
+    else:
+        # 由后台任务管理器轮询, 页面不再阻塞等待
+        job_manager.submit("deep-research", result["id"], label=query.strip()[:80])
+        st.session_state.job_id = result["id"]
+        st.session_state.results = None
+        st.success(f"研究任务已提交！作业ID: {result['id']}")
+
+reopened = select_job(job_manager, "deep-research", key="research_jobs")
+if reopened:
+    st.session_state.job_id = reopened
+    st.session_state.results = None
 
 # 结果显示
 if st.session_state.job_id:
     st.divider()
     st.subheader("研究结果")
     
-    with st.spinner("获取结果中..."):
-        results = poll_job_status(st.session_state.job_id)
-            
-        if results:
-            st.session_state.results = results
-            st.success("研究完成！")
+    job = job_manager.get(st.session_state.job_id)
+    if job is None or job["status"] not in TERMINAL_STATUS:
+        render_job_status(job_manager, st.session_state.job_id)
+    elif job["status"] != "completed":
+        st.error(f"研究任务失败: {job.get('error') or '未知错误'}")
+    else:
+        results = job["result"] or {}
+        st.session_state.results = results
+        st.success("研究完成！")
+        
+        if not results.get("data"):
+            st.warning("没有获取到任何结果数据")
+        data = results.get("data") or {}
             
-            if not results.get("data"):
-                st.warning("没有获取到任何结果数据")
-                
-            # 显示最终分析
-            final_analysis = results["data"].get("finalAnalysis")
-            if final_analysis:
-                st.subheader("最终分析")
-                st.markdown(final_analysis)
-                
-                # 下载按钮
-                st.download_button(
-                    label="下载分析结果",
-                    data=final_analysis,
-                    file_name="research_analysis.md",
-                    key="dl_analysis"
-                )
+        # 显示最终分析
+        final_analysis = data.get("finalAnalysis")
+        if final_analysis:
+            st.subheader("最终分析")
+            st.markdown(final_analysis)
             
-            # 显示来源
-            sources = results["data"].get("sources", [])
-            if sources:
-                st.subheader("研究来源")
-                for source in sources:
-                    with st.expander(f"{source.get('title', '无标题')}"):
-                        st.markdown(f"**URL**: {source.get('url', '未知')}")
-                        st.markdown(f"**描述**: {source.get('description', '无描述')}")
+            # 下载按钮
+            st.download_button(
+                label="下载分析结果",
+                data=final_analysis,
+                file_name="research_analysis.md",
+                key="dl_analysis"
+            )
+        
+        # 显示来源
+        sources = data.get("sources", [])
+        if sources:
+            st.subheader("研究来源")
+            for source in sources:
+                with st.expander(f"{source.get('title', '无标题')}"):
+                    st.markdown(f"**URL**: {source.get('url', '未知')}")
+                    st.markdown(f"**描述**: {source.get('description', '无描述')}")
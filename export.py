@@ -0,0 +1,177 @@
+import io
+import os
+import json
+import time
+import tarfile
+import hashlib
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# 写文件时的缓冲区大小, 结果按块写出, 不在内存中拼接完整内容
+CHUNK_SIZE = 1024 * 1024
+
+
+class RecordSpool:
+    """追加写入磁盘的 NDJSON 记录文件, 用于在会话中保存大量原始结果"""
+
+    def __init__(self, prefix: str = "firecrawl_records_"):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".ndjson")
+        os.close(fd)
+        self.count = 0
+
+    def append(self, record: Dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+        self.count += 1
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter_ndjson(self.path)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ResultIndex:
+    """抓取结果索引
+
+    markdown 内容按合并格式追加写入磁盘上的临时文件, 内存中只保留每页的
+    url、标题、大小和偏移量, 需要时再按偏移量读取单页内容。
+    """
+
+    def __init__(self, prefix: str = "firecrawl_results_"):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".md")
+        os.close(fd)
+        self.entries: List[Dict] = []
+        self.total_bytes = 0
+
+    def add(self, url: str, title: str, markdown: str, **extra):
+        """追加一页结果"""
+        header = f"# {url}\n\n".encode("utf-8")
+        body = markdown.encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(header)
+            f.write(body)
+            f.write(b"\n\n---\n\n")
+        self.entries.append({
+            "url": url,
+            "title": title or url,
+            "size": len(body),
+            "offset": self.total_bytes + len(header),
+            **extra,
+        })
+        self.total_bytes += len(header) + len(body) + len(b"\n\n---\n\n")
+
+    def annotate(self, i: int, fields: Dict):
+        """为第 i 页补充索引字段(如统计信息)"""
+        self.entries[i].update(fields)
+
+    def read(self, i: int) -> str:
+        """读取第 i 页的 markdown"""
+        entry = self.entries[i]
+        with open(self.path, "rb") as f:
+            f.seek(entry["offset"])
+            return f.read(entry["size"]).decode("utf-8")
+
+    def read_all(self) -> str:
+        """读取合并后的全部 markdown"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def iter_pages(self) -> Iterator[Dict]:
+        """按顺序逐页读取, 产出 {url, title, markdown}; 添加时带了 metadata 的页面一并产出"""
+        with open(self.path, "rb") as f:
+            for entry in self.entries:
+                f.seek(entry["offset"])
+                page = {
+                    "url": entry["url"],
+                    "title": entry["title"],
+                    "markdown": f.read(entry["size"]).decode("utf-8"),
+                }
+                if "metadata" in entry:
+                    page["metadata"] = entry["metadata"]
+                yield page
+
+    def search(self, query: str) -> List[int]:
+        """按URL或标题过滤, 返回匹配的下标"""
+        if not query:
+            return list(range(len(self.entries)))
+        query = query.lower()
+        return [
+            i for i, entry in enumerate(self.entries)
+            if query in entry["url"].lower() or query in entry["title"].lower()
+        ]
+
+    def close(self):
+        """删除临时文件"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def iter_ndjson(path: str) -> Iterator[Dict]:
+    """逐行读取 NDJSON 文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_ndjson(records: Iterable[Dict], fileobj):
+    """将记录逐条写为 NDJSON"""
+    for record in records:
+        fileobj.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+        fileobj.write(b"\n")
+
+
+def write_markdown(pages: Iterable[Dict], fileobj):
+    """将页面写为合并的 markdown"""
+    for page in pages:
+        fileobj.write(f"# {page.get('url', '')}\n\n".encode("utf-8"))
+        fileobj.write((page.get("markdown") or "").encode("utf-8"))
+        fileobj.write(b"\n\n---\n\n")
+
+
+def write_tar_gz(pages: Iterable[Dict], fileobj):
+    """将每个页面写为单独的 .md 文件并打包为 tar.gz"""
+    now = time.time()
+    with tarfile.open(fileobj=fileobj, mode="w|gz") as tar:
+        for page in pages:
+            url = page.get("url", "")
+            data = (page.get("markdown") or "").encode("utf-8")
+            info = tarfile.TarInfo(f"{hashlib.md5(url.encode()).hexdigest()}.md")
+            info.size = len(data)
+            info.mtime = now
+            tar.addfile(info, io.BytesIO(data))
+
+
+# 格式名 -> (写入函数, 输入类型, 文件扩展名, MIME类型)
+EXPORT_FORMATS = {
+    "NDJSON": (write_ndjson, "records", ".ndjson", "application/x-ndjson"),
+    "Markdown": (write_markdown, "pages", ".md", "text/markdown"),
+    "tar.gz": (write_tar_gz, "pages", ".tar.gz", "application/gzip"),
+}
+
+
+def export_to_file(fmt: str, records: Optional[Callable[[], Iterable[Dict]]] = None,
+                   pages: Optional[Callable[[], Iterable[Dict]]] = None) -> str:
+    """按格式将结果流式写入临时文件, 返回文件路径
+
+    records/pages 为返回迭代器的函数, 分别提供原始记录和 {url, title, markdown} 页面。
+    """
+    writer, source, suffix, _ = EXPORT_FORMATS[fmt]
+    items = (records if source == "records" else pages) or records or pages
+    fd, path = tempfile.mkstemp(prefix="firecrawl_export_", suffix=suffix)
+    with os.fdopen(fd, "wb", buffering=CHUNK_SIZE) as f:
+        writer(items(), f)
+    return path
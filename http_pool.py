@@ -0,0 +1,181 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+import aiohttp
+from typing import Dict, Optional
+from email.utils import parsedate_to_datetime
+import resilience
+import rate_limit
+import metrics
+
+# 连接池配置, 可通过环境变量覆盖
+POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 32))
+DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 120))
+
+_lock = threading.Lock()
+_loop = None
+_session = None
+
+
+class HTTPStatusError(Exception):
+    """非2xx响应"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头(秒数或HTTP日期), 无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """返回进程级后台事件循环, 首次调用时在守护线程中启动
+
+    模块级状态在 Streamlit 重跑脚本时保留, 因此连接池跨重跑复用。
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="http-pool-loop", daemon=True
+            )
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def get_session() -> aiohttp.ClientSession:
+    """返回共享的 aiohttp 会话, 只能在后台事件循环线程中调用"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=None, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+            ),
+        )
+    return _session
+
+
+async def run_async(coro):
+    """在后台事件循环中执行协程并等待结果, 可从任意事件循环调用"""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """在后台事件循环中执行协程并阻塞等待结果, 供同步代码使用"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+async def _request_json(method: str, url: str, headers: Optional[Dict],
+                        json: Optional[Dict], timeout: Optional[float],
+                        timer: "metrics.RequestTimer") -> Dict:
+    kwargs = {}
+    if timeout:
+        kwargs["timeout"] = aiohttp.ClientTimeout(
+            total=timeout, connect=CONNECT_TIMEOUT
+        )
+    async with get_session().request(
+        method, url, headers=headers, json=json, **kwargs
+    ) as response:
+        timer.received(len(await response.read()))
+        if response.status >= 400:
+            raise HTTPStatusError(
+                response.status,
+                await response.text(),
+                parse_retry_after(response.headers.get("Retry-After")),
+            )
+        return await response.json(content_type=None)
+
+
+def request_json(method: str, url: str, headers: Optional[Dict] = None,
+                 json: Optional[Dict] = None, timeout: Optional[float] = None,
+                 policy: Optional["resilience.RetryPolicy"] = None,
+                 idempotent: bool = True) -> Dict:
+    """通过共享连接池发送同步请求并返回JSON
+
+    发送前从进程级限流器取得令牌; 可重试的错误按退避策略重试,
+    并受接口熔断器保护; 每次尝试的排队和发送耗时记入进程级指标。发生过重试时
+    结果中带有 retries 字段。提交任务的 POST 应传 idempotent=False, 只在
+    确定未被受理时重试, 避免重复创建任务。非2xx响应抛出 HTTPStatusError, 超时抛出
+    TimeoutError, 熔断时抛出 resilience.CircuitOpenError。
+    """
+    endpoint = resilience.endpoint_name(url)
+    api_key = rate_limit.api_key_from_headers(headers)
+
+    async def attempt():
+        timer = metrics.get_metrics().start(endpoint, method)
+        status = 0
+        try:
+            await rate_limit.get_rate_limiter().acquire(api_key, endpoint, method)
+            timer.dispatch()
+            result = await _request_json(method, url, headers, json, timeout, timer)
+            status = 200
+            return result
+        except HTTPStatusError as e:
+            status = e.status
+            raise
+        finally:
+            timer.finish(status)
+
+    try:
+        result, retries = run_sync(
+            resilience.call_with_retry(endpoint, attempt, policy, idempotent)
+        )
+    except Exception as e:
+        metrics.get_metrics().record_call(endpoint, False, getattr(e, "retries", 0))
+        if isinstance(e, asyncio.TimeoutError):
+            raise TimeoutError(f"请求超时: {url}") from e
+        raise
+    metrics.get_metrics().record_call(endpoint, True, retries)
+    if retries and isinstance(result, dict):
+        result["retries"] = retries
+    return result
+
+
+def close():
+    """关闭共享会话"""
+    global _session
+    if _loop is None or _session is None:
+        return
+    session, _session = _session, None
+    try:
+        run_sync(session.close(), timeout=5)
+    except Exception:
+        pass
+
+
+atexit.register(close)
@@ -0,0 +1,503 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from async_utils import AsyncFirecrawlClient
+from export import iter_ndjson
+from webhook import WebhookReceiver
+from poll_scheduler import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+# 各类任务的状态查询方式和基础轮询间隔(秒), 实际间隔由 PollScheduler 按进度调整
+# documents 为流式产出文档的客户端方法, 结果逐条写入任务的 NDJSON 文件,
+# check 为其单次状态查询方法, 用于 webhook 模式下确认任务状态;
+# status 为一次性返回结果的状态查询方法, 完成时保存整个响应
+JOB_KINDS = {
+    "crawl": {"documents": "iter_crawl_results", "check": "check_crawl_status", "interval": 2.0},
+    "batch": {"documents": "iter_batch_results", "check": "check_batch_scrape_status", "interval": 2.0},
+    "deep-research": {"status": "check_deep_research_status", "interval": 10.0},
+    "llmstxt": {"status": "check_llmstxt_status", "interval": 5.0},
+}
+TERMINAL_STATUS = {"completed", "failed", "cancelled"}
+# 连续出错次数达到上限后任务记为失败
+MAX_ERRORS = 5
+# webhook 模式下超过该秒数没有收到事件时查询一次任务状态
+WEBHOOK_DEADLINE = float(os.getenv("WEBHOOK_DEADLINE", 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT,
+    status TEXT NOT NULL,
+    tracked INTEGER NOT NULL DEFAULT 1,
+    webhook INTEGER NOT NULL DEFAULT 0,
+    progress TEXT,
+    documents INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    result TEXT,
+    error TEXT,
+    submitted_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+"""
+
+_JSON_COLUMNS = ("progress", "result")
+
+
+def summarize_status(status: Dict) -> Dict:
+    """从任务状态响应中提取界面展示用的进度字段, 不含文档数据"""
+    data = status.get("data") if isinstance(status.get("data"), dict) else {}
+    activities = status.get("activities") or data.get("activities") or []
+    summary = {
+        key: status[key]
+        for key in ("status", "completed", "total", "creditsUsed", "currentDepth", "maxDepth", "expiresAt")
+        if status.get(key) is not None
+    }
+    if activities:
+        last = activities[-1]
+        summary["activity"] = f"{last.get('type', '')} - {last.get('message', '')}".strip(" -")
+    if data.get("processedUrls"):
+        summary["processed"] = len(data["processedUrls"])
+    return summary
+
+
+class JobRegistry:
+    """基于 SQLite 的任务登记表
+
+    每个提交的任务一行, 保存类型、状态、进度摘要和结果位置, 进程重启后
+    据此恢复跟踪。文档类任务的结果在 result_path 指向的 NDJSON 文件中,
+    其余任务的最终响应以 JSON 保存在 result 列。
+    """
+
+    def __init__(self, path: str = "jobs.db"):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "webhook" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN webhook INTEGER NOT NULL DEFAULT 0")
+
+    def add(self, job_id: str, kind: str, label: str = "", tracked: bool = True,
+            result_path: Optional[str] = None, webhook: bool = False):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, label, status, tracked, webhook, result_path, submitted_at, updated_at) "
+                "VALUES (?, ?, ?, 'submitted', ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET tracked = excluded.tracked, updated_at = excluded.updated_at",
+                (job_id, kind, label, int(tracked), int(webhook), result_path, now, now),
+            )
+
+    def update(self, job_id: str, **fields):
+        """更新任务字段, progress 和 result 可传入字典"""
+        if not fields:
+            return
+        for key in _JSON_COLUMNS:
+            if key in fields and not isinstance(fields[key], (str, type(None))):
+                fields[key] = json.dumps(fields[key], ensure_ascii=False)
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def list(self, kind: Optional[str] = None, active_only: bool = False, limit: int = 50) -> List[Dict]:
+        """按提交时间倒序列出任务"""
+        sql, params = "SELECT * FROM jobs WHERE 1", []
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if active_only:
+            sql += " AND status NOT IN ({})".format(", ".join("?" * len(TERMINAL_STATUS)))
+            params.extend(sorted(TERMINAL_STATUS))
+        sql += " ORDER BY submitted_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [self._decode(row) for row in conn.execute(sql, params)]
+
+    def delete(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["tracked"] = bool(job["tracked"])
+        job["webhook"] = bool(job["webhook"])
+        for key in _JSON_COLUMNS:
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class JobManager:
+    """后台任务管理器
+
+    在独立线程的事件循环中并发轮询所有已登记的异步任务, 状态和进度写入
+    JobRegistry; 界面片段每个刷新周期只读取登记表和结果文件新增的部分,
+    不阻塞脚本运行, 页面关闭或重跑也不影响任务。进程重启后所有未结束的
+    任务都由管理器接管, 文档类任务从已保存的文档数继续取结果。
+
+    配置了 webhook 接收器时, 以 webhook_spec() 提交的文档类任务改由回调
+    事件直接写入结果, 只在超过 WEBHOOK_DEADLINE 没有事件或收到完成事件时
+    查询一次状态。
+    """
+
+    def __init__(self, api_url: str, api_key: str, registry: JobRegistry, results_dir: str = ".jobs",
+                 receiver: Optional[WebhookReceiver] = None):
+        self.client = AsyncFirecrawlClient(api_url, api_key)
+        self.registry = registry
+        self.results_dir = results_dir
+        self.receiver = receiver
+        # 所有任务的轮询合并到调度器的同一个定时循环, 间隔按预计完成时间调整
+        self.scheduler = PollScheduler()
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._lock = threading.Lock()
+        # 文档或状态有更新时递增, 唤醒 follow_documents 的等待方
+        self._changed = threading.Condition()
+        self._generation = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="job-manager", daemon=True)
+        self._thread.start()
+        if receiver is not None:
+            receiver.on_event = self._on_webhook_event
+            try:
+                asyncio.run_coroutine_threadsafe(receiver.start(), self._loop).result(timeout=10)
+            except Exception as e:
+                logger.error(f"webhook 接收器启动失败, 改为轮询: {e}")
+                self.receiver = None
+        self.resume()
+
+    def webhook_spec(self) -> Optional[Dict]:
+        """提交爬取/批量任务时附带的 webhook 选项, 未启用接收器时为 None"""
+        return self.receiver.spec() if self.receiver else None
+
+    def submit(self, kind: str, job_id: str, label: str = "", track: bool = True,
+               webhook: bool = False) -> Dict:
+        """登记一个已提交的任务; track 为真时由管理器在后台跟踪
+
+        webhook 表示任务提交时带了 webhook_spec(), 结果由回调事件写入。
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知任务类型: {kind}")
+        result_path = None
+        if "documents" in JOB_KINDS[kind]:
+            result_path = os.path.join(self.results_dir, f"{job_id}.ndjson")
+        self.registry.add(job_id, kind, label, track, result_path, webhook and self.receiver is not None)
+        if track:
+            self._start(job_id)
+        return self.registry.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.registry.get(job_id)
+
+    def jobs(self, kind: Optional[str] = None, active_only: bool = False, limit: int = 50) -> List[Dict]:
+        return self.registry.list(kind, active_only, limit)
+
+    def iter_documents(self, job_id: str) -> Iterator[Dict]:
+        """逐条读取文档类任务已取得的文档"""
+        job = self.registry.get(job_id)
+        if job and job["result_path"] and os.path.exists(job["result_path"]):
+            yield from iter_ndjson(job["result_path"])
+
+    def read_documents(self, job: Dict, offset: int = 0) -> Tuple[List[Dict], int]:
+        """读取结果文件中从字节偏移 offset 起已完整写入的文档, 不等待
+
+        返回 (文档列表, 新偏移); 写了一半的末行留到下次读取。界面片段每个刷新
+        周期调用一次, 只解析上次之后新增的行。
+        """
+        path = job.get("result_path")
+        if not path or not os.path.exists(path):
+            return [], offset
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        docs = [json.loads(line) for line in chunk[:end].split(b"\n") if line.strip()]
+        return docs, offset + end
+
+    async def follow_documents(self, job_id: str, timeout: float = 5.0) -> AsyncIterator[Dict]:
+        """在调用方的事件循环中跟随任务结果文件, 逐条产出新写入的文档
+
+        管理器写入文档或更新状态时被唤醒, 任务结束且文件读完后返回;
+        任务失败时抛出 RuntimeError。
+        """
+        loop = asyncio.get_running_loop()
+        offset = 0
+        while True:
+            generation = self._generation
+            job = self.registry.get(job_id)
+            if job is None:
+                raise RuntimeError(f"任务 {job_id} 不在任务登记表中")
+            docs, offset = self.read_documents(job, offset)
+            for doc in docs:
+                yield doc
+            if job["status"] in TERMINAL_STATUS:
+                if job["status"] != "completed":
+                    raise RuntimeError(f"任务失败: {job.get('error') or job['status']}")
+                return
+            await loop.run_in_executor(None, self._wait_change, generation, timeout)
+
+    def remove(self, job_id: str):
+        """停止跟踪并删除任务记录和结果文件, 不取消服务端任务"""
+        with self._lock:
+            task = self._tasks.pop(job_id, None)
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+        job = self.registry.get(job_id)
+        if job and job["result_path"]:
+            try:
+                os.remove(job["result_path"])
+            except OSError:
+                pass
+        self.registry.delete(job_id)
+
+    def resume(self):
+        """接管登记表中所有未结束的任务"""
+        for job in self.registry.list(active_only=True, limit=1000):
+            if not job["tracked"]:
+                self.registry.update(job["id"], tracked=1)
+            self._start(job["id"])
+
+    def _start(self, job_id: str):
+        with self._lock:
+            if job_id in self._tasks and not self._tasks[job_id].done():
+                return
+            self._tasks[job_id] = asyncio.run_coroutine_threadsafe(self._track(job_id), self._loop)
+
+    def _notify(self):
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+
+    def _wait_change(self, generation: int, timeout: float):
+        with self._changed:
+            self._changed.wait_for(lambda: self._generation != generation, timeout)
+
+    def _on_webhook_event(self, event: Dict) -> bool:
+        """在管理器事件循环中由接收器调用, 任务未在跟踪时返回 False"""
+        queue = self._queues.get(event["id"])
+        if queue is None:
+            return False
+        queue.put_nowait(event)
+        return True
+
+    async def _track(self, job_id: str):
+        try:
+            await self._track_job(job_id)
+        finally:
+            stats = self.scheduler.forget(job_id)
+            job = self.registry.get(job_id)
+            if stats and job is not None:
+                self.registry.update(job_id, progress={**(job["progress"] or {}), **stats})
+            self._notify()
+
+    async def _track_job(self, job_id: str):
+        job = self.registry.get(job_id)
+        if job is None:
+            return
+        spec = JOB_KINDS[job["kind"]]
+        self.scheduler.track(job_id, spec["interval"])
+        errors = 0
+        last_status: Dict = {}
+
+        def on_status(status: Dict):
+            nonlocal errors
+            errors = 0
+            last_status.clear()
+            last_status.update(status)
+            state = status.get("status") or "scraping"
+            if state == "completed" and "documents" in spec:
+                # 服务端已完成但文档还没取完, 全部写入后才记为完成
+                state = "scraping"
+            progress = {**summarize_status(status), **self.scheduler.job_stats(job_id)}
+            self.registry.update(job_id, status=state, progress=progress, error=None)
+            self._notify()
+
+        while True:
+            try:
+                if "documents" in spec and job["webhook"] and self.receiver:
+                    await self._follow_webhook(job, spec, on_status)
+                elif "documents" in spec:
+                    await self._follow_documents(job, spec, on_status)
+                else:
+                    await self._poll_result(job, spec, on_status)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if last_status.get("status") == "failed":
+                    self.registry.update(job_id, status="failed", error=str(e))
+                    return
+                errors += 1
+                logger.warning(f"任务 {job_id} 轮询出错({errors}/{MAX_ERRORS}): {e}")
+                if errors >= MAX_ERRORS:
+                    self.registry.update(job_id, status="failed", error=str(e))
+                    return
+                self.registry.update(job_id, error=str(e))
+                await asyncio.sleep(spec["interval"] * 2 ** errors)
+
+    async def _follow_documents(self, job: Dict, spec: Dict, on_status):
+        path = job["result_path"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 以文件中完整的行数为准, 进程中断时写了一半的行被截掉
+        count = _repair_ndjson(path)
+        iterate = getattr(self.client, spec["documents"])
+
+        def wait(status: Dict):
+            return self.scheduler.wait(job["id"], status)
+
+        def report(status: Dict):
+            f.flush()
+            self.registry.update(job["id"], documents=count)
+            on_status(status)
+
+        with open(path, "a", encoding="utf-8") as f:
+            async for doc in iterate(job["id"], spec["interval"], report, skip=count, wait=wait):
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                count += 1
+        self.registry.update(job["id"], status="completed", documents=count, error=None)
+
+    async def _follow_webhook(self, job: Dict, spec: Dict, on_status):
+        """由回调事件写入文档; 收到完成事件或超过 WEBHOOK_DEADLINE 无事件时查询一次状态
+
+        完成时若服务端文档数多于已收到的, 说明有回调丢失, 从头取一遍结果
+        并按 sourceURL 去重补齐。
+        """
+        job_id, path = job["id"], job["result_path"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        count = _repair_ndjson(path)
+        seen = {_doc_url(doc) for doc in iter_ndjson(path)} if count else set()
+        queue = self._queues.setdefault(job_id, asyncio.Queue())
+        for event in self.receiver.take_early(job_id):
+            queue.put_nowait(event)
+        check = getattr(self.client, spec["check"])
+
+        def write(f, docs) -> int:
+            written = 0
+            for doc in docs:
+                url = _doc_url(doc)
+                if url and url in seen:
+                    continue
+                seen.add(url)
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                written += 1
+            return written
+
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), WEBHOOK_DEADLINE)
+                    except asyncio.TimeoutError:
+                        event = None
+                    if event is not None and event["event"] == "page":
+                        count += write(f, event["data"])
+                        f.flush()
+                        self.registry.update(job_id, status="scraping", documents=count)
+                        self._notify()
+                        continue
+                    if event is not None and event["event"] == "started":
+                        continue
+
+                    status = await check(job_id, skip=count)
+                    if status.get("error") and not status.get("status"):
+                        raise RuntimeError(f"获取任务状态失败: {status.get('message')}")
+                    on_status(status)
+                    state = status.get("status")
+                    if state == "failed":
+                        raise RuntimeError(f"任务失败: {status.get('error') or (event or {}).get('error') or '未知错误'}")
+                    if state != "completed":
+                        continue
+                    if (status.get("completed") or 0) > count:
+                        iterate = getattr(self.client, spec["documents"])
+                        async for doc in iterate(job_id, spec["interval"], None):
+                            count += write(f, [doc])
+                    break
+        finally:
+            self._queues.pop(job_id, None)
+        self.registry.update(job_id, status="completed", documents=count, error=None)
+
+    async def _poll_result(self, job: Dict, spec: Dict, on_status):
+        check = getattr(self.client, spec["status"])
+        while True:
+            status = await check(job["id"])
+            if status.get("error") and not status.get("status"):
+                raise RuntimeError(f"获取任务状态失败: {status.get('message')}")
+            on_status(status)
+            state = status.get("status")
+            if state == "completed":
+                self.registry.update(job["id"], status="completed", result=status)
+                return
+            if state in ("failed", "cancelled"):
+                message = status.get("error") or status.get("message") or "未知错误"
+                self.registry.update(job["id"], status=state, error=str(message), result=status)
+                return
+            await self.scheduler.wait(job["id"], status)
+
+
+def _doc_url(doc: Dict) -> Optional[str]:
+    return (doc.get("metadata") or {}).get("sourceURL") or doc.get("url")
+
+
+def _repair_ndjson(path: str) -> int:
+    """返回文件中完整的行数, 并截掉末尾不完整的行"""
+    if not os.path.exists(path):
+        return 0
+    count, good = 0, 0
+    with open(path, "rb+") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            good += len(line)
+        f.truncate(good)
+    return count
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager(api_url: Optional[str] = None, api_key: Optional[str] = None) -> JobManager:
+    """返回进程级共享的任务管理器
+
+    登记表路径由 JOB_REGISTRY_DB 指定, 文档结果目录由 JOB_RESULTS_DIR 指定;
+    设置了 WEBHOOK_PUBLIC_URL 时同时启动 webhook 接收器。
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                api_url or os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev"),
+                api_key or os.getenv("FIRECRAWL_API_KEY", ""),
+                JobRegistry(os.getenv("JOB_REGISTRY_DB", "jobs.db")),
+                os.getenv("JOB_RESULTS_DIR", ".jobs"),
+                WebhookReceiver.from_env(),
+            )
+        return _manager
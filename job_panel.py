@@ -0,0 +1,154 @@
+import time
+from typing import Callable, Dict, List, Optional
+import streamlit as st
+from job_manager import JobManager, TERMINAL_STATUS
+
+# 任务状态面板的刷新间隔(秒), 只重跑面板片段, 不重跑整个脚本
+REFRESH_SECONDS = 2
+
+STATUS_LABELS = {
+    "submitted": "已提交",
+    "scraping": "进行中",
+    "processing": "处理中",
+    "completed": "已完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+}
+
+KIND_LABELS = {
+    "crawl": "爬取",
+    "batch": "批量抓取",
+    "deep-research": "深度研究",
+    "llmstxt": "LLMs.txt",
+}
+
+
+def format_progress(job: Dict) -> str:
+    """将任务进度摘要格式化为一行文字"""
+    progress = job.get("progress") or {}
+    parts = [STATUS_LABELS.get(job["status"], job["status"])]
+    if progress.get("total"):
+        parts.append(f"{progress.get('completed', 0)}/{progress['total']} 页")
+    elif job.get("documents"):
+        parts.append(f"{job['documents']} 个文档")
+    if progress.get("maxDepth"):
+        parts.append(f"深度 {progress.get('currentDepth', 0)}/{progress['maxDepth']}")
+    if progress.get("processed"):
+        parts.append(f"已处理 {progress['processed']} 个URL")
+    if progress.get("activity"):
+        parts.append(progress["activity"])
+    if progress.get("eta") and job["status"] not in TERMINAL_STATUS:
+        parts.append(f"预计剩余 {progress['eta']} 秒")
+    if progress.get("polls"):
+        parts.append(f"轮询 {progress['polls']} 次(节省 {progress.get('polls_saved', 0)} 次)")
+    if job.get("error"):
+        parts.append(f"错误: {job['error']}")
+    return " | ".join(parts)
+
+
+def _show_status(job: Dict, extra: str = ""):
+    progress = job.get("progress") or {}
+    if progress.get("total"):
+        st.progress(min(progress.get("completed", 0) / progress["total"], 1.0))
+    text = f"{KIND_LABELS.get(job['kind'], job['kind'])}任务 {job['id']}: {format_progress(job)}{extra}"
+    if job["status"] == "failed":
+        st.error(text)
+    elif job["status"] in TERMINAL_STATUS:
+        st.success(text)
+    else:
+        st.info(text)
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def render_job_status(manager: JobManager, job_id: str):
+    """显示单个任务的实时状态; 任务结束时重跑整个页面一次以展示结果"""
+    job = manager.get(job_id)
+    if job is None:
+        st.warning(f"任务 {job_id} 不在任务登记表中")
+        return
+    _show_status(job)
+
+    done_key = f"job_done_{job_id}"
+    if job["status"] in TERMINAL_STATUS and not st.session_state.get(done_key):
+        st.session_state[done_key] = True
+        st.rerun()
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def follow_job_documents(manager: JobManager, job_id: str, key: str,
+                         on_documents: Callable[[List[Dict]], None],
+                         on_finish: Callable[[Dict], None]):
+    """跟随文档类任务的结果文件, 不阻塞脚本运行
+
+    每个刷新周期只读取上次偏移之后新写入的文档交给 on_documents(文档列表)
+    后返回, 偏移保存在 session_state[key], 页面重跑后从该处继续。登记表
+    报告任务已结束且结果文件读完时调用一次 on_finish(任务), 然后重跑整个
+    页面以展示结果。换成另一个任务ID时从头读取。
+    """
+    state = st.session_state.get(key)
+    if state is None or state["job_id"] != job_id:
+        state = st.session_state[key] = {"job_id": job_id, "offset": 0, "documents": 0, "done": False}
+    # 先读状态再读文件: 状态已结束时, 之前写入的文档都能在本次读到
+    job = manager.get(job_id)
+    if job is None:
+        st.warning(f"任务 {job_id} 不在任务登记表中")
+        return
+    if not state["done"]:
+        docs, state["offset"] = manager.read_documents(job, state["offset"])
+        if docs:
+            state["documents"] += len(docs)
+            on_documents(docs)
+    _show_status(job, f" | 已载入 {state['documents']} 个文档")
+
+    if job["status"] in TERMINAL_STATUS and not state["done"]:
+        state["done"] = True
+        on_finish(job)
+        st.rerun()
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def render_jobs_panel(manager: JobManager, limit: int = 20):
+    """列出最近的任务及其状态, 供侧边栏使用"""
+    jobs = manager.jobs(limit=limit)
+    active = sum(1 for job in jobs if job["status"] not in TERMINAL_STATUS)
+    polls = manager.scheduler.summary()
+    st.caption(
+        f"最近 {len(jobs)} 个任务, 进行中 {active} 个; 本进程轮询 {polls['polls']} 次, "
+        f"比固定间隔节省 {polls['polls_saved']} 次, 合并唤醒 {polls['coalesced']} 次"
+    )
+    for job in jobs:
+        label = job.get("label") or job["id"]
+        st.markdown(f"**{KIND_LABELS.get(job['kind'], job['kind'])}** · {label}")
+        st.caption(f"{format_progress(job)} · {_format_age(job['submitted_at'])}")
+
+
+def select_job(manager: JobManager, kind: str, key: str) -> Optional[str]:
+    """从登记表中选择某类历史任务, 返回任务ID"""
+    jobs = manager.jobs(kind=kind)
+    if not jobs:
+        return None
+    labels = {
+        job["id"]: f"{job.get('label') or job['id']} · {STATUS_LABELS.get(job['status'], job['status'])}"
+                   f" · {_format_age(job['submitted_at'])}"
+        for job in jobs
+    }
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        job_id = st.selectbox("历史任务", list(labels), format_func=labels.get, key=f"{key}_select")
+    with col2:
+        if st.button("查看", key=f"{key}_open"):
+            return job_id
+    return None
+
+
+def _format_age(timestamp: Optional[float]) -> str:
+    if not timestamp:
+        return ""
+    seconds = int(time.time() - timestamp)
+    if seconds < 60:
+        return f"{seconds} 秒前"
+    if seconds < 3600:
+        return f"{seconds // 60} 分钟前"
+    if seconds < 86400:
+        return f"{seconds // 3600} 小时前"
+    return f"{seconds // 86400} 天前"
@@ -1,13 +1,15 @@
 import os
-import requests
+from http_pool import request_json
 import streamlit as st
 from dotenv import load_dotenv
-from time import sleep
+from job_manager import get_job_manager, TERMINAL_STATUS
+from job_panel import render_job_status, select_job
 
 # 加载环境变量
 load_dotenv()
 API_URL = os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev/v1")
 API_KEY = os.getenv("FIRECRAWL_API_KEY")
+job_manager = get_job_manager(API_URL, API_KEY)
 
 # 初始化session状态
 if 'job_id' not in st.session_state:
@@ -29,42 +31,26 @@ def submit_llmstxt_job(url, options):
     
     try:
         with st.spinner("正在提交任务..."):
-            response = requests.post(
+            result = request_json(
+                "POST",
                 f"{API_URL}/llmstxt",
                 headers=headers,
                 json=payload,
-                timeout=30  # 30秒超时
+                timeout=30,  # 30秒超时
+                idempotent=False
             )
-            response.raise_for_status()
-            result = response.json()
             
             if not result.get('success'):
                 st.error(f"API返回错误: {result.get('message', '未知错误')}")
                 return None
             return result
-    except requests.exceptions.Timeout:
+    except TimeoutError:
         st.error("请求超时，请检查网络连接后重试")
         return None
     except Exception as e:
         st.error(f"提交失败: {str(e)}")
         return None
 
-def get_job_results(job_id):
-    """获取任务结果"""
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-    }
-    try:
-        response = requests.get(
-            f"{API_URL}/llmstxt/{job_id}",
-            headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        st.error(f"获取结果失败: {str(e)}")
-        return None
-
 # Streamlit界面
 st.title("📄 LLMs.txt 生成工具")
 
@@ -101,59 +87,38 @@ if st.button("开始生成") and url:
     elif not result.get("success"):
         st.error(f"任务提交失败: {result.get('message', '未知错误')}")
     else:
-        job_id = result.get("jobId")
+        job_id = result.get("jobId") or result.get("id")
         if job_id:
+            # 由后台任务管理器轮询, 页面不再循环等待
+            job_manager.submit("llmstxt", job_id, label=url.strip())
             st.session_state.job_id = job_id
+            st.session_state.results = None
             st.success(f"任务已提交 (ID: {job_id})")
-            # Trigger immediate status check
-            st.rerun()
         else:
             # Handle immediate completion case
             if result.get("data"):
                 st.session_state.results = result
                 st.success("处理完成！")
 
-# 轮询结果
+reopened = select_job(job_manager, "llmstxt", key="llmstxt_jobs")
+if reopened:
+    st.session_state.job_id = reopened
+    st.session_state.results = None
+
+# 任务状态
 if st.session_state.job_id:
-    with st.spinner("等待处理完成..."):
-        try:
-            result = get_job_results(st.session_state.job_id)
-            if not result:
-                st.error("无法获取任务状态")
-                st.session_state.job_id = None
-                st.rerun()
-            
-            status = result.get("status")
-            
-            if status == "completed":
-                st.session_state.results = result
-                st.session_state.job_id = None
-                st.success("处理完成！")
-                if result.get('data', {}).get('processedUrls'):
-                    st.info(f"已处理URL数量: {len(result['data']['processedUrls'])}")
-                st.rerun()  # 立即刷新显示结果
-            
-            elif status == "processing":
-                st.warning(f"任务处理中... (任务ID: {st.session_state.job_id})")
-                if result.get('data', {}).get('llmstxt'):
-                    with st.expander("查看当前进度"):
-                        st.code(result['data']['llmstxt'], language="markdown")
-                # 5秒后自动刷新
-                sleep(5)
-                st.rerun()
-            
-            elif status == "failed":
-                st.error(f"处理失败: {result.get('message', '未知错误')}")
-                st.session_state.job_id = None
-            
-            else:
-                st.warning(f"未知状态: {status}")
-                sleep(5)
-                st.rerun()
-                
-        except Exception as e:
-            st.error(f"轮询出错: {str(e)}")
-            st.session_state.job_id = None
+    job = job_manager.get(st.session_state.job_id)
+    if job is None or job["status"] not in TERMINAL_STATUS:
+        render_job_status(job_manager, st.session_state.job_id)
+    elif job["status"] == "completed":
+        st.session_state.results = job["result"]
+        st.session_state.job_id = None
+        data = (job["result"] or {}).get("data") or {}
+        if data.get("processedUrls"):
+            st.info(f"已处理URL数量: {len(data['processedUrls'])}")
+    else:
+        st.error(f"处理失败: {job.get('error') or '未知错误'}")
+        st.session_state.job_id = None
 
 # 结果显示和下载
 if st.session_state.results:
@@ -161,14 +126,7 @@ if st.session_state.results:
     status = st.session_state.results.get("status")
     data = st.session_state.results.get("data", {})
     
-    if status == "processing":
-        st.warning("任务仍在处理中，部分结果如下:")
-        if data.get("llmstxt"):
-            st.subheader("当前LLMs.txt")
-            st.code(data["llmstxt"], language="markdown")
-        st.button("刷新状态", key="refresh_status")
-    
-    elif status == "completed":
+    if status == "completed":
         st.success("处理完成！")
         if data.get("llmstxt"):
             st.subheader("LLMs.txt")
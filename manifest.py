@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Iterable, Optional
+from shard_writer import ShardedWriter
+
+MANIFEST_FILE = "manifest.json"
+REPORT_FILE = "changes.json"
+
+# metadata 中可能携带的缓存校验字段, 不同来源大小写不一
+_ETAG_KEYS = ("etag", "ETag", "Etag")
+_LAST_MODIFIED_KEYS = ("last-modified", "Last-Modified", "lastModified", "last_modified")
+
+
+def url_hash(url: str) -> str:
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+def content_hash(markdown: str) -> str:
+    return hashlib.md5(markdown.encode("utf-8")).hexdigest()
+
+
+def _first(metadata: Dict, keys) -> Optional[str]:
+    for key in keys:
+        if metadata.get(key):
+            return metadata[key]
+    return None
+
+
+class CrawlManifest:
+    """输出目录的内容清单
+
+    记录每个已保存页面的URL哈希、内容哈希、大小、抓取时间、文件名、所属爬取的
+    起始URL, 以及 metadata 中的 ETag/Last-Modified, 用于增量重爬时只写入变化的页面。
+    清单以JSON保存在输出目录下, 写入时先写临时文件再原子替换。
+    """
+
+    def __init__(self, output_dir: str = "output"):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("pages", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_unchanged(self, key: str, digest: str) -> bool:
+        """页面已在清单中、内容哈希相同且文件仍在"""
+        entry = self.entries.get(key)
+        return bool(
+            entry and entry["content_hash"] == digest
+            and os.path.exists(os.path.join(self.output_dir, entry["file"]))
+        )
+
+    def record(self, key: str, url: str, digest: str, size: int, file: str, metadata: Dict,
+               root: Optional[str] = None):
+        self.entries[key] = {
+            "url": url,
+            "root": root,
+            "content_hash": digest,
+            "size": size,
+            "file": file,
+            "fetched_at": time.time(),
+            "etag": _first(metadata, _ETAG_KEYS),
+            "last_modified": _first(metadata, _LAST_MODIFIED_KEYS),
+        }
+
+    def save(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": time.time(), "pages": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+class MarkdownSync:
+    """按清单逐页增量保存 markdown, 供边抓取边保存的调用方使用
+
+    add() 收到页面即交给 ShardedWriter 写入, 不在内存中保留页面内容;
+    close() 按需删除同一 root 下本次未出现的页面, 保存清单和变化报告。
+    也可用作上下文管理器, 正常退出时调用 close()。各参数的含义见 sync_markdown。
+    """
+
+    def __init__(self, output_dir: str = "output", prune: bool = False,
+                 pack_threshold: int = 0, root: Optional[str] = None):
+        if prune and not root:
+            raise ValueError("删除已不存在的页面需要指定本次爬取的 root")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.prune = prune
+        self.root = root
+        self.manifest = CrawlManifest(output_dir)
+        self.report = {"run_at": time.time(), "added": [], "changed": [], "removed": [], "unchanged": 0,
+                       "files": []}
+        self._seen = set()
+        self._writer = ShardedWriter(output_dir, pack_threshold=pack_threshold)
+
+    def add(self, result: Dict):
+        """保存一个 parse_crawl_results 格式的页面, 内容未变化时只更新清单"""
+        markdown = result.get("markdown")
+        if not markdown or not result.get("url"):
+            return
+        manifest, report = self.manifest, self.report
+        key = url_hash(result["url"])
+        self._seen.add(key)
+        digest = content_hash(markdown)
+        metadata = result.get("metadata") or {}
+        if manifest.is_unchanged(key, digest):
+            entry = manifest.entries[key]
+            manifest.record(key, result["url"], digest, entry["size"], entry["file"], metadata, self.root)
+            report["unchanged"] += 1
+            return
+
+        old = manifest.entries.get(key)
+        file = self._writer.write(key, markdown)
+        if old and old["file"] != file and not self._writer.is_packed(old["file"]):
+            # 旧版平铺文件, 或从单独文件改为打包的页面; 打包条目由新位置覆盖
+            self._writer.remove(key, old["file"])
+        report["changed" if old else "added"].append(result["url"])
+        report["files"].append(os.path.join(self.output_dir, file))
+        manifest.record(key, result["url"], digest, len(markdown.encode("utf-8")), file, metadata, self.root)
+
+    def close(self) -> Dict:
+        """等待写入完成, 保存清单和 changes.json, 返回变化报告"""
+        try:
+            if self.prune:
+                stale = [k for k, entry in self.manifest.entries.items()
+                         if k not in self._seen and entry.get("root") == self.root]
+                for key in stale:
+                    entry = self.manifest.entries.pop(key)
+                    self._writer.remove(key, entry["file"])
+                    self.report["removed"].append(entry["url"])
+        finally:
+            self._writer.close()
+
+        self.manifest.save()
+        tmp = os.path.join(self.output_dir, f"{REPORT_FILE}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in self.report.items() if k != "files"}, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.output_dir, REPORT_FILE))
+        return self.report
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 出错时只等待已提交的写入, 不保存清单, 下次运行重新比较内容哈希
+            self._writer.close()
+
+
+def sync_markdown(results: Iterable[Dict], output_dir: str = "output", prune: bool = False,
+                  pack_threshold: int = 0, root: Optional[str] = None) -> Dict:
+    """按清单增量保存页面, 返回变化报告
+
+    results 为 parse_crawl_results 的输出, 可以是生成器。只写入新增或内容
+    变化的页面, 并在清单中记下 root(本次爬取的起始URL)。prune 为 True 时
+    只删除同一 root 下、本次结果中已不存在的页面, 输出目录中其他爬取保存的
+    页面不受影响; 没有 root 时无法界定范围, 不允许删除。报告同时写入
+    输出目录下的 changes.json, 供下游只处理增量。文件由 ShardedWriter
+    分目录并行写入, pack_threshold 大于 0 时小文件合并到打包文件。
+    """
+    with MarkdownSync(output_dir, prune=prune, pack_threshold=pack_threshold, root=root) as sync:
+        for result in results:
+            sync.add(result)
+    return sync.report
@@ -1,26 +1,28 @@
 import os
-import requests
-import streamlit as st
+import asyncio
+from http_pool import request_json
+from async_utils import AsyncFirecrawlClient
+from multi_map import MAP_WORKERS, LinkSet, iter_map_sites, parse_sites
 from dotenv import load_dotenv
-from time import sleep
 
 # 加载环境变量
 load_dotenv()
 API_URL = os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev/v1")
 API_KEY = os.getenv("FIRECRAWL_API_KEY")
 
-# 初始化session状态
-if 'job_id' not in st.session_state:
-    st.session_state.job_id = None
-if 'results' not in st.session_state:
-    st.session_state.results = None
+# 映射选项默认值, 与 Firecrawl /map 接口的默认行为一致
+DEFAULT_MAP_OPTIONS = {
+    "ignore_sitemap": False,
+    "sitemap_only": False,
+    "include_subdomains": False,
+    "limit": 5000,
+    "search": None,
+    "timeout": None,
+}
 
-def submit_map_job(url, options):
-    """提交URL映射任务"""
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
+def build_map_payload(url, options):
+    """将映射选项转换为 /map 请求体"""
+    options = {**DEFAULT_MAP_OPTIONS, **options}
     payload = {
         "url": url,
         "ignoreSitemap": options["ignore_sitemap"],
@@ -34,86 +36,219 @@ def submit_map_job(url, options):
         payload["search"] = options["search"]
     if options["timeout"]:
         payload["timeout"] = options["timeout"]
+    return payload
 
+def submit_map_job(url, options):
+    """提交URL映射任务"""
+    headers = {
+        "Authorization": f"Bearer {API_KEY}",
+        "Content-Type": "application/json"
+    }
     try:
-        response = requests.post(
+        return request_json(
+            "POST",
             f"{API_URL}/map",
             headers=headers,
-            json=payload
+            json=build_map_payload(url, options)
         )
-        response.raise_for_status()
-        return response.json()
     except Exception as e:
+        import streamlit as st
         st.error(f"提交失败: {str(e)}")
         return None
 
-# Streamlit界面
-st.title("🗺️ Firecrawl URL映射工具")
+def map_url(url, search=None, api_url=API_URL, api_key=API_KEY, **options):
+    """映射网站URL, 失败时返回 {"success": False, "message": ...} 而不是抛出异常"""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    try:
+        return request_json(
+            "POST",
+            f"{api_url}/map",
+            headers=headers,
+            json=build_map_payload(url, {**options, "search": search})
+        )
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+# 多站点映射结果预览的行数, 完整结果通过下载获取
+PREVIEW_LINKS = 200
 
-# 配置选项
-with st.expander("高级映射选项"):
+def render_multi_site_map(api_url=API_URL, api_key=API_KEY, key="multi_map"):
+    """多站点映射: 共用选项并发映射多个根URL, 合并去重后显示各站点计数并导出"""
+    import streamlit as st
+
+    state_key = f"{key}_links"
+    with st.form(f"{key}_form"):
+        sites_text = st.text_area(
+            "输入多个网站URL(每行一个)",
+            placeholder="https://example.com\ndocs.example.com\nblog.example.com",
+            height=150,
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            ignore_sitemap = st.checkbox("忽略站点地图", value=False, key=f"{key}_ignore_sitemap")
+            sitemap_only = st.checkbox("仅站点地图", value=False, key=f"{key}_sitemap_only")
+            include_subdomains = st.checkbox("包含子域名", value=False, key=f"{key}_subdomains")
+        with col2:
+            limit = st.number_input("每个站点最大链接数", min_value=1, max_value=5000, value=5000,
+                                    key=f"{key}_limit")
+            workers = st.slider("并发站点数", min_value=1, max_value=32, value=MAP_WORKERS, key=f"{key}_workers")
+        search = st.text_input("搜索关键词(可选)", key=f"{key}_search")
+        submitted = st.form_submit_button("开始映射")
+
+    if submitted:
+        sites = parse_sites(sites_text)
+        if not sites:
+            st.error("请输入至少一个网站URL")
+        else:
+            map_options = build_map_payload("", {
+                "ignore_sitemap": ignore_sitemap,
+                "sitemap_only": sitemap_only,
+                "include_subdomains": include_subdomains,
+                "limit": limit,
+                "search": search or None,
+            })
+            map_options.pop("url")
+            previous = st.session_state.get(state_key)
+            if previous is not None:
+                previous.close()
+            link_set = LinkSet()
+            progress = st.progress(0.0)
+            status = st.empty()
+
+            async def run_maps():
+                client = AsyncFirecrawlClient(api_url, api_key)
+                async for site, result in iter_map_sites(client, sites, map_options, workers):
+                    stats = link_set.add(site, result)
+                    done = len(link_set.sites)
+                    progress.progress(done / len(sites))
+                    outcome = f"失败: {stats['error']}" if stats["error"] else f"{stats['links']} 个链接, 新增 {stats['new']} 个"
+                    status.text(f"{done}/{len(sites)} 个站点完成 | {site}: {outcome} | 合并后 {len(link_set)} 个URL")
+
+            asyncio.run(run_maps())
+            st.session_state[state_key] = link_set
+            st.session_state.pop(f"{key}_export", None)
+            failed = sum(1 for stats in link_set.sites.values() if stats["error"])
+            st.success(f"映射完成: {len(sites)} 个站点, 失败 {failed} 个, 合并去重后 {len(link_set)} 个URL")
+
+    link_set = st.session_state.get(state_key)
+    if link_set is None or not os.path.exists(link_set.path):
+        return
+    st.dataframe(list(link_set.site_rows()), hide_index=True, use_container_width=True)
+    if not len(link_set):
+        st.warning("没有发现任何链接")
+        return
+    st.caption(f"前 {min(PREVIEW_LINKS, len(link_set))} 个链接预览, 共 {len(link_set)} 个")
+    st.dataframe(link_set.head(PREVIEW_LINKS), hide_index=True, use_container_width=True)
+
+    # 导出直接读取磁盘文件, 不在内存中拼接完整列表
     col1, col2 = st.columns(2)
     with col1:
-        ignore_sitemap = st.checkbox("忽略站点地图", value=True)
-        sitemap_only = st.checkbox("仅站点地图", value=False)
-        include_subdomains = st.checkbox("包含子域名", value=False)
-        
+        if st.button("生成URL列表", key=f"{key}_build"):
+            previous = st.session_state.get(f"{key}_export")
+            if previous:
+                try:
+                    os.remove(previous)
+                except OSError:
+                    pass
+            st.session_state[f"{key}_export"] = link_set.export_text()
+        export_path = st.session_state.get(f"{key}_export")
+        if export_path and os.path.exists(export_path):
+            with open(export_path, "rb") as f:
+                st.download_button("下载URL列表", data=f, file_name="merged_links.txt",
+                                   mime="text/plain", key=f"{key}_download_txt")
     with col2:
-        limit = st.number_input("最大链接数", min_value=1, max_value=5000, value=100)
-        timeout = st.number_input("超时时间(ms)", min_value=0, value=0)
+        with open(link_set.path, "rb") as f:
+            st.download_button("下载 NDJSON(含来源站点)", data=f, file_name="merged_links.ndjson",
+                               mime="application/x-ndjson", key=f"{key}_download_ndjson")
+
+def main():
+    # 界面依赖只在运行页面时导入, map_url 可在无 Streamlit 的环境中使用
+    import streamlit as st
+
+    # 初始化session状态
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = None
+    if 'results' not in st.session_state:
+        st.session_state.results = None
+
+    # Streamlit界面
+    st.title("🗺️ Firecrawl URL映射工具")
+
+    # 配置选项
+    with st.expander("高级映射选项"):
+        col1, col2 = st.columns(2)
+        with col1:
+            ignore_sitemap = st.checkbox("忽略站点地图", value=True)
+            sitemap_only = st.checkbox("仅站点地图", value=False)
+            include_subdomains = st.checkbox("包含子域名", value=False)
         
-    search = st.text_input("搜索查询") 
-
-# URL输入框
-url = st.text_input(
-    "输入要映射的URL",
-    placeholder="https://example.com",
-    help="输入要发现链接的起始URL"
-)
-
-# 提交按钮
-if st.button("开始映射") and url:
-    options = {
-        "ignore_sitemap": ignore_sitemap,
-        "sitemap_only": sitemap_only,
-        "include_subdomains": include_subdomains,
-        "limit": limit,
-        "timeout": timeout if timeout > 0 else None,
-        "search": search if search else None,
-    }
+        with col2:
+            limit = st.number_input("最大链接数", min_value=1, max_value=5000, value=100)
+            timeout = st.number_input("超时时间(ms)", min_value=0, value=0)
+        
+        search = st.text_input("搜索查询") 
+
+    # URL输入框
+    url = st.text_input(
+        "输入要映射的URL",
+        placeholder="https://example.com",
+        help="输入要发现链接的起始URL"
+    )
+
+    # 提交按钮
+    if st.button("开始映射") and url:
+        options = {
+            "ignore_sitemap": ignore_sitemap,
+            "sitemap_only": sitemap_only,
+            "include_subdomains": include_subdomains,
+            "limit": limit,
+            "timeout": timeout if timeout > 0 else None,
+            "search": search if search else None,
+        }
     
-    with st.spinner("提交任务中..."):
-        result = submit_map_job(url.strip(), options)
+        with st.spinner("提交任务中..."):
+            result = submit_map_job(url.strip(), options)
         
-    if not result:
-        st.error("任务提交失败: 无响应")
-    elif result.get("error"):
-        st.error(f"任务提交失败: {result['error']}")
-    elif not result.get("success"):
-        st.error(f"任务提交失败: {result.get('message', '未知错误')}")
-    else:
-        st.session_state.results = result
-        st.success("映射完成！")
-
-# 结果显示和下载
-if st.session_state.results:
-    st.divider()
-    st.subheader("映射结果")
+        if not result:
+            st.error("任务提交失败: 无响应")
+        elif result.get("error"):
+            st.error(f"任务提交失败: {result['error']}")
+        elif not result.get("success"):
+            st.error(f"任务提交失败: {result.get('message', '未知错误')}")
+        else:
+            st.session_state.results = result
+            st.success("映射完成！")
+
+    # 多站点映射
+    with st.expander("多站点映射"):
+        render_multi_site_map()
+
+    # 结果显示和下载
+    if st.session_state.results:
+        st.divider()
+        st.subheader("映射结果")
     
-    if not st.session_state.results.get("links"):
-        st.warning("没有发现任何链接")
-    else:
-        links = st.session_state.results["links"]
-        st.success(f"发现 {len(links)} 个链接")
+        if not st.session_state.results.get("links"):
+            st.warning("没有发现任何链接")
+        else:
+            links = st.session_state.results["links"]
+            st.success(f"发现 {len(links)} 个链接")
         
-        # 显示链接列表
-        st.dataframe(links, use_container_width=True)
+            # 显示链接列表
+            st.dataframe(links, use_container_width=True)
         
-        # 下载链接按钮
-        combined_links = "\n".join(links)
-        st.download_button(
-            label="下载链接列表",
-            data=combined_links,
-            file_name="discovered_links.txt",
-            mime="text/plain"
-        )
+            # 下载链接按钮
+            combined_links = "\n".join(links)
+            st.download_button(
+                label="下载链接列表",
+                data=combined_links,
+                file_name="discovered_links.txt",
+                mime="text/plain"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import os
+import time
+import bisect
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 延迟直方图的桶上界(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# 计算吞吐的滑动窗口(秒)
+RATE_WINDOW = 60.0
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """累积桶直方图, 与 Prometheus histogram 的语义一致"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, 累积计数) 列表, 最后一项为 +Inf"""
+        total, rows = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return rows
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶内线性插值估计分位数, 与 histogram_quantile 相同; 落在 +Inf 桶时返回最大有限上界"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                low = self.buckets[i - 1] if i else 0.0
+                return low + (self.buckets[i] - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class RequestTimer:
+    """单次请求尝试的计时: 创建时开始排队, dispatch() 时开始发送, finish() 时结束
+
+    排队时间包括等待限流令牌和自适应并发名额, 发送时间为从发出请求
+    到读完响应体。
+    """
+
+    def __init__(self, registry: "MetricsRegistry", endpoint: str, method: str):
+        self.registry = registry
+        self.endpoint = endpoint
+        self.method = method
+        self.created = time.monotonic()
+        self.dispatched: Optional[float] = None
+        self.bytes = 0
+        self._done = False
+
+    def dispatch(self):
+        self.dispatched = time.monotonic()
+        self.registry._dispatched(self)
+
+    def received(self, size: int):
+        self.bytes += size
+
+    def finish(self, status: int):
+        """记录结束; status 为 0 表示网络错误或超时"""
+        if not self._done:
+            self._done = True
+            self.registry._finished(self, status, time.monotonic())
+
+
+class MetricsRegistry:
+    """进程级请求指标
+
+    按接口统计请求数(按状态码)、排队和发送耗时直方图、接收字节数、重试次数、
+    调用结果, 以及正在排队和发送中的请求数。异步客户端和同步请求函数共用,
+    可被多个线程和事件循环同时更新。add_listener 注册的回调在每次请求
+    尝试结束时收到一条记录。
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._calls = defaultdict(int)
+        self._retries = defaultdict(int)
+        self._bytes = defaultdict(int)
+        self._queued = defaultdict(int)
+        self._in_flight = defaultdict(int)
+        self._queue_wait: Dict[str, Histogram] = {}
+        self._latency: Dict[str, Histogram] = {}
+        self._recent = deque()
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def start(self, endpoint: str, method: str) -> RequestTimer:
+        """开始一次请求尝试"""
+        with self._lock:
+            self._queued[endpoint] += 1
+        return RequestTimer(self, endpoint, method)
+
+    def record_call(self, endpoint: str, ok: bool, retries: int = 0):
+        """记录一次调用(含重试)的最终结果"""
+        with self._lock:
+            self._calls[(endpoint, "ok" if ok else "error")] += 1
+            self._retries[endpoint] += retries
+
+    def add_listener(self, listener: Callable[[Dict], None]):
+        self._listeners.append(listener)
+
+    def _dispatched(self, timer: RequestTimer):
+        with self._lock:
+            self._queued[timer.endpoint] -= 1
+            self._in_flight[timer.endpoint] += 1
+            self._histogram(self._queue_wait, timer.endpoint).observe(timer.dispatched - timer.created)
+
+    def _finished(self, timer: RequestTimer, status: int, now: float):
+        with self._lock:
+            if timer.dispatched is None:
+                # 排队中被取消或取令牌失败, 没有真正发出请求
+                self._queued[timer.endpoint] -= 1
+                return
+            self._in_flight[timer.endpoint] -= 1
+            self._requests[(timer.endpoint, timer.method, status)] += 1
+            self._bytes[timer.endpoint] += timer.bytes
+            self._histogram(self._latency, timer.endpoint).observe(now - timer.dispatched)
+            self._recent.append((now, timer.bytes))
+            self._trim(now)
+        record = {
+            "endpoint": timer.endpoint,
+            "method": timer.method,
+            "status": status,
+            "queue_wait": timer.dispatched - timer.created,
+            "in_flight": now - timer.dispatched,
+            "bytes": timer.bytes,
+        }
+        for listener in self._listeners:
+            try:
+                listener(record)
+            except Exception:
+                pass
+
+    def _histogram(self, histograms: Dict[str, Histogram], endpoint: str) -> Histogram:
+        if endpoint not in histograms:
+            histograms[endpoint] = Histogram(self.buckets)
+        return histograms[endpoint]
+
+    def _trim(self, now: float):
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent.popleft()
+
+    def snapshot(self) -> Dict:
+        """汇总当前指标, 供界面显示"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            window = min(RATE_WINDOW, max(time.time() - self.started, 1.0))
+            endpoints = sorted(set(self._queue_wait) | set(self._latency) | set(self._queued)
+                               | {e for e, _ in self._calls})
+            rows = []
+            for endpoint in endpoints:
+                requests = sum(c for (e, _, _), c in self._requests.items() if e == endpoint)
+                errors = sum(c for (e, _, s), c in self._requests.items() if e == endpoint and s != 200)
+                queue_wait = self._queue_wait.get(endpoint) or Histogram(self.buckets)
+                latency = self._latency.get(endpoint) or Histogram(self.buckets)
+                rows.append({
+                    "endpoint": endpoint,
+                    "requests": requests,
+                    "errors": errors,
+                    "retries": self._retries.get(endpoint, 0),
+                    "queued": self._queued.get(endpoint, 0),
+                    "in_flight": self._in_flight.get(endpoint, 0),
+                    "bytes": self._bytes.get(endpoint, 0),
+                    "queue_p50": queue_wait.quantile(0.5),
+                    "queue_p95": queue_wait.quantile(0.95),
+                    "latency_p50": latency.quantile(0.5),
+                    "latency_p95": latency.quantile(0.95),
+                    "latency_p99": latency.quantile(0.99),
+                })
+            return {
+                "requests": sum(self._requests.values()),
+                "errors": sum(c for (_, _, s), c in self._requests.items() if s != 200),
+                "retries": sum(self._retries.values()),
+                "queued": sum(self._queued.values()),
+                "in_flight": sum(self._in_flight.values()),
+                "bytes": sum(self._bytes.values()),
+                "rate": len(self._recent) / window,
+                "bytes_rate": sum(size for _, size in self._recent) / window,
+                "endpoints": rows,
+            }
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式输出全部指标"""
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name: str, labels: Dict, value):
+            text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+
+        with self._lock:
+            family("firecrawl_client_requests_total", "counter", "Firecrawl API 请求尝试数")
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                sample("firecrawl_client_requests_total",
+                       {"endpoint": endpoint, "method": method, "status": status}, count)
+            family("firecrawl_client_calls_total", "counter", "含重试的调用结果数")
+            for (endpoint, outcome), count in sorted(self._calls.items()):
+                sample("firecrawl_client_calls_total", {"endpoint": endpoint, "outcome": outcome}, count)
+            family("firecrawl_client_retries_total", "counter", "重试次数")
+            for endpoint, count in sorted(self._retries.items()):
+                sample("firecrawl_client_retries_total", {"endpoint": endpoint}, count)
+            family("firecrawl_client_received_bytes_total", "counter", "接收的响应体字节数")
+            for endpoint, count in sorted(self._bytes.items()):
+                sample("firecrawl_client_received_bytes_total", {"endpoint": endpoint}, count)
+            family("firecrawl_client_queued_requests", "gauge", "等待限流令牌或并发名额的请求数")
+            for endpoint, count in sorted(self._queued.items()):
+                sample("firecrawl_client_queued_requests", {"endpoint": endpoint}, count)
+            family("firecrawl_client_in_flight_requests", "gauge", "已发出尚未完成的请求数")
+            for endpoint, count in sorted(self._in_flight.items()):
+                sample("firecrawl_client_in_flight_requests", {"endpoint": endpoint}, count)
+            for name, help_text, histograms in (
+                ("firecrawl_client_queue_wait_seconds", "发送前的排队时间", self._queue_wait),
+                ("firecrawl_client_request_duration_seconds", "从发出请求到读完响应的时间", self._latency),
+            ):
+                family(name, "histogram", help_text)
+                for endpoint, histogram in sorted(histograms.items()):
+                    for le, count in histogram.cumulative():
+                        sample(f"{name}_bucket", {"endpoint": endpoint, "le": le}, count)
+                    sample(f"{name}_sum", {"endpoint": endpoint}, round(histogram.sum, 6))
+                    sample(f"{name}_count", {"endpoint": endpoint}, histogram.count)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+_server = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """返回进程级指标登记表"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
+
+
+def start_metrics_server(host: Optional[str] = None, port: Optional[int] = None) -> Optional[str]:
+    """在守护线程中启动 /metrics 端点, 返回其地址; 未配置 METRICS_PORT 时不启动
+
+    使用独立线程而非请求所用的事件循环, 事件循环繁忙时仍能被抓取。
+    Streamlit 重跑脚本时重复调用只启动一次。
+    """
+    global _server
+    port = port if port is not None else int(os.getenv("METRICS_PORT") or 0)
+    host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+    with _metrics_lock:
+        if _server is None:
+            if not port:
+                return None
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        address, bound = _server.server_address[:2]
+        return f"http://{address}:{bound}/metrics"
@@ -0,0 +1,55 @@
+from typing import Optional
+import streamlit as st
+from metrics import get_metrics
+
+# 指标面板的刷新间隔(秒)
+REFRESH_SECONDS = 2
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _format_ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def render_metrics_panel(endpoint_url: Optional[str] = None):
+    """显示本进程的API请求指标: 吞吐、排队/发送延迟、字节数和重试"""
+    snapshot = get_metrics().snapshot()
+    col1, col2 = st.columns(2)
+    col1.metric("请求/秒", f"{snapshot['rate']:.1f}")
+    col2.metric("接收/秒", _format_bytes(snapshot["bytes_rate"]))
+    col1.metric("发送中", snapshot["in_flight"])
+    col2.metric("排队中", snapshot["queued"])
+    st.caption(
+        f"共 {snapshot['requests']} 次请求, 失败 {snapshot['errors']} 次, 重试 {snapshot['retries']} 次, "
+        f"接收 {_format_bytes(snapshot['bytes'])}"
+    )
+    if snapshot["endpoints"]:
+        st.dataframe(
+            [
+                {
+                    "接口": row["endpoint"],
+                    "请求": row["requests"],
+                    "失败": row["errors"],
+                    "重试": row["retries"],
+                    "发送中": row["in_flight"],
+                    "排队P50(ms)": _format_ms(row["queue_p50"]),
+                    "排队P95(ms)": _format_ms(row["queue_p95"]),
+                    "延迟P50(ms)": _format_ms(row["latency_p50"]),
+                    "延迟P95(ms)": _format_ms(row["latency_p95"]),
+                    "延迟P99(ms)": _format_ms(row["latency_p99"]),
+                    "接收": _format_bytes(row["bytes"]),
+                }
+                for row in snapshot["endpoints"]
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+    if endpoint_url:
+        st.caption(f"Prometheus: {endpoint_url}")
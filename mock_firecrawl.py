@@ -0,0 +1,249 @@
+import time
+import uuid
+import asyncio
+import random
+import argparse
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from aiohttp import web
+
+# 单次状态查询返回的最多文档数, 超出部分通过 next 游标分页
+DEFAULT_PAGE_DOCS = 10
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """解析延迟分布, 返回生成延迟秒数的函数; 参数单位为毫秒
+
+    支持 fixed:50、uniform:20,200、lognormal:80,0.6(中位数, sigma)、exp:50(均值)。
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        delay = values[0] / 1000 if values else 0.0
+        return lambda: delay
+    if kind == "uniform":
+        low, high = values[0] / 1000, values[1] / 1000
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = values[0] / 1000, values[1] if len(values) > 1 else 0.5
+        return lambda: median * rng.lognormvariate(0, sigma)
+    if kind == "exp":
+        mean = values[0] / 1000
+        return lambda: rng.expovariate(1 / mean)
+    raise ValueError(f"未知延迟分布: {spec}")
+
+
+class MockConfig:
+    """模拟服务的行为参数"""
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 1.0, page_bytes: int = 4096, links_per_page: int = 20,
+                 crawl_pages: int = 100, job_rate: float = 50.0, page_docs: int = DEFAULT_PAGE_DOCS,
+                 map_links: int = 1000, search_results: int = 10, research_seconds: float = 5.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.page_bytes = page_bytes
+        self.links_per_page = links_per_page
+        self.crawl_pages = crawl_pages
+        self.job_rate = job_rate
+        self.page_docs = page_docs
+        self.map_links = map_links
+        self.search_results = search_results
+        self.research_seconds = research_seconds
+        self.seed = seed
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class MockFirecrawl:
+    """Firecrawl v1 API 的本地替身, 用于压测和基准测试
+
+    覆盖 scrape、batch/scrape、crawl(含 next 分页)、map、search、
+    deep-research 和 llmstxt。每个请求先按配置的分布等待, 再按概率返回
+    500 或带 Retry-After 的 429; 异步任务按 job_rate 页/秒推进。
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None):
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.latency = parse_latency(self.config.latency, self.rng)
+        self.jobs: Dict[str, Dict] = {}
+        self.requests = Counter()
+        self._body = self._make_body(self.config.page_bytes)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._faults], client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/stats", self.stats)
+        app.router.add_post("/v1/scrape", self.scrape)
+        app.router.add_post("/v1/batch/scrape", self.start_batch)
+        app.router.add_get("/v1/batch/scrape/{id}", self.job_status)
+        app.router.add_post("/v1/crawl", self.start_crawl)
+        app.router.add_get("/v1/crawl/{id}", self.job_status)
+        app.router.add_post("/v1/map", self.map)
+        app.router.add_post("/v1/search", self.search)
+        app.router.add_post("/v1/deep-research", self.start_research)
+        app.router.add_get("/v1/deep-research/{id}", self.research_status)
+        app.router.add_post("/v1/llmstxt", self.start_research)
+        app.router.add_get("/v1/llmstxt/{id}", self.research_status)
+        return app
+
+    @web.middleware
+    async def _faults(self, request: web.Request, handler):
+        if not request.path.startswith("/v1/"):
+            return await handler(request)
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else request.path
+        delay = self.latency()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = self.rng.random()
+        if roll < self.config.rate_limit_rate:
+            self.requests[(request.method, route, 429)] += 1
+            return web.json_response(
+                {"success": False, "error": "Rate limit exceeded"}, status=429,
+                headers={"Retry-After": str(self.config.retry_after)},
+            )
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.requests[(request.method, route, 500)] += 1
+            return web.json_response({"success": False, "error": "Internal server error"}, status=500)
+        self.requests[(request.method, route, 200)] += 1
+        return await handler(request)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"ok": True})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": [
+                {"method": m, "route": r, "status": s, "count": c} for (m, r, s), c in self.requests.items()
+            ],
+            "jobs": len(self.jobs),
+        })
+
+    async def scrape(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"success": True, "data": self._document(body.get("url", ""))})
+
+    async def start_batch(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response(self._start_job(list(body.get("urls") or []), request))
+
+    async def start_crawl(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        url = body.get("url", "").rstrip("/")
+        total = min(int(body.get("limit") or self.config.crawl_pages), self.config.crawl_pages)
+        return web.json_response(self._start_job([f"{url}/page-{i}" for i in range(total)], request))
+
+    async def job_status(self, request: web.Request) -> web.Response:
+        job = self.jobs.get(request.match_info["id"])
+        if job is None:
+            return web.json_response({"success": False, "error": "Job not found"}, status=404)
+        total = len(job["urls"])
+        completed = min(total, int((time.monotonic() - job["started"]) * self.config.job_rate))
+        skip = int(request.query.get("skip", 0))
+        end = min(completed, skip + self.config.page_docs)
+        payload = {
+            "status": "completed" if completed >= total else "scraping",
+            "total": total,
+            "completed": completed,
+            "creditsUsed": completed,
+            "expiresAt": "2099-01-01T00:00:00Z",
+            "data": [self._document(url) for url in job["urls"][skip:end]],
+        }
+        # 与真实服务一致: 任务进行中每次都返回 next, 完成后只在还有剩余文档时返回
+        if end < completed or completed < total:
+            payload["next"] = str(request.url.with_query({"skip": end}))
+        return web.json_response(payload)
+
+    async def map(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        url = body.get("url", "").rstrip("/")
+        count = min(int(body.get("limit") or self.config.map_links), self.config.map_links)
+        return web.json_response({"success": True, "links": [f"{url}/page-{i}" for i in range(count)]})
+
+    async def search(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        query = body.get("query", "")
+        count = min(int(body.get("limit") or self.config.search_results), self.config.search_results)
+        data = []
+        for i in range(count):
+            doc = self._document(f"https://search.example/{i}?q={query}")
+            data.append({"url": doc["metadata"]["sourceURL"], "title": f"{query} {i}",
+                         "description": f"result {i}", **doc})
+        return web.json_response({"success": True, "data": data})
+
+    async def start_research(self, request: web.Request) -> web.Response:
+        job = self._start_job([], request)
+        return web.json_response({**job, "jobId": job["id"]})
+
+    async def research_status(self, request: web.Request) -> web.Response:
+        job = self.jobs.get(request.match_info["id"])
+        if job is None:
+            return web.json_response({"success": False, "error": "Job not found"}, status=404)
+        elapsed = time.monotonic() - job["started"]
+        done = elapsed >= self.config.research_seconds
+        steps = int(elapsed)
+        data = {
+            "activities": [
+                {"type": "search", "message": f"step {i}", "timestamp": job["created"] + i} for i in range(steps + 1)
+            ],
+            "processedUrls": [f"https://research.example/{i}" for i in range(steps)],
+        }
+        if done:
+            data.update({
+                "finalAnalysis": self._body,
+                "sources": [{"url": u, "title": u, "description": ""} for u in data["processedUrls"]],
+                "llmstxt": self._body,
+                "llmsfulltxt": self._body,
+            })
+        return web.json_response({
+            "success": True,
+            "status": "completed" if done else "processing",
+            "currentDepth": min(steps, 5),
+            "maxDepth": 5,
+            "data": data,
+        })
+
+    def _start_job(self, urls: List[str], request: web.Request) -> Dict:
+        job_id = str(uuid.uuid4())
+        self.jobs[job_id] = {"urls": urls, "started": time.monotonic(), "created": time.time()}
+        return {"success": True, "id": job_id, "url": f"{request.url.origin()}{request.path}/{job_id}"}
+
+    def _document(self, url: str) -> Dict:
+        links = "\n".join(f"- [link {i}]({url}/link-{i})" for i in range(self.config.links_per_page))
+        return {
+            "markdown": f"# {url}\n\n{links}\n\n{self._body}",
+            "metadata": {"title": url, "sourceURL": url, "statusCode": 200},
+        }
+
+    @staticmethod
+    def _make_body(size: int) -> str:
+        words = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit")
+        text = " ".join(words[i % len(words)] for i in range(size // 5 + 1))
+        return text[:size]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="本地 Firecrawl v1 API 模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3002)
+    defaults = MockConfig()
+    for key, value in defaults.to_dict().items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = {k: v for k, v in vars(args).items() if k not in ("host", "port")}
+    server = MockFirecrawl(MockConfig(**options))
+    web.run_app(server.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import json
+import asyncio
+import logging
+import tempfile
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Tuple
+from url_canon import canonicalize_many, dedup_urls
+from export import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 同时映射的站点数
+MAP_WORKERS = 8
+
+
+def parse_sites(text: str) -> List[str]:
+    """从多行文本解析根URL, 缺少协议时补 https://, 按规范化形式去重并保持顺序"""
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        urls.append(line if "://" in line else f"https://{line}")
+    return dedup_urls(urls)[0]
+
+
+async def iter_map_sites(client, sites: List[str], map_options: Dict,
+                         workers: int = MAP_WORKERS) -> AsyncIterator[Tuple[str, Dict]]:
+    """用固定数量的工作任务并发映射多个站点, 按完成顺序产出 (站点, 映射结果)
+
+    map_options 为各站点共用的 /v1/map 请求体字段(不含 url)。
+    单个站点失败时产出错误字典, 不影响其他站点; 提前退出时取消未完成的映射。
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for site in sites:
+        pending.put_nowait(site)
+    results: asyncio.Queue = asyncio.Queue()
+    workers = max(1, min(workers, len(sites)))
+
+    async def work():
+        while True:
+            try:
+                site = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                result = await client.map(site, map_options)
+            except Exception as e:
+                logger.warning(f"映射 {site} 失败: {e}")
+                result = {"error": True, "message": str(e)}
+            await results.put((site, result))
+        await results.put(None)
+
+    tasks = [asyncio.ensure_future(work()) for _ in range(workers)]
+    finished = 0
+    try:
+        while finished < workers:
+            item = await results.get()
+            if item is None:
+                finished += 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class LinkSet:
+    """多个站点映射结果合并去重后的链接集合
+
+    链接按规范化后的URL去重, 保留首次发现的原始链接并将其站点记为来源, 记录逐批追加到
+    磁盘上的 NDJSON 文件; 内存中只保留去重用的URL集合和每个站点的计数,
+    界面预览和导出都从文件流式读取。
+    """
+
+    def __init__(self, prefix: str = "firecrawl_links_"):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".ndjson")
+        os.close(fd)
+        self.sites: Dict[str, Dict] = {}
+        self._seen = set()
+
+    def add(self, site: str, result: Dict) -> Dict:
+        """合并一个站点的映射结果, 返回该站点的计数"""
+        if result.get("error") or not result.get("success", True):
+            stats = {"links": 0, "new": 0, "duplicates": 0,
+                     "error": result.get("message") or str(result.get("error"))}
+            self.sites[site] = stats
+            return stats
+        found = result.get("links") or []
+        links = [(link, key) for link, key in zip(found, canonicalize_many(found)) if key]
+        new = []
+        for link, key in links:
+            if key not in self._seen:
+                self._seen.add(key)
+                new.append(link.strip())
+        with open(self.path, "a", encoding="utf-8", buffering=CHUNK_SIZE) as f:
+            for link in new:
+                f.write(json.dumps({"url": link, "site": site}, ensure_ascii=False))
+                f.write("\n")
+        stats = {"links": len(links), "new": len(new), "duplicates": len(links) - len(new), "error": None}
+        self.sites[site] = stats
+        return stats
+
+    def __len__(self):
+        return len(self._seen)
+
+    def iter_records(self) -> Iterator[Dict]:
+        """逐条读取 {url, site} 记录"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def head(self, n: int) -> List[Dict]:
+        return list(islice(self.iter_records(), n))
+
+    def export_text(self) -> str:
+        """将链接流式写为每行一个URL的临时文件, 返回文件路径"""
+        fd, path = tempfile.mkstemp(prefix="firecrawl_links_", suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8", buffering=CHUNK_SIZE) as f:
+            for record in self.iter_records():
+                f.write(record["url"])
+                f.write("\n")
+        return path
+
+    def site_rows(self) -> Iterable[Dict]:
+        """每个站点一行的计数, 供界面表格显示"""
+        for site, stats in self.sites.items():
+            yield {"站点": site, "链接": stats["links"], "新增": stats["new"],
+                   "重复": stats["duplicates"], "错误": stats["error"] or ""}
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
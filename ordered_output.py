@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReorderBuffer:
+    """有界重排序缓冲区
+
+    按输入下标接收乱序到达的结果, 只要前缀完整就按输入顺序释放。
+    缓冲条目超过 max_size 时跳过缺失的下标强制释放, 保证内存有界。
+    """
+
+    def __init__(self, max_size: int = 1000, start: int = 0):
+        self.max_size = max_size
+        self.next_index = start
+        self.skipped = 0
+        self._buffer = {}
+
+    def push(self, index: int, item: Any) -> List[Tuple[int, Any]]:
+        """放入一个结果, 返回可以按顺序输出的 (下标, 结果) 列表"""
+        if index < self.next_index:
+            # 已被跳过的下标迟到, 直接输出
+            return [(index, item)]
+        self._buffer[index] = item
+        released = self._drain()
+        if len(self._buffer) > self.max_size:
+            smallest = min(self._buffer)
+            self.skipped += smallest - self.next_index
+            logger.warning(f"重排序缓冲区已满, 跳过下标 {self.next_index}-{smallest - 1}")
+            self.next_index = smallest
+            released.extend(self._drain())
+        return released
+
+    def flush(self) -> List[Tuple[int, Any]]:
+        """输入结束时按顺序释放剩余结果"""
+        released = sorted(self._buffer.items())
+        self._buffer.clear()
+        if released:
+            self.next_index = released[-1][0] + 1
+        return released
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def _drain(self) -> List[Tuple[int, Any]]:
+        released = []
+        while self.next_index in self._buffer:
+            released.append((self.next_index, self._buffer.pop(self.next_index)))
+            self.next_index += 1
+        return released
+
+
+class SlotMatcher:
+    """把乱序到达的结果对应回输入下标
+
+    先按键(通常为规范化后的URL)取同键输入中最早未占用的下标; 键对不上
+    (重定向、服务端改写了URL)或同键下标已用完时, 按到达顺序取最早未占用
+    的下标, 每个输入位置都会被填上, 重排序缓冲区不会因缺口一直等到结束。
+    输入位置全部占用后, 多余的结果依次排在末尾。
+    """
+
+    def __init__(self, keys: Iterable[Hashable]):
+        self._slots: Dict[Hashable, deque] = {}
+        for i, key in enumerate(keys):
+            self._slots.setdefault(key, deque()).append(i)
+        self.size = sum(len(slots) for slots in self._slots.values())
+        self.unmatched = 0
+        self._claimed = bytearray(self.size)
+        self._cursor = 0
+        self._extra = self.size
+
+    def claim(self, key: Optional[Hashable]) -> int:
+        """为一个结果分配下标"""
+        slots = self._slots.get(key)
+        while slots:
+            i = slots.popleft()
+            if not self._claimed[i]:
+                self._claimed[i] = 1
+                return i
+        self.unmatched += 1
+        while self._cursor < self.size and self._claimed[self._cursor]:
+            self._cursor += 1
+        if self._cursor < self.size:
+            self._claimed[self._cursor] = 1
+            return self._cursor
+        self._extra += 1
+        return self._extra - 1
+
+
+async def iter_ordered(
+    items: Iterable,
+    worker: Callable[[Any], Awaitable],
+    window: int = 100,
+    on_complete: Optional[Callable[[int, int], None]] = None,
+) -> AsyncIterator[Tuple[int, Any, Any]]:
+    """并发处理输入并按输入顺序产出 (下标, 输入, 结果)
+
+    同时处理或等待输出的条目不超过 window 个, 慢的条目会阻止后续条目
+    开始, 因此内存占用有界。worker 抛出的异常作为结果产出。
+    on_complete(已完成数, 缓冲数) 在每个条目完成时调用, 用于显示进度。
+    """
+    source = iter(enumerate(items))
+    inputs = {}
+    pending = {}
+    buffer = ReorderBuffer(max_size=window)
+    completed = 0
+    exhausted = False
+
+    def refill():
+        nonlocal exhausted
+        while not exhausted and len(pending) + len(buffer) < window:
+            try:
+                i, item = next(source)
+            except StopIteration:
+                exhausted = True
+                return
+            inputs[i] = item
+            pending[asyncio.ensure_future(worker(item))] = i
+
+    refill()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            released = []
+            for task in done:
+                i = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    result = e
+                completed += 1
+                released.extend(buffer.push(i, result))
+            if on_complete:
+                on_complete(completed, len(buffer))
+            for i, result in released:
+                yield i, inputs.pop(i), result
+            refill()
+        for i, result in buffer.flush():
+            yield i, inputs.pop(i), result
+    finally:
+        for task in pending:
+            task.cancel()
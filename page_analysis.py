@@ -0,0 +1,135 @@
+import re
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+# 页面数少于该值时直接在当前进程计算, 省去进程间序列化开销
+PARALLEL_THRESHOLD = 64
+# 按内容哈希缓存的分析结果条数上限
+MEMO_SIZE = 100_000
+# 标注结果索引时每块分析的页面数
+ANALYSIS_CHUNK_SIZE = 1000
+# 大纲最多保留的标题数
+MAX_OUTLINE = 50
+# 经验值: 每个中日韩文字约 1 个 token, 其他词约 1.3 个 token
+TOKENS_PER_WORD = 1.3
+
+# CJK 统一表意文字、扩展A、兼容表意文字、日文假名和韩文音节, 每个字计为一个词
+_CJK = r"㐀-䶿一-鿿豈-﫿぀-ヿ가-힯"
+_CJK_RE = re.compile(rf"[{_CJK}]")
+_WORD_RE = re.compile(rf"[^\s{_CJK}\W]+")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_LINK_RE = re.compile(r"\[[^\]]*\]\([^)]+\)|(?<![(<])https?://[^\s)>\]]+")
+
+
+def analyze_markdown(markdown: str) -> Dict:
+    """逐行单遍统计一个页面
+
+    返回字数(中日韩文字按字计, 其他按空白分词)、近似 LLM token 数、
+    链接数、标题大纲和 markdown 字节数。token 数由 estimate_tokens 估算。
+    """
+    cjk_chars = 0
+    other_words = 0
+    links = 0
+    outline = []
+    for line in markdown.splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading and len(outline) < MAX_OUTLINE:
+            outline.append((len(heading.group(1)), heading.group(2)))
+        links += len(_LINK_RE.findall(line))
+        cjk_chars += len(_CJK_RE.findall(line))
+        other_words += len(_WORD_RE.findall(line))
+    return {
+        "word_count": cjk_chars + other_words,
+        "token_count": estimate_tokens(cjk_chars, other_words),
+        "link_count": links,
+        "outline": outline,
+        "size": len(markdown.encode("utf-8")),
+    }
+
+
+def estimate_tokens(cjk_chars: int, other_words: int) -> int:
+    """按经验估算 LLM token 数, 页面统计和去重报告共用, 保证两处口径一致"""
+    return round(cjk_chars + other_words * TOKENS_PER_WORD)
+
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """进程级共享的进程池, 在 Streamlit 重跑之间复用"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def content_hash(markdown: str) -> str:
+    return hashlib.md5(markdown.encode("utf-8")).hexdigest()
+
+
+def analyze_pages(pages: Iterable[Dict], parallel: Optional[bool] = None) -> List[Dict]:
+    """分析一组页面(parse_crawl_results 的输出), 返回与输入顺序一致的统计结果
+
+    结果按 markdown 内容哈希缓存, 重复内容和重跑不会重新计算;
+    未命中的页面较多时分发到进程池并行计算。
+    """
+    markdowns = [page.get("markdown") or "" for page in pages]
+    hashes = [content_hash(md) for md in markdowns]
+
+    results = {}
+    missing = {}
+    with _memo_lock:
+        for h, md in zip(hashes, markdowns):
+            if h in _memo:
+                _memo.move_to_end(h)
+                results[h] = _memo[h]
+            elif h not in missing:
+                missing[h] = md
+
+    if missing:
+        todo = list(missing.items())
+        if parallel is None:
+            parallel = len(todo) >= PARALLEL_THRESHOLD
+        if parallel:
+            chunksize = max(1, len(todo) // 64)
+            computed = get_process_pool().map(
+                analyze_markdown, [md for _, md in todo], chunksize=chunksize
+            )
+        else:
+            computed = map(analyze_markdown, [md for _, md in todo])
+        computed = dict(zip((h for h, _ in todo), computed))
+        results.update(computed)
+        with _memo_lock:
+            _memo.update(computed)
+            while len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+
+    return [results[h] for h in hashes]
+
+
+def annotate_index(index):
+    """分块分析结果索引(ResultIndex)中的页面并写回统计字段
+
+    内存中最多同时保留一块页面内容。
+    """
+    chunk = []
+    for i, page in enumerate(index.iter_pages()):
+        chunk.append((i, page))
+        if len(chunk) >= ANALYSIS_CHUNK_SIZE or i == len(index) - 1:
+            stats = analyze_pages([page for _, page in chunk])
+            for (j, _), page_stats in zip(chunk, stats):
+                index.annotate(j, {
+                    "word_count": page_stats["word_count"],
+                    "token_count": page_stats["token_count"],
+                    "link_count": page_stats["link_count"],
+                    "headings": len(page_stats["outline"]),
+                })
+            chunk = []
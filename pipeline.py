@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from url_canon import canonicalize_many
+
+logger = logging.getLogger(__name__)
+
+# 发现队列容量; 抓取跟不上时映射阶段在此处等待
+QUEUE_SIZE = 200
+
+
+def discovery_stages(map_options: Dict, sitemap_first: bool = False) -> List[Tuple[str, Dict]]:
+    """返回一次映射的各个阶段 [(阶段名, /v1/map 选项)]
+
+    /v1/map 只在请求结束时一次性返回全部链接。sitemap_first 为真时先只读
+    站点地图, 尽快拿到第一批链接开始抓取, 再用完整选项补充其余链接; 代价是
+    多一次映射请求和相应额度, 且完整映射会再次返回站点地图中的链接。
+    默认或用户已指定只读、忽略站点地图时只有一个阶段。
+    """
+    if not sitemap_first or map_options.get("sitemapOnly") or map_options.get("ignoreSitemap"):
+        return [("map", map_options)]
+    return [("sitemap", {**map_options, "sitemapOnly": True}), ("map", map_options)]
+
+
+async def map_and_scrape(
+    client,
+    url: str,
+    map_options: Dict,
+    scrape_options: Optional[Dict] = None,
+    workers: Optional[int] = None,
+    queue_size: int = QUEUE_SIZE,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    sitemap_first: bool = False,
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """映射网站并把发现的链接流式交给抓取任务, 按完成顺序产出 (url, 抓取结果)
+
+    映射阶段为生产者, 规范化去重后把链接放入有界队列; workers 个抓取任务
+    从队列消费, 默认等于客户端设置的并发数, 实际并发仍由客户端的自适应
+    限流器控制。队列满时映射阶段等待,
+    结果未被取走时抓取任务等待, 因此两端都有背压、内存有界。
+    map_options 为 /v1/map 请求体字段, 其中 limit 为发现链接总数上限。
+    sitemap_first 见 discovery_stages。on_progress(stats) 在计数变化时调用。
+    """
+    workers = workers or client.max_concurrency
+    limit = map_options.get("limit")
+    links: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    results: asyncio.Queue = asyncio.Queue(maxsize=workers)
+    stats = {
+        "stage": "",
+        "discovered": 0,
+        "duplicates": 0,
+        "queued": 0,
+        "scraped": 0,
+        "failed": 0,
+        "map_done": False,
+        "errors": [],
+    }
+
+    def report():
+        stats["queued"] = links.qsize()
+        if on_progress:
+            on_progress(stats)
+
+    async def produce():
+        seen = set()
+        try:
+            for stage, options in discovery_stages(map_options, sitemap_first):
+                if limit and len(seen) >= limit:
+                    break
+                stats["stage"] = stage
+                report()
+                try:
+                    result = await client.map(url, options)
+                except Exception as e:
+                    result = {"error": True, "message": str(e)}
+                if result.get("error") or not result.get("success", True):
+                    message = result.get("message") or result.get("error")
+                    stats["errors"].append(f"{stage}: {message}")
+                    logger.warning(f"映射阶段 {stage} 失败: {message}")
+                    continue
+                # 规范化形式只用作去重键, 抓取的是原始链接
+                found = result.get("links") or []
+                for link, key in zip(found, canonicalize_many(found)):
+                    if not key or key in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    if limit and len(seen) >= limit:
+                        break
+                    seen.add(key)
+                    stats["discovered"] += 1
+                    await links.put(link.strip())
+                    report()
+        except Exception as e:
+            # 保证抓取任务总能收到结束标记, 不让整个流水线挂起
+            stats["errors"].append(str(e))
+            logger.exception("映射阶段异常")
+        stats["map_done"] = True
+        report()
+        # 每个抓取任务收到一个结束标记
+        for _ in range(workers):
+            await links.put(None)
+
+    async def consume():
+        while True:
+            link = await links.get()
+            if link is None:
+                break
+            try:
+                result = await client.scrape(link, scrape_options)
+            except Exception as e:
+                result = {"error": True, "message": str(e)}
+            await results.put((link, result))
+        await results.put(None)
+
+    tasks = [asyncio.ensure_future(produce())]
+    tasks += [asyncio.ensure_future(consume()) for _ in range(workers)]
+    finished = 0
+    try:
+        while finished < workers:
+            item = await results.get()
+            if item is None:
+                finished += 1
+                continue
+            if item[1].get("error"):
+                stats["failed"] += 1
+            else:
+                stats["scraped"] += 1
+            report()
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
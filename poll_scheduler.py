@@ -0,0 +1,206 @@
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from typing import Dict, Optional
+
+# 轮询间隔下限(秒)
+MIN_INTERVAL = 1.0
+# 轮询间隔上限(秒); 单个任务的上限还不超过其基础间隔的 MAX_BACKOFF_FACTOR 倍
+MAX_INTERVAL = 60.0
+MAX_BACKOFF_FACTOR = 8
+# 连续无进展时每次放大的倍数
+BACKOFF = 1.5
+# 连续多少次轮询无进展视为停滞
+STALL_POLLS = 2
+# 下次轮询安排在预计剩余时间的该比例处, 越接近完成间隔越短
+ETA_FRACTION = 0.5
+# 到期时间相差在该秒数内的轮询合并为一次唤醒
+COALESCE_WINDOW = 0.5
+# 用于估计进度速率的最近状态样本数
+SAMPLE_SIZE = 8
+
+
+def progress_fraction(status: Dict) -> Optional[float]:
+    """从状态响应估计完成比例: 优先 completed/total, 其次 currentDepth/maxDepth"""
+    if status.get("status") == "completed":
+        return 1.0
+    total = status.get("total")
+    if total:
+        return min((status.get("completed") or 0) / total, 1.0)
+    max_depth = status.get("maxDepth")
+    if max_depth:
+        return min((status.get("currentDepth") or 0) / max_depth, 1.0)
+    return None
+
+
+def activity_marker(status: Dict):
+    """返回代表最新活动的标记, 活动时间戳或已处理URL数变化即视为有进展"""
+    data = status.get("data") if isinstance(status.get("data"), dict) else {}
+    activities = status.get("activities") or data.get("activities") or []
+    if activities:
+        last = activities[-1]
+        return last.get("timestamp") or (len(activities), last.get("message"))
+    if data.get("processedUrls"):
+        return len(data["processedUrls"])
+    return None
+
+
+class JobProgress:
+    """单个任务的进度估计和轮询间隔计算
+
+    有进度比例时按最近样本的速率估计剩余时间(ETA), 下次轮询安排在
+    ETA 的 ETA_FRACTION 处; 连续 STALL_POLLS 次无进展时按 BACKOFF 放大间隔;
+    无法估计时使用基础间隔。同时统计相对固定间隔轮询省下的次数。
+    """
+
+    def __init__(self, base_interval: float):
+        self.base_interval = base_interval
+        self.max_interval = min(MAX_INTERVAL, base_interval * MAX_BACKOFF_FACTOR)
+        self.interval = base_interval
+        self.started = time.monotonic()
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+        self.polls = 0
+        self.stalls = 0
+        self._marker = None
+
+    def observe(self, status: Dict, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.polls += 1
+        progressed = False
+        fraction = progress_fraction(status)
+        if fraction is not None:
+            progressed = not self.samples or fraction > self.samples[-1][1]
+            self.samples.append((now, fraction))
+        marker = activity_marker(status)
+        if marker is not None and marker != self._marker:
+            progressed = True
+            self._marker = marker
+        self.stalls = 0 if progressed else self.stalls + 1
+
+    def eta(self) -> Optional[float]:
+        """预计剩余秒数, 样本不足或没有进展时返回 None"""
+        if not self.samples:
+            return None
+        t1, f1 = self.samples[-1]
+        if f1 >= 1.0:
+            return 0.0
+        t0, f0 = self.samples[0]
+        if len(self.samples) < 2 or f1 <= f0 or t1 <= t0:
+            return None
+        return (1.0 - f1) * (t1 - t0) / (f1 - f0)
+
+    def next_interval(self) -> float:
+        if self.stalls >= STALL_POLLS:
+            interval = self.interval * BACKOFF
+        else:
+            eta = self.eta()
+            interval = self.base_interval if eta is None else eta * ETA_FRACTION
+        self.interval = min(max(interval, MIN_INTERVAL), self.max_interval)
+        return self.interval
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        """轮询次数, 以及与按基础间隔固定轮询相比省下的次数(可为负)"""
+        now = time.monotonic() if now is None else now
+        baseline = int((now - self.started) / self.base_interval) + 1
+        eta = self.eta()
+        return {
+            "polls": self.polls,
+            "polls_saved": baseline - self.polls,
+            "poll_interval": round(self.interval, 1),
+            "eta": round(eta) if eta is not None else None,
+        }
+
+
+class PollScheduler:
+    """合并多个任务轮询的调度器
+
+    各任务在两次轮询之间调用 wait(job_id, status), 调度器记录状态并按
+    JobProgress 计算下次轮询时间; 所有等待由同一个定时循环唤醒, 到期时间
+    相差在 COALESCE_WINDOW 内的任务一起唤醒, 请求并发发出。
+    定时循环在首次 wait 所在的事件循环中启动, 调度器只能在该循环中使用。
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW):
+        self.window = window
+        self.jobs: Dict[str, JobProgress] = {}
+        self.totals = {"polls": 0, "polls_saved": 0, "wakeups": 0, "coalesced": 0}
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    def track(self, job_id: str, base_interval: float) -> JobProgress:
+        if job_id not in self.jobs:
+            self.jobs[job_id] = JobProgress(base_interval)
+        return self.jobs[job_id]
+
+    def forget(self, job_id: str) -> Dict:
+        """停止跟踪任务, 返回其最终轮询统计并计入总数"""
+        progress = self.jobs.pop(job_id, None)
+        if progress is None:
+            return {}
+        stats = progress.stats()
+        self.totals["polls"] += stats["polls"]
+        self.totals["polls_saved"] += stats["polls_saved"]
+        return stats
+
+    def job_stats(self, job_id: str) -> Dict:
+        progress = self.jobs.get(job_id)
+        return progress.stats() if progress else {}
+
+    def summary(self) -> Dict:
+        """包括进行中任务在内的轮询统计"""
+        live = [progress.stats() for progress in list(self.jobs.values())]
+        return {
+            **self.totals,
+            "active": len(live),
+            "polls": self.totals["polls"] + sum(s["polls"] for s in live),
+            "polls_saved": self.totals["polls_saved"] + sum(s["polls_saved"] for s in live),
+        }
+
+    async def wait(self, job_id: str, status: Dict):
+        """记录本次状态并等待到该任务的下次轮询时间"""
+        progress = self.jobs.get(job_id) or self.track(job_id, MIN_INTERVAL)
+        progress.observe(status)
+        due = time.monotonic() + progress.next_interval()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (due, next(self._seq), future))
+        self._ensure_timer()
+        self._wakeup.set()
+        await future
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _ensure_timer(self):
+        if self._timer is None or self._timer.done():
+            self._wakeup = asyncio.Event()
+            self._timer = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            deadline = time.monotonic() + self.window
+            fired = 0
+            while self._heap and self._heap[0][0] <= deadline:
+                future = heapq.heappop(self._heap)[2]
+                if not future.done():
+                    future.set_result(None)
+                    fired += 1
+            if fired:
+                self.totals["wakeups"] += 1
+                self.totals["coalesced"] += fired - 1
@@ -0,0 +1,121 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Optional
+
+# 各接口单次提交消耗的令牌数, 未列出的接口和状态查询(GET)均为1
+DEFAULT_WEIGHTS = {"deep-research": 5.0, "llmstxt": 3.0, "crawl": 2.0, "batch/scrape": 2.0}
+
+
+def _parse_mapping(value: Optional[str]) -> Dict[str, float]:
+    """解析 "scrape=100,crawl=15" 形式的环境变量"""
+    mapping = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            mapping[name.strip()] = float(number)
+    return mapping
+
+
+class TokenBucket:
+    """线程安全的令牌桶, 采用预约方式: 先扣减令牌, 返回需要等待的秒数"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """按API密钥和接口划分的进程级令牌桶限流器
+
+    每个密钥有一个总桶(rpm 每分钟令牌数), 配置了 endpoint_rpm 的接口另有
+    独立的桶, 请求需同时满足两者。rpm 为0时不限流。
+    """
+
+    def __init__(self, rpm: float = 0, burst: Optional[float] = None,
+                 endpoint_rpm: Optional[Dict[str, float]] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.rpm = rpm
+        self.burst = burst
+        self.endpoint_rpm = endpoint_rpm or {}
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def weight(self, endpoint: str, method: str = "POST") -> float:
+        if method.upper() == "GET":
+            return 1.0
+        return self.weights.get(endpoint, 1.0)
+
+    def reserve(self, api_key: str, endpoint: str, method: str = "POST") -> float:
+        """预约令牌, 返回需要等待的秒数"""
+        tokens = self.weight(endpoint, method)
+        key = hashlib.sha1((api_key or "").encode()).hexdigest()[:16]
+        delay = 0.0
+        if self.rpm > 0:
+            delay = self._bucket((key, "*"), self.rpm).reserve(tokens)
+        if endpoint in self.endpoint_rpm:
+            delay = max(delay, self._bucket((key, endpoint), self.endpoint_rpm[endpoint]).reserve(tokens))
+        return delay
+
+    async def acquire(self, api_key: str, endpoint: str, method: str = "POST"):
+        """异步等待直到令牌可用"""
+        delay = self.reserve(api_key, endpoint, method)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, api_key: str, endpoint: str, method: str = "POST"):
+        """同步等待直到令牌可用"""
+        delay = self.reserve(api_key, endpoint, method)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _bucket(self, key, rpm: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # 容量至少能容纳一次最重的请求, 否则高权重接口永远需要等待
+                capacity = self.burst or max(1.0, rpm / 6, *self.weights.values())
+                bucket = TokenBucket(rpm / 60.0, capacity)
+                self._buckets[key] = bucket
+            return bucket
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """返回按环境变量配置的进程级限流器, 所有页面和会话共享"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            burst = os.getenv("FIRECRAWL_RATE_LIMIT_BURST")
+            _limiter = RateLimiter(
+                rpm=float(os.getenv("FIRECRAWL_RATE_LIMIT_RPM", 0)),
+                burst=float(burst) if burst else None,
+                endpoint_rpm=_parse_mapping(os.getenv("FIRECRAWL_ENDPOINT_RPM")),
+                weights=_parse_mapping(os.getenv("FIRECRAWL_ENDPOINT_WEIGHTS")),
+            )
+        return _limiter
+
+
+def api_key_from_headers(headers: Optional[Dict]) -> str:
+    """从 Authorization 头中取出API密钥"""
+    auth = (headers or {}).get("Authorization", "")
+    return auth[len("Bearer "):] if auth.startswith("Bearer ") else auth
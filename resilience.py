@@ -0,0 +1,195 @@
+import time
+import random
+import asyncio
+import threading
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 可重试的状态码; 0 表示请求未得到响应(网络异常或超时)
+RETRYABLE_STATUS = {0, 408, 425, 429, 500, 502, 503, 504}
+# 非幂等请求(提交任务的 POST)只在确定服务端未受理时重试: 429/503 以及连接被拒绝;
+# 超时、断连和 500/502/504 时任务可能已创建, 重试会重复提交并重复计费
+NON_IDEMPOTENT_RETRYABLE_STATUS = {429, 503}
+# 计入熔断失败的状态码, 429 属于限流而非后端故障, 不计入
+BREAKER_STATUS = {0, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开, 请求被快速拒绝"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"熔断器已打开: {endpoint} 暂停请求, {retry_in:.0f}秒后重试")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        self.status = 503
+        self.retries = 0
+
+
+class RetryPolicy:
+    """指数退避加全抖动的重试策略"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次失败后的等待时间, 不短于服务端给出的 Retry-After"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            return max(backoff, min(retry_after, self.max_delay))
+        return backoff
+
+
+class CircuitBreaker:
+    """单个接口的熔断器
+
+    连续失败达到阈值后打开, reset_timeout 后进入半开状态放行一个试探请求,
+    试探成功则关闭, 失败则重新打开。
+    """
+
+    def __init__(self, endpoint: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """请求前检查, 熔断时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == "open" and elapsed >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.endpoint, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"熔断器打开: {self.endpoint} (连续失败 {self.failures} 次)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def snapshot(self) -> Dict:
+        return {"endpoint": self.endpoint, "state": self.state, "failures": self.failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """返回进程级共享的接口熔断器"""
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def breaker_states() -> Dict[str, str]:
+    """所有接口熔断器的当前状态"""
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+def endpoint_name(url: str) -> str:
+    """从请求URL得到接口名, 如 /v1/batch/scrape/{id} -> batch/scrape"""
+    segments = [s for s in urlsplit(url).path.split("/") if s and s != "v1"]
+    if not segments:
+        return "root"
+    if segments[0] == "batch" and len(segments) > 1:
+        return "batch/" + segments[1]
+    return segments[0]
+
+
+def classify(exc: BaseException) -> Tuple[bool, int, Optional[float]]:
+    """将异常归类为 (是否可重试, 状态码, Retry-After)"""
+    if isinstance(exc, CircuitOpenError):
+        return False, exc.status, None
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS, status, getattr(exc, "retry_after", None)
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return True, 0, None
+    # aiohttp.ClientError 等网络异常
+    if type(exc).__module__.startswith("aiohttp"):
+        return True, 0, None
+    return False, -1, None
+
+
+def not_sent(exc: BaseException) -> bool:
+    """请求是否确定没有到达服务端(连接被拒绝或建立连接失败)"""
+    if isinstance(exc, ConnectionRefusedError):
+        return True
+    # aiohttp.ClientConnectorError: 连接尚未建立, 请求未发出
+    return any(cls.__name__ == "ClientConnectorError" and cls.__module__.startswith("aiohttp")
+               for cls in type(exc).__mro__)
+
+
+def retryable_for(exc: BaseException, idempotent: bool = True) -> Tuple[bool, int, Optional[float]]:
+    """按请求是否幂等归类异常, 返回 (是否可重试, 状态码, Retry-After)"""
+    retryable, status, retry_after = classify(exc)
+    if retryable and not idempotent:
+        retryable = status in NON_IDEMPOTENT_RETRYABLE_STATUS or (status == 0 and not_sent(exc))
+    return retryable, status, retry_after
+
+
+async def call_with_retry(endpoint: str, attempt: Callable[[], Awaitable],
+                          policy: Optional[RetryPolicy] = None, idempotent: bool = True):
+    """按重试策略和接口熔断器执行请求, 返回 (结果, 重试次数)
+
+    idempotent 为假时(如提交任务的 POST)只重试确定未被服务端受理的失败。
+    最终失败时抛出最后一次的异常, 并在异常上附加 retries 属性。
+    """
+    policy = policy or DEFAULT_POLICY
+    breaker = get_breaker(endpoint)
+    retries = 0
+    while True:
+        try:
+            breaker.before_request()
+        except CircuitOpenError as e:
+            e.retries = retries
+            raise
+        try:
+            result = await attempt()
+        except Exception as e:
+            retryable, status, retry_after = retryable_for(e, idempotent)
+            if status in BREAKER_STATUS:
+                breaker.record_failure()
+            else:
+                # 4xx 等响应说明后端仍可用, 不应让熔断器停留在半开状态
+                breaker.record_success()
+            if not retryable or retries + 1 >= policy.max_attempts:
+                e.retries = retries
+                raise
+            delay = policy.delay(retries, retry_after)
+            logger.info(f"{endpoint} 请求失败({status}), {delay:.1f}秒后第{retries + 1}次重试")
+            retries += 1
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result, retries
+
+
+DEFAULT_POLICY = RetryPolicy()
@@ -0,0 +1,100 @@
+import os
+from typing import Callable, Dict, Iterable, Optional
+import streamlit as st
+# ResultIndex 不依赖 streamlit, 定义在 export 中供无界面的脚本导入, 此处沿用原导入路径
+from export import EXPORT_FORMATS, ResultIndex, export_to_file
+from dedup import find_duplicates, skip_indices
+
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def render_result_browser(index: ResultIndex, key: str, page_size: int = 20,
+                          columns: Optional[Dict[str, str]] = None):
+    """分页渲染结果索引, 只有展开的条目才读取并渲染 markdown
+
+    columns 为额外显示的索引字段及其标签, 如 {"word_count": "字数"}。
+    """
+    query = st.text_input("按URL或标题过滤", key=f"{key}_query")
+    matches = index.search(query)
+    if not matches:
+        st.info("没有匹配的结果")
+        return
+
+    pages = max(1, (len(matches) + page_size - 1) // page_size)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("页码", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    with col2:
+        st.caption(f"匹配 {len(matches)} / {len(index)} 条, 共 {pages} 页, "
+                   f"合计 {_format_size(index.total_bytes)}")
+
+    start = (page - 1) * page_size
+    for i in matches[start:start + page_size]:
+        entry = index.entries[i]
+        label = f"{entry['title']} · {entry['url']} · {_format_size(entry['size'])}"
+        for field, name in (columns or {}).items():
+            if field in entry:
+                label += f" · {name}: {entry[field]}"
+        if st.toggle(label, key=f"{key}_open_{i}"):
+            st.markdown(index.read(i))
+
+
+def render_export_panel(key: str, file_name: str,
+                        records: Optional[Callable[[], Iterable[Dict]]] = None,
+                        pages: Optional[Callable[[], Iterable[Dict]]] = None):
+    """导出控件: 点击后才流式生成导出文件, 下载直接读取该文件"""
+    state_key = f"{key}_export"
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        fmt = st.selectbox("导出格式", list(EXPORT_FORMATS), key=f"{key}_format")
+        dedup = st.checkbox("去除近似重复页面", value=False, key=f"{key}_dedup",
+                            help="按 SimHash 指纹聚类, 每组只保留一个规范页面")
+    with col2:
+        if st.button("生成导出文件", key=f"{key}_build"):
+            previous = st.session_state.get(state_key)
+            if previous:
+                try:
+                    os.remove(previous[1])
+                except OSError:
+                    pass
+            export_records, export_pages = records, pages
+            if dedup:
+                with st.spinner("正在检测近似重复页面..."):
+                    report = find_duplicates((pages or records)())
+                removed = report["removed"]
+                if records:
+                    export_records = lambda: skip_indices(records(), removed)
+                if pages:
+                    export_pages = lambda: skip_indices(pages(), removed)
+                st.session_state[f"{key}_dedup_report"] = report
+            else:
+                st.session_state.pop(f"{key}_dedup_report", None)
+            with st.spinner("正在生成导出文件..."):
+                st.session_state[state_key] = (fmt, export_to_file(fmt, export_records, export_pages))
+
+    report = st.session_state.get(f"{key}_dedup_report")
+    if report:
+        st.caption(
+            f"去重: {report['pages']} 页中发现 {report['clusters']} 组近似重复, "
+            f"去除 {len(report['removed'])} 页, 节省 {_format_size(report['bytes_saved'])}、"
+            f"约 {report['tokens_saved']} tokens"
+        )
+
+    exported = st.session_state.get(state_key)
+    if exported and os.path.exists(exported[1]):
+        fmt, path = exported
+        _, _, suffix, mime = EXPORT_FORMATS[fmt]
+        with open(path, "rb") as f:
+            st.download_button(
+                label=f"下载 {fmt} ({_format_size(os.path.getsize(path))})",
+                data=f,
+                file_name=f"{file_name}{suffix}",
+                mime=mime,
+                key=f"{key}_download",
+            )
@@ -0,0 +1,196 @@
+import os
+import json
+import asyncio
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url: str) -> str:
+    """规范化缓存用的URL: 协议和主机小写, 去掉片段和默认端口"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def canonicalize_options(options: Optional[Dict]) -> str:
+    """将抓取选项序列化为稳定的字符串, formats 顺序不影响结果"""
+    options = dict(options or {})
+    if isinstance(options.get("formats"), list):
+        options["formats"] = sorted(options["formats"])
+    return json.dumps(options, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class ScrapeCache:
+    """基于磁盘的抓取结果缓存
+
+    以规范化URL和选项的md5为键, 文件按键前两位分目录存放。
+    支持TTL过期和按总字节数的LRU淘汰, 并记录命中/未命中计数。
+    锁只保护内存索引, 文件读写在锁外进行; 协程中应使用 get_async/set_async,
+    以免磁盘读写阻塞事件循环。
+    """
+
+    def __init__(self, cache_dir: str = ".scrape_cache", ttl: float = 24 * 3600,
+                 max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> [最近访问时间, 文件大小], 启动时从磁盘重建
+        self._index = {}
+        self._total_bytes = 0
+        self._load_index()
+
+    def make_key(self, url: str, options: Optional[Dict] = None) -> str:
+        """生成缓存键"""
+        raw = f"{normalize_url(url)}\n{canonicalize_options(options)}"
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def get(self, url: str, options: Optional[Dict] = None) -> Optional[Dict]:
+        """读取缓存的文档, 未命中或已过期返回 None"""
+        key = self._lookup(url, options)
+        return self._read(key) if key else None
+
+    async def get_async(self, url: str, options: Optional[Dict] = None) -> Optional[Dict]:
+        """协程版 get: 只在事件循环上查内存索引, 命中后到线程中读文件"""
+        key = self._lookup(url, options)
+        return await asyncio.to_thread(self._read, key) if key else None
+
+    def set(self, url: str, options: Optional[Dict], document: Dict):
+        """写入文档, 超出容量时淘汰最久未访问的条目"""
+        key = self.make_key(url, options)
+        path = self._path(key)
+        payload = json.dumps(
+            {"url": url, "stored_at": time.time(), "document": document},
+            ensure_ascii=False,
+        )
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        # 文件读写不持锁, 锁只保护内存索引, 避免查索引时等待磁盘
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._index.get(key)
+            if old:
+                self._total_bytes -= old[1]
+            self._index[key] = [time.time(), size]
+            self._total_bytes += size
+            evicted = self._evict()
+        self._remove(evicted)
+
+    async def set_async(self, url: str, options: Optional[Dict], document: Dict):
+        """协程版 set, 序列化和写文件在线程中进行"""
+        await asyncio.to_thread(self.set, url, options, document)
+
+    def stats(self) -> Dict:
+        """返回缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self._total_bytes = 0
+        self._remove(keys)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _lookup(self, url: str, options: Optional[Dict]) -> Optional[str]:
+        """只查内存索引, 返回已缓存条目的键, 未缓存时计一次未命中"""
+        key = self.make_key(url, options)
+        with self._lock:
+            if key in self._index:
+                return key
+            self.misses += 1
+            return None
+
+    def _read(self, key: str) -> Optional[Dict]:
+        """读取条目文件, 文件损坏或已过期时删除条目"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = None
+        if record is None or time.time() - record.get("stored_at", 0) > self.ttl:
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            self._remove([key])
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            entry = self._index.get(key)
+            if entry:
+                entry[0] = now
+            self.hits += 1
+        return record.get("document")
+
+    def _load_index(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".json"):
+                    continue
+                st = os.stat(os.path.join(shard_dir, name))
+                self._index[name[:-5]] = [st.st_mtime, st.st_size]
+                self._total_bytes += st.st_size
+        self._remove(self._evict())
+
+    def _drop(self, key: str):
+        """从索引中移除条目, 调用方持有锁"""
+        entry = self._index.pop(key, None)
+        if entry:
+            self._total_bytes -= entry[1]
+
+    def _remove(self, keys: List[str]):
+        """删除条目文件, 在锁外调用"""
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _evict(self) -> List[str]:
+        """按最久未访问淘汰到容量以内, 返回被淘汰的键, 调用方持有锁并在锁外删除文件"""
+        evicted = []
+        if self._total_bytes <= self.max_bytes:
+            return evicted
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._drop(key)
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
@@ -1,5 +1,11 @@
 import os
-import requests
+import asyncio
+from http_pool import request_json
+from corpus import get_corpus
+from async_utils import AsyncFirecrawlClient
+from search_fanout import (
+    MAX_SEARCHES, GRID_PARAMS, build_search_payload, expand_search_grid, iter_search_fanout, fuse_results
+)
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -11,6 +17,8 @@ API_KEY = os.getenv("FIRECRAWL_API_KEY")
 # 初始化session状态
 if 'results' not in st.session_state:
     st.session_state.results = None
+if 'fanout' not in st.session_state:
+    st.session_state.fanout = None
 
 def submit_search(query, options):
     """提交搜索任务"""
@@ -18,47 +26,64 @@ def submit_search(query, options):
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
     }
-    payload = {
-        "query": query,
-        "limit": options["limit"],
-        "scrapeOptions": {
-            "formats": ["markdown"] if options["get_markdown"] else []
-        }
-    }
-    
-    # 可选参数
-    if options["tbs"]:
-        payload["tbs"] = options["tbs"]
-    if options["lang"]:
-        payload["lang"] = options["lang"]
-    if options["country"]:
-        payload["country"] = options["country"]
-    if options["location"]:
-        payload["location"] = options["location"]
-    if options["timeout"]:
-        payload["timeout"] = options["timeout"]
-
     try:
-        response = requests.post(
+        return request_json(
+            "POST",
             f"{API_URL}/search",
             headers=headers,
-            json=payload
+            json=build_search_payload(query, options)
         )
-        response.raise_for_status()
-        return response.json()
     except Exception as e:
         st.error(f"搜索失败: {str(e)}")
         return None
 
+def split_values(text):
+    """将逗号分隔的参数取值拆成列表"""
+    return [v.strip() for v in (text or "").split(",") if v.strip()]
+
+async def run_fanout(searches, concurrency, on_result):
+    """并发执行多个搜索, 每个搜索返回时调用 on_result(下标, 响应)"""
+    # 并发数同时作为自适应限流的上限, 不会被调高到默认的 64
+    client = AsyncFirecrawlClient(API_URL, API_KEY, max_concurrency=concurrency,
+                                  max_concurrency_ceiling=concurrency)
+    async for i, result in iter_search_fanout(client, searches):
+        on_result(i, result)
+
+def render_result_item(item):
+    """显示单条搜索结果的详情"""
+    st.markdown(f"**URL**: {item.get('url', '无URL')}")
+    st.markdown(f"**描述**: {item.get('description', '无描述')}")
+    
+    if item.get("markdown"):
+        st.markdown("**完整内容**")
+        st.markdown(item["markdown"])
+    
+    if item.get("links"):
+        st.markdown(f"**链接**: {len(item['links'])}个")
+        for link in item["links"][:5]:  # 最多显示5个链接
+            st.markdown(f"- {link}")
+
 # Streamlit界面
 st.title("🔍 Firecrawl 搜索工具")
 
+mode = st.radio("搜索模式", ["单个查询", "多查询"], horizontal=True,
+                help="多查询模式并发执行多个查询及参数组合, 按URL合并去重并融合排名")
+
 # 搜索查询输入
-query = st.text_input(
-    "输入搜索查询",
-    placeholder="例如: 量子计算最新进展",
-    help="输入您想要搜索的内容"
-)
+if mode == "单个查询":
+    query = st.text_input(
+        "输入搜索查询",
+        placeholder="例如: 量子计算最新进展",
+        help="输入您想要搜索的内容"
+    )
+else:
+    query = st.text_area(
+        "输入搜索查询(每行一个)",
+        placeholder="量子计算最新进展\n量子纠错 突破\nquantum error correction",
+        height=150,
+    )
+
+grid_help = "多查询模式下可用逗号分隔多个取值, 每个取值分别搜索"
 
 # 配置选项
 with st.expander("搜索选项"):
@@ -66,27 +91,37 @@ with st.expander("搜索选项"):
     with col1:
         limit = st.number_input("结果数量", min_value=1, max_value=10, value=5)
         get_markdown = st.checkbox("获取完整Markdown内容", value=True)
-        lang = st.text_input("语言代码", value="zh", help="例如: zh, en")
+        lang = st.text_input("语言代码", value="zh", help=f"例如: zh, en。{grid_help}")
     with col2:
-        country = st.text_input("国家代码", value="cn", help="例如: cn, us")
+        country = st.text_input("国家代码", value="cn", help=f"例如: cn, us。{grid_help}")
         location = st.text_input("位置参数")
         timeout = st.number_input("超时时间(ms)", min_value=0, value=60000)
+    if mode == "多查询":
+        concurrency = st.slider("并发数", min_value=1, max_value=20, value=8)
 
 # 时间搜索参数
-tbs = st.text_input("时间搜索参数", help="例如: qdr:d (天), qdr:h (小时)")
+tbs = st.text_input("时间搜索参数", help=f"例如: qdr:d (天), qdr:h (小时)。{grid_help}")
+
+options = {
+    "limit": limit,
+    "get_markdown": get_markdown,
+    "tbs": tbs if tbs else None,
+    "lang": lang if lang else None,
+    "country": country if country else None,
+    "location": location if location else None,
+    "timeout": timeout if timeout > 0 else None,
+}
+
+if mode == "多查询":
+    grid = {"lang": split_values(lang), "country": split_values(country), "tbs": split_values(tbs)}
+    searches = expand_search_grid(query.splitlines(), options, {k: grid[k] for k in GRID_PARAMS})
+    if searches:
+        st.caption(f"将执行 {len(searches)} 个搜索")
+    if len(searches) > MAX_SEARCHES:
+        st.warning(f"搜索数超过上限 {MAX_SEARCHES}, 请减少查询或参数取值")
 
 # 提交按钮
-if st.button("开始搜索") and query:
-    options = {
-        "limit": limit,
-        "get_markdown": get_markdown,
-        "tbs": tbs if tbs else None,
-        "lang": lang if lang else None,
-        "country": country if country else None,
-        "location": location if location else None,
-        "timeout": timeout if timeout > 0 else None,
-    }
-    
+if mode == "单个查询" and st.button("开始搜索") and query:
     with st.spinner("搜索中..."):
         result = submit_search(query.strip(), options)
         
@@ -99,9 +134,37 @@ if st.button("开始搜索") and query:
     else:
         st.session_state.results = result
         st.success("搜索完成！")
+        # 带完整内容的结果写入本地语料库
+        get_corpus().add_pages(result.get("data", []), source="search")
+
+if mode == "多查询" and st.button("开始搜索") and searches and len(searches) <= MAX_SEARCHES:
+    progress = st.progress(0.0, text=f"0/{len(searches)} 个搜索已完成")
+    stream = st.container()
+    runs, failed = [], []
+    
+    def on_result(i, result):
+        label = searches[i]["label"]
+        if result.get("error") or not result.get("success"):
+            failed.append(label)
+            stream.warning(f"{label}: {result.get('message') or result.get('error') or '未知错误'}")
+        else:
+            data = result.get("data", [])
+            runs.append((label, data))
+            # 每个搜索返回后立即显示其结果
+            with stream.expander(f"{label} · {len(data)} 条结果"):
+                for idx, item in enumerate(data, 1):
+                    st.markdown(f"{idx}. [{item.get('title') or item.get('url')}]({item.get('url')})")
+        done = len(runs) + len(failed)
+        progress.progress(done / len(searches), text=f"{done}/{len(searches)} 个搜索已完成")
+    
+    asyncio.run(run_fanout(searches, concurrency, on_result))
+    fused = fuse_results(runs)
+    st.session_state.fanout = {"searches": len(searches), "failed": failed, "results": fused}
+    get_corpus().add_pages(fused, source="search")
+    st.success(f"搜索完成！{len(runs)} 个搜索成功, 合并去重后 {len(fused)} 条结果")
 
 # 结果显示
-if st.session_state.results:
+if mode == "单个查询" and st.session_state.results:
     st.divider()
     st.subheader("搜索结果")
     
@@ -111,14 +174,18 @@ if st.session_state.results:
     else:
         for idx, item in enumerate(data, 1):
             with st.expander(f"{idx}. {item.get('title', '无标题')}"):
-                st.markdown(f"**URL**: {item.get('url', '无URL')}")
-                st.markdown(f"**描述**: {item.get('description', '无描述')}")
-                
-                if item.get("markdown"):
-                    st.markdown("**完整内容**")
-                    st.markdown(item["markdown"])
-                
-                if item.get("links"):
-                    st.markdown(f"**链接**: {len(item['links'])}个")
-                    for link in item["links"][:5]:  # 最多显示5个链接
-                        st.markdown(f"- {link}")
+                render_result_item(item)
+
+if mode == "多查询" and st.session_state.fanout:
+    st.divider()
+    fanout = st.session_state.fanout
+    st.subheader("融合结果")
+    st.caption(f"{fanout['searches']} 个搜索, 失败 {len(fanout['failed'])} 个; 按倒数排名融合得分排序")
+    if not fanout["results"]:
+        st.warning("没有找到结果")
+    else:
+        for idx, item in enumerate(fanout["results"], 1):
+            hits = len(item["queries"])
+            with st.expander(f"{idx}. {item.get('title', '无标题')} · {hits} 个搜索命中 · 得分 {item['score']:.4f}"):
+                st.markdown(f"**命中搜索**: {'; '.join(item['queries'])}")
+                render_result_item(item)
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import itertools
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from url_canon import canonicalize_many
+
+logger = logging.getLogger(__name__)
+
+# 单次扇出的最多搜索数, 防止参数网格展开过大
+MAX_SEARCHES = 100
+# 倒数排名融合的平滑常数, 越大排名靠后的结果权重下降越慢
+RRF_K = 60
+# 参数网格中可以取多个值的搜索参数
+GRID_PARAMS = ("lang", "country", "tbs")
+
+DEFAULT_SEARCH_OPTIONS = {
+    "limit": 5,
+    "get_markdown": True,
+    "tbs": None,
+    "lang": None,
+    "country": None,
+    "location": None,
+    "timeout": None,
+}
+
+
+def build_search_payload(query: str, options: Dict) -> Dict:
+    """将搜索选项转换为 /search 请求体"""
+    options = {**DEFAULT_SEARCH_OPTIONS, **options}
+    payload = {
+        "query": query,
+        "limit": options["limit"],
+        "scrapeOptions": {
+            "formats": ["markdown"] if options["get_markdown"] else []
+        }
+    }
+
+    # 可选参数
+    for key in ("tbs", "lang", "country", "location", "timeout"):
+        if options[key]:
+            payload[key] = options[key]
+    return payload
+
+
+def expand_search_grid(queries: Iterable[str], options: Dict,
+                       grid: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """将查询列表与参数网格展开为搜索列表, 返回 [{label, payload}]
+
+    grid 为 {参数名: 取值列表}, 每个查询与各参数取值的每种组合各搜索一次;
+    取值列表为空的参数沿用 options 中的值。重复的组合只保留一个。
+    """
+    grid = {key: values for key, values in (grid or {}).items() if values}
+    keys = list(grid)
+    searches, seen = [], set()
+    for query in queries:
+        query = query.strip()
+        if not query:
+            continue
+        for combo in itertools.product(*(grid[key] for key in keys)):
+            params = dict(zip(keys, combo))
+            payload = build_search_payload(query, {**options, **params})
+            signature = tuple(sorted((k, str(v)) for k, v in payload.items()))
+            if signature in seen:
+                continue
+            seen.add(signature)
+            label = " · ".join([query] + [f"{k}={v}" for k, v in params.items()])
+            searches.append({"label": label, "payload": payload})
+    return searches
+
+
+async def iter_search_fanout(client, searches: List[Dict],
+                             workers: Optional[int] = None) -> AsyncIterator[Tuple[int, Dict]]:
+    """用固定数量的工作任务并发执行多个搜索, 按完成顺序产出 (搜索下标, 响应)
+
+    workers 默认等于客户端设置的并发数, 实际并发还受客户端的自适应限流器
+    约束。单个搜索异常时产出错误字典, 不影响其他搜索; 提前退出时取消未完成
+    的搜索。
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for item in enumerate(searches):
+        pending.put_nowait(item)
+    results: asyncio.Queue = asyncio.Queue()
+    workers = max(1, min(workers or client.max_concurrency, len(searches)))
+
+    async def work():
+        while True:
+            try:
+                i, search = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            payload = dict(search["payload"])
+            query = payload.pop("query")
+            try:
+                result = await client.search(query, payload)
+            except Exception as e:
+                logger.warning(f"搜索 {search['label']} 失败: {e}")
+                result = {"error": True, "message": str(e)}
+            await results.put((i, result))
+        await results.put(None)
+
+    tasks = [asyncio.ensure_future(work()) for _ in range(workers)]
+    finished = 0
+    try:
+        while finished < workers:
+            item = await results.get()
+            if item is None:
+                finished += 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def fuse_results(runs: List[Tuple[str, List[Dict]]], k: int = RRF_K) -> List[Dict]:
+    """按规范化URL合并去重多个搜索的结果, 用倒数排名融合(RRF)排序
+
+    runs 为 [(搜索标签, 结果列表)]。每条结果的得分为它在各搜索中
+    1 / (k + 排名) 之和, 被多个查询排在前面的结果得分更高。合并后的结果
+    保留首次出现的字段, 有完整内容的版本优先, 并附加 score、queries
+    (命中的搜索标签)和 best_rank。
+    """
+    merged: Dict[str, Dict] = {}
+    for label, items in runs:
+        items = [item for item in items if item.get("url")]
+        keys = canonicalize_many([item["url"] for item in items])
+        for rank, (key, item) in enumerate(zip(keys, items), 1):
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {**item, "score": 0.0, "queries": [], "best_rank": rank}
+            elif label in entry["queries"]:
+                # 同一搜索内的重复结果只按最高排名计分
+                continue
+            elif item.get("markdown") and not entry.get("markdown"):
+                entry.update({field: value for field, value in item.items() if value})
+            entry["score"] += 1.0 / (k + rank)
+            entry["best_rank"] = min(entry["best_rank"], rank)
+            entry["queries"].append(label)
+    return sorted(merged.values(), key=lambda entry: (-entry["score"], entry["best_rank"]))
@@ -0,0 +1,182 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# 写入线程数
+WRITE_WORKERS = 8
+# 已提交但未完成的写入数上限, 超过时 write 阻塞等待
+MAX_PENDING_WRITES = 256
+# 单个打包文件的目标大小
+PACK_SIZE = 64 * 1024 * 1024
+PACK_DIR = "packs"
+PACK_INDEX = "index.json"
+
+
+class ShardedWriter:
+    """分目录、原子、并行的 markdown 文件写入器
+
+    文件按键(通常为URL哈希)前两位分目录存放, 避免单目录下文件过多;
+    每个文件先写入临时文件再原子替换, 进程崩溃不会留下半个文件。写入在
+    线程池中执行, 排队中的写入不超过 max_pending 个, 内存占用有界。
+
+    pack_threshold 大于 0 时, 小于该字节数的内容追加到打包文件
+    packs/pack-NNNNN.pack 中, 偏移和长度记录在 packs/index.json。
+    打包文件写满后整体原子写入, 写入后不再修改。
+    """
+
+    def __init__(self, output_dir: str = "output", workers: int = WRITE_WORKERS,
+                 max_pending: int = MAX_PENDING_WRITES, pack_threshold: int = 0,
+                 fsync: bool = False):
+        self.output_dir = output_dir
+        self.pack_threshold = pack_threshold
+        self.fsync = fsync
+        self.errors: List[Exception] = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="md-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._dirs = set()
+        self._dirs_lock = threading.Lock()
+        self._pack_index: Dict[str, List] = {}
+        self._pack_buffer = bytearray()
+        self._pack_pending: Dict[str, List] = {}
+        self._pack_no = 0
+        # 之前的运行打包过时也要维护索引, 即使本次不再打包
+        self._packs_enabled = bool(pack_threshold) or os.path.isdir(os.path.join(output_dir, PACK_DIR))
+        if self._packs_enabled:
+            self._load_pack_index()
+
+    def write(self, key: str, content: str) -> str:
+        """提交一次写入, 返回相对输出目录的位置(分片文件路径或打包文件路径)"""
+        data = content.encode("utf-8")
+        if self.pack_threshold and len(data) < self.pack_threshold:
+            return self._append_to_pack(key, data)
+        location = os.path.join(key[:2], f"{key}.md")
+        self._submit(os.path.join(self.output_dir, location), data)
+        self._drop_packed(key)
+        return location
+
+    def read(self, key: str, location: str) -> Optional[str]:
+        """按 write 返回的位置读取内容"""
+        if self.is_packed(location):
+            entry = self._pack_index.get(key)
+            if not entry:
+                return None
+            pack, offset, size = entry
+            with open(os.path.join(self.output_dir, PACK_DIR, pack), "rb") as f:
+                f.seek(offset)
+                return f.read(size).decode("utf-8")
+        try:
+            with open(os.path.join(self.output_dir, location), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def is_packed(location: str) -> bool:
+        return location.startswith(PACK_DIR + os.sep)
+
+    def exists(self, location: str) -> bool:
+        return os.path.exists(os.path.join(self.output_dir, location))
+
+    def remove(self, key: str, location: str):
+        """删除一个页面; 打包的页面只从索引中去掉, 整个打包文件无引用时才删除"""
+        if self.is_packed(location):
+            self._drop_packed(key)
+            return
+        try:
+            os.remove(os.path.join(self.output_dir, location))
+        except OSError:
+            pass
+
+    def close(self):
+        """写出剩余的打包内容和索引, 等待全部写入完成; 有写入失败时抛出第一个异常"""
+        if self._pack_buffer:
+            self._flush_pack()
+        self._executor.shutdown(wait=True)
+        if self._packs_enabled:
+            self._write_atomic(
+                os.path.join(self.output_dir, PACK_DIR, PACK_INDEX),
+                json.dumps(self._pack_index).encode("utf-8"),
+            )
+            self._remove_orphan_packs()
+        if self.errors:
+            raise self.errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _submit(self, path: str, data: bytes):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write_atomic, path, data)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        self._slots.release()
+        if future.exception() is not None:
+            self.errors.append(future.exception())
+
+    def _write_atomic(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        if directory not in self._dirs:
+            os.makedirs(directory, exist_ok=True)
+            with self._dirs_lock:
+                self._dirs.add(directory)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _append_to_pack(self, key: str, data: bytes) -> str:
+        pack = f"pack-{self._pack_no:05d}.pack"
+        self._pack_pending[key] = [pack, len(self._pack_buffer), len(data)]
+        self._pack_buffer += data
+        if len(self._pack_buffer) >= PACK_SIZE:
+            self._flush_pack()
+        return os.path.join(PACK_DIR, pack)
+
+    def _flush_pack(self):
+        pack = f"pack-{self._pack_no:05d}.pack"
+        self._submit(os.path.join(self.output_dir, PACK_DIR, pack), bytes(self._pack_buffer))
+        self._pack_index.update(self._pack_pending)
+        self._pack_pending = {}
+        self._pack_buffer = bytearray()
+        self._pack_no += 1
+
+    def _drop_packed(self, key: str):
+        self._pack_index.pop(key, None)
+        self._pack_pending.pop(key, None)
+
+    def _load_pack_index(self):
+        pack_dir = os.path.join(self.output_dir, PACK_DIR)
+        try:
+            with open(os.path.join(pack_dir, PACK_INDEX), "r", encoding="utf-8") as f:
+                self._pack_index = json.load(f)
+        except (OSError, ValueError):
+            self._pack_index = {}
+        # 新打包文件编号接在已有文件之后, 已写入的打包文件不再修改
+        numbers = [
+            int(name[5:10]) for name in (os.listdir(pack_dir) if os.path.isdir(pack_dir) else [])
+            if name.startswith("pack-") and name.endswith(".pack")
+        ]
+        self._pack_no = max(numbers) + 1 if numbers else 0
+
+    def _remove_orphan_packs(self):
+        pack_dir = os.path.join(self.output_dir, PACK_DIR)
+        referenced = {entry[0] for entry in self._pack_index.values()}
+        for name in os.listdir(pack_dir):
+            if name.startswith("pack-") and name.endswith(".pack") and name not in referenced:
+                try:
+                    os.remove(os.path.join(pack_dir, name))
+                except OSError:
+                    pass
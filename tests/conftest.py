@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+# 模块都在仓库根目录, 不经安装直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    """熔断器是进程级共享的, 每个用例从关闭状态开始"""
+    import resilience
+    resilience._breakers.clear()
+    yield
+    resilience._breakers.clear()
+
+
+@pytest.fixture
+def mock_server():
+    """在后台线程的事件循环中启动 mock_firecrawl, 返回 start(MockConfig) -> (服务, 地址)"""
+    pytest.importorskip("aiohttp")
+    from aiohttp import web
+    from mock_firecrawl import MockFirecrawl
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runners = []
+
+    async def serve(mock):
+        runner = web.AppRunner(mock.app())
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        runners.append(runner)
+        return f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    def start(config=None):
+        mock = MockFirecrawl(config)
+        return mock, asyncio.run_coroutine_threadsafe(serve(mock), loop).result(timeout=10)
+
+    yield start
+    for runner in runners:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    loop.close()
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from async_utils import AsyncFirecrawlClient
+from mock_firecrawl import MockConfig
+from resilience import RetryPolicy
+from scrape_cache import ScrapeCache
+from search_fanout import expand_search_grid, fuse_results, iter_search_fanout
+
+FAST = RetryPolicy(max_attempts=4, base_delay=0.001, max_delay=0.01)
+
+
+def client_for(base_url, **kwargs):
+    return AsyncFirecrawlClient(base_url, "test", retry_policy=FAST, **kwargs)
+
+
+def test_scrape_map_and_search(mock_server):
+    _, base_url = mock_server(MockConfig(map_links=5, search_results=3))
+    # 兼容带 /v1 后缀的地址
+    client = client_for(base_url + "/v1")
+
+    async def main():
+        return await asyncio.gather(
+            client.scrape("https://a.com/x"), client.map("https://a.com"), client.search("q"))
+
+    scraped, mapped, searched = asyncio.run(main())
+    assert scraped["data"]["metadata"]["sourceURL"] == "https://a.com/x"
+    assert mapped["links"] == [f"https://a.com/page-{i}" for i in range(5)]
+    assert len(searched["data"]) == 3
+
+
+def test_retries_then_returns_error_dict(mock_server):
+    mock, base_url = mock_server(MockConfig(error_rate=1.0))
+    result = asyncio.run(client_for(base_url).scrape("https://a.com/x"))
+    assert result["error"] is True
+    assert result["status_code"] == 500
+    assert result["retries"] == FAST.max_attempts - 1
+    assert mock.requests[("POST", "/v1/scrape", 500)] == FAST.max_attempts
+
+
+def test_non_idempotent_submit_is_not_retried_on_500(mock_server):
+    mock, base_url = mock_server(MockConfig(error_rate=1.0))
+    result = asyncio.run(client_for(base_url).start_crawl("https://a.com"))
+    assert result["error"] is True
+    assert result["retries"] == 0
+    assert sum(mock.requests.values()) == 1
+
+
+def test_rate_limited_requests_eventually_succeed(mock_server):
+    mock, base_url = mock_server(MockConfig(rate_limit_rate=0.3, retry_after=0.01))
+    client = client_for(base_url, max_concurrency=4)
+    policy = RetryPolicy(max_attempts=10, base_delay=0.001, max_delay=0.01)
+    client.retry_policy = policy
+
+    async def main():
+        return await asyncio.gather(*(client.scrape(f"https://a.com/{i}") for i in range(20)))
+
+    results = asyncio.run(main())
+    assert all(r.get("success") for r in results)
+    assert mock.requests[("POST", "/v1/scrape", 429)] > 0
+    assert client.limiter.in_flight == 0
+
+
+def test_iter_batch_scrape_streams_every_document(mock_server, tmp_path):
+    mock, base_url = mock_server(MockConfig(job_rate=2000, page_docs=7))
+    client = client_for(base_url, cache=ScrapeCache(str(tmp_path)))
+    urls = [f"https://a.com/{i}" for i in range(25)]
+
+    async def collect(urls):
+        return [doc["metadata"]["sourceURL"]
+                async for doc in client.iter_batch_scrape(urls, poll_interval=0.01)]
+
+    assert sorted(asyncio.run(collect(urls))) == sorted(urls)
+    # 已缓存的URL不再提交任务
+    assert sorted(asyncio.run(collect(urls))) == sorted(urls)
+    assert mock.requests[("POST", "/v1/batch/scrape", 200)] == 1
+
+
+def test_search_fanout_runs_every_search(mock_server):
+    _, base_url = mock_server(MockConfig(search_results=4))
+    client = client_for(base_url, max_concurrency=2)
+    searches = expand_search_grid(["a", "b"], {}, {"lang": ["en", "zh"]})
+
+    async def collect():
+        return [item async for item in iter_search_fanout(client, searches)]
+
+    results = asyncio.run(collect())
+    assert sorted(i for i, _ in results) == [0, 1, 2, 3]
+    assert all(len(result["data"]) == 4 for _, result in results)
+    runs = [(searches[i]["label"], result["data"]) for i, result in results]
+    # 不同语言参数下同一查询的结果URL相同, 融合后按查询去重
+    assert len(fuse_results(runs)) == 8
@@ -0,0 +1,73 @@
+import asyncio
+
+from concurrency import AdaptiveLimiter
+
+
+def run_window(limiter, latency, status=200):
+    """按当前并发数完成一个窗口的请求"""
+    async def window():
+        for _ in range(int(limiter.limit)):
+            await limiter.acquire()
+            await limiter.release(latency, status)
+
+    asyncio.run(window())
+
+
+def test_healthy_window_increases_limit_up_to_ceiling():
+    limiter = AdaptiveLimiter(initial=2, max_limit=4)
+    for _ in range(5):
+        run_window(limiter, 0.1)
+    assert limiter.limit == 4
+
+
+def test_overload_halves_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial=16, min_limit=2)
+
+    async def overload():
+        for _ in range(3):
+            await limiter.acquire()
+        for _ in range(3):
+            await limiter.release(0.1, 429)
+
+    asyncio.run(overload())
+    assert limiter.limit == 8
+    assert limiter.in_flight == 0
+
+
+def test_latency_spike_decreases_limit():
+    limiter = AdaptiveLimiter(initial=4, spike_factor=3.0)
+    run_window(limiter, 0.1)
+    assert limiter.limit == 5
+    run_window(limiter, 1.0)
+    assert limiter.limit == 2.5
+
+
+def test_acquire_waits_for_free_slot():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    order = []
+
+    async def task(name):
+        await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        await limiter.release(0.01, 200)
+
+    async def main():
+        await asyncio.gather(task("a"), task("b"))
+        return limiter.snapshot()
+
+    snapshot = asyncio.run(main())
+    assert order == ["a", "b"]
+    assert snapshot["in_flight"] == 0
+    assert snapshot["limit"] == 1
+
+
+def test_retry_after_pauses_new_requests():
+    limiter = AdaptiveLimiter(initial=4)
+
+    async def main():
+        await limiter.acquire()
+        await limiter.release(0.01, 429, retry_after=30)
+        return limiter.snapshot()
+
+    assert asyncio.run(main())["paused"] > 29
@@ -0,0 +1,43 @@
+import random
+
+from dedup import find_duplicates, fingerprint, skip_indices
+from page_analysis import analyze_markdown
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def article(seed, length=400):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def test_fingerprint_token_count_matches_page_stats():
+    for markdown in ["", "hello world", "数据分析 data analysis 2024", "# 标题\n\n中文段落, with English."]:
+        assert fingerprint(markdown)[1] == analyze_markdown(markdown)["token_count"]
+
+
+def test_near_duplicates_are_clustered():
+    base = article(1)
+    near = base.replace(base.split()[200], "changed", 1)
+    pages = [
+        {"url": "https://a.com/post?ref=x", "markdown": base},
+        {"url": "https://a.com/post", "markdown": near},
+        {"url": "https://a.com/other", "markdown": article(2)},
+        {"url": "https://a.com/empty", "markdown": ""},
+    ]
+    report = find_duplicates(pages)
+    # 簇内保留不带查询参数的URL
+    assert report["removed"] == {0}
+    assert report["duplicates"] == [{"canonical": "https://a.com/post",
+                                     "duplicates": ["https://a.com/post?ref=x"]}]
+    assert report["kept"] == 3
+    assert report["tokens_saved"] == fingerprint(base)[1]
+    assert [p["url"] for p in skip_indices(pages, report["removed"])] == [
+        "https://a.com/post", "https://a.com/other", "https://a.com/empty"]
+
+
+def test_unrelated_pages_are_kept():
+    pages = [{"url": f"https://a.com/{i}", "markdown": article(i)} for i in range(100)]
+    report = find_duplicates(pages)
+    assert report["removed"] == set()
+    assert report["clusters"] == 0
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from async_utils import AsyncFirecrawlClient
+from job_manager import JobManager, JobRegistry, _repair_ndjson
+from mock_firecrawl import MockConfig
+
+
+def test_registry_round_trip(tmp_path):
+    registry = JobRegistry(str(tmp_path / "jobs.db"))
+    registry.add("a", "crawl", "first")
+    registry.add("b", "batch", "second")
+    registry.update("a", status="completed", progress={"completed": 3})
+    assert registry.get("a")["progress"] == {"completed": 3}
+    assert [job["id"] for job in registry.list(active_only=True)] == ["b"]
+    assert [job["id"] for job in registry.list(kind="crawl")] == ["a"]
+    registry.delete("a")
+    assert registry.get("a") is None
+
+
+def test_repair_ndjson_truncates_partial_line(tmp_path):
+    path = tmp_path / "job.ndjson"
+    path.write_bytes(b'{"a": 1}\n{"b": 2}\n{"c"')
+    assert _repair_ndjson(str(path)) == 2
+    assert path.read_bytes() == b'{"a": 1}\n{"b": 2}\n'
+
+
+def test_read_documents_leaves_partial_line(tmp_path):
+    # read_documents 只读文件, 不需要启动管理器的后台线程
+    manager = JobManager.__new__(JobManager)
+    path = tmp_path / "job.ndjson"
+    path.write_bytes(b'{"a": 1}\n{"b"')
+    docs, offset = manager.read_documents({"result_path": str(path)})
+    assert docs == [{"a": 1}]
+    with open(path, "ab") as f:
+        f.write(b': 2}\n')
+    assert manager.read_documents({"result_path": str(path)}, offset) == ([{"b": 2}], path.stat().st_size)
+
+
+def test_tracks_crawl_to_completion(mock_server, tmp_path):
+    _, base_url = mock_server(MockConfig(crawl_pages=25, job_rate=2000, page_docs=10))
+    registry = JobRegistry(str(tmp_path / "jobs.db"))
+    manager = JobManager(base_url, "test", registry, str(tmp_path / "results"))
+
+    async def main():
+        job = await AsyncFirecrawlClient(base_url, "test").start_crawl("https://a.com")
+        time.sleep(0.05)
+        manager.submit("crawl", job["id"], "a.com")
+        return job["id"], [doc async for doc in manager.follow_documents(job["id"], timeout=1)]
+
+    job_id, docs = asyncio.run(main())
+    assert [doc["metadata"]["sourceURL"] for doc in docs] == [f"https://a.com/page-{i}" for i in range(25)]
+    job = manager.get(job_id)
+    assert job["status"] == "completed"
+    assert job["progress"]["completed"] == 25
+    with open(job["result_path"], encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 25
+
+    manager.remove(job_id)
+    assert manager.get(job_id) is None
@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from manifest import MANIFEST_FILE, REPORT_FILE, MarkdownSync, sync_markdown
+from shard_writer import ShardedWriter
+
+ROOT = "https://a.com"
+
+
+def pages(**contents):
+    return [{"url": f"{ROOT}/{name}", "markdown": markdown, "metadata": {"ETag": name}}
+            for name, markdown in contents.items()]
+
+
+def test_sync_reports_added_changed_unchanged(tmp_path):
+    out = str(tmp_path)
+    report = sync_markdown(pages(a="A", b="B"), out, root=ROOT)
+    assert sorted(report["added"]) == [f"{ROOT}/a", f"{ROOT}/b"]
+
+    report = sync_markdown(pages(a="A", b="B2"), out, root=ROOT)
+    assert report["added"] == []
+    assert report["changed"] == [f"{ROOT}/b"]
+    assert report["unchanged"] == 1
+
+    with open(os.path.join(out, MANIFEST_FILE), encoding="utf-8") as f:
+        entries = json.load(f)["pages"]
+    assert {e["etag"] for e in entries.values()} == {"a", "b"}
+    with open(os.path.join(out, REPORT_FILE), encoding="utf-8") as f:
+        assert json.load(f)["changed"] == [f"{ROOT}/b"]
+
+
+def test_prune_only_removes_pages_of_same_root(tmp_path):
+    out = str(tmp_path)
+    sync_markdown(pages(a="A", b="B"), out, root=ROOT)
+    sync_markdown([{"url": "https://other.com/x", "markdown": "X"}], out, root="https://other.com")
+    report = sync_markdown(pages(a="A"), out, prune=True, root=ROOT)
+    assert report["removed"] == [f"{ROOT}/b"]
+
+    with open(os.path.join(out, MANIFEST_FILE), encoding="utf-8") as f:
+        urls = {e["url"] for e in json.load(f)["pages"].values()}
+    assert urls == {f"{ROOT}/a", "https://other.com/x"}
+
+
+def test_prune_requires_root(tmp_path):
+    with pytest.raises(ValueError):
+        MarkdownSync(str(tmp_path), prune=True)
+
+
+def test_failed_sync_does_not_save_manifest(tmp_path):
+    out = str(tmp_path)
+    with pytest.raises(RuntimeError):
+        with MarkdownSync(out, root=ROOT) as sync:
+            sync.add(pages(a="A")[0])
+            raise RuntimeError
+    assert not os.path.exists(os.path.join(out, MANIFEST_FILE))
+
+
+def test_packed_pages_round_trip(tmp_path):
+    out = str(tmp_path)
+    report = sync_markdown(pages(a="A" * 10, b="B" * 10), out, pack_threshold=1024, root=ROOT)
+    assert all(ShardedWriter.is_packed(os.path.relpath(f, out)) for f in report["files"])
+    report = sync_markdown(pages(a="A" * 10, b="B" * 10), out, pack_threshold=1024, root=ROOT)
+    assert report["unchanged"] == 2
+
+
+def test_sharded_writer_files_and_packs(tmp_path):
+    out = str(tmp_path)
+    with ShardedWriter(out, workers=2, max_pending=2, pack_threshold=8) as writer:
+        big = writer.write("abcdef", "large content")
+        small = writer.write("cd1234", "tiny")
+    assert big == os.path.join("ab", "abcdef.md")
+    assert writer.is_packed(small)
+
+    # 重新打开后按索引读取打包内容, 不再引用的打包文件被删除
+    writer = ShardedWriter(out)
+    assert writer.read("abcdef", big) == "large content"
+    assert writer.read("cd1234", small) == "tiny"
+    writer.remove("cd1234", small)
+    writer.close()
+    assert os.listdir(os.path.join(out, "packs")) == ["index.json"]
@@ -0,0 +1,77 @@
+import asyncio
+import random
+
+from ordered_output import ReorderBuffer, SlotMatcher, iter_ordered
+
+
+def test_reorder_buffer_releases_complete_prefix():
+    buffer = ReorderBuffer()
+    assert buffer.push(1, "b") == []
+    assert buffer.push(2, "c") == []
+    assert buffer.push(0, "a") == [(0, "a"), (1, "b"), (2, "c")]
+    assert len(buffer) == 0
+
+
+def test_reorder_buffer_skips_gap_when_full():
+    buffer = ReorderBuffer(max_size=2)
+    buffer.push(1, "b")
+    buffer.push(2, "c")
+    assert buffer.push(3, "d") == [(1, "b"), (2, "c"), (3, "d")]
+    assert buffer.skipped == 1
+    # 被跳过的下标迟到时直接输出
+    assert buffer.push(0, "a") == [(0, "a")]
+
+
+def test_reorder_buffer_flush():
+    buffer = ReorderBuffer(start=5)
+    buffer.push(8, "x")
+    buffer.push(7, "y")
+    assert buffer.flush() == [(7, "y"), (8, "x")]
+    assert buffer.next_index == 9
+
+
+def test_slot_matcher_prefers_key_then_fills_gaps():
+    matcher = SlotMatcher(["a", "b", "a", "c"])
+    assert matcher.claim("a") == 0
+    assert matcher.claim("a") == 2
+    # 键对不上时取最早未占用的下标
+    assert matcher.claim("redirected") == 1
+    # 下标 1 已被占用, b 改取下一个空位, c 只能排到末尾
+    assert matcher.claim("b") == 3
+    assert matcher.claim("c") == 4
+    assert matcher.unmatched == 3
+
+
+def test_iter_ordered_yields_in_input_order():
+    async def worker(n):
+        await asyncio.sleep(random.random() / 100)
+        if n == 3:
+            raise ValueError(n)
+        return n * n
+
+    async def collect():
+        return [item async for item in iter_ordered(range(20), worker, window=4)]
+
+    results = asyncio.run(collect())
+    assert [i for i, _, _ in results] == list(range(20))
+    assert [r for _, n, r in results if n != 3] == [n * n for n in range(20) if n != 3]
+    assert isinstance(results[3][2], ValueError)
+
+
+def test_iter_ordered_bounds_in_flight_work():
+    running = 0
+    peak = 0
+
+    async def worker(n):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        return n
+
+    async def collect():
+        return [n async for _, n, _ in iter_ordered(range(50), worker, window=5)]
+
+    assert asyncio.run(collect()) == list(range(50))
+    assert peak <= 5
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from async_utils import AsyncFirecrawlClient
+from mock_firecrawl import MockConfig
+from pipeline import discovery_stages, map_and_scrape
+from resilience import RetryPolicy
+
+
+def test_discovery_stages():
+    assert discovery_stages({"limit": 5}) == [("map", {"limit": 5})]
+    assert [stage for stage, _ in discovery_stages({}, sitemap_first=True)] == ["sitemap", "map"]
+    assert len(discovery_stages({"ignoreSitemap": True}, sitemap_first=True)) == 1
+
+
+def run(base_url, sitemap_first=False):
+    client = AsyncFirecrawlClient(base_url, "test", max_concurrency=4,
+                                  retry_policy=RetryPolicy(base_delay=0.001))
+    progress = {}
+
+    async def collect():
+        return [url async for url, result in map_and_scrape(
+            client, "https://a.com", {}, on_progress=progress.update, sitemap_first=sitemap_first)
+            if result.get("success")]
+
+    return asyncio.run(collect()), progress
+
+
+def test_map_and_scrape_scrapes_each_link_once(mock_server):
+    mock, base_url = mock_server(MockConfig(map_links=30))
+    scraped, progress = run(base_url)
+    assert sorted(scraped) == sorted(f"https://a.com/page-{i}" for i in range(30))
+    assert progress["scraped"] == 30
+    assert mock.requests[("POST", "/v1/map", 200)] == 1
+    assert mock.requests[("POST", "/v1/scrape", 200)] == 30
+
+
+def test_sitemap_first_adds_one_map_request(mock_server):
+    mock, base_url = mock_server(MockConfig(map_links=10))
+    scraped, progress = run(base_url, sitemap_first=True)
+    assert len(scraped) == 10
+    assert progress["duplicates"] == 10
+    assert mock.requests[("POST", "/v1/map", 200)] == 2
+    assert mock.requests[("POST", "/v1/scrape", 200)] == 10
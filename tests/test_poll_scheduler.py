@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from poll_scheduler import MIN_INTERVAL, JobProgress, PollScheduler, activity_marker, progress_fraction
+
+
+def test_progress_fraction():
+    assert progress_fraction({"status": "completed"}) == 1.0
+    assert progress_fraction({"total": 10, "completed": 4}) == 0.4
+    assert progress_fraction({"maxDepth": 4, "currentDepth": 1}) == 0.25
+    assert progress_fraction({"status": "scraping"}) is None
+
+
+def test_activity_marker():
+    status = {"data": {"activities": [{"timestamp": "t1"}, {"timestamp": "t2"}]}}
+    assert activity_marker(status) == "t2"
+    assert activity_marker({"data": {"processedUrls": ["a", "b"]}}) == 2
+    assert activity_marker({}) is None
+
+
+def test_eta_shortens_interval_near_completion():
+    progress = JobProgress(base_interval=10)
+    progress.observe({"total": 100, "completed": 10}, now=0)
+    assert progress.next_interval() == 10
+    progress.observe({"total": 100, "completed": 50}, now=10)
+    # 10秒完成40%, 剩余50%约需12.5秒, 下次轮询安排在一半处
+    assert progress.eta() == pytest.approx(12.5)
+    assert progress.next_interval() == pytest.approx(6.25)
+    progress.observe({"status": "completed"}, now=20)
+    assert progress.eta() == 0
+    assert progress.next_interval() == MIN_INTERVAL
+
+
+def test_stalled_job_backs_off_up_to_limit():
+    progress = JobProgress(base_interval=2)
+    for t in range(20):
+        progress.observe({"total": 10, "completed": 3}, now=t)
+        interval = progress.next_interval()
+    assert progress.stalls == 20 - 1
+    assert interval == 2 * 8
+
+
+def test_scheduler_coalesces_wakeups():
+    scheduler = PollScheduler(window=0.5)
+
+    async def job(job_id):
+        scheduler.track(job_id, MIN_INTERVAL)
+        await scheduler.wait(job_id, {"status": "completed"})
+        return scheduler.forget(job_id)
+
+    async def main():
+        try:
+            return await asyncio.gather(*(job(f"job-{i}") for i in range(3)))
+        finally:
+            scheduler.close()
+
+    stats = asyncio.run(main())
+    assert [s["polls"] for s in stats] == [1, 1, 1]
+    assert scheduler.totals["wakeups"] == 1
+    assert scheduler.totals["coalesced"] == 2
+    assert scheduler.summary()["active"] == 0
@@ -0,0 +1,52 @@
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, TokenBucket, api_key_from_headers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_reserves_ahead(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # 令牌已预约完, 后续请求排队等待
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock[0] += 1.0
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_rate_limiter_weights():
+    limiter = RateLimiter(rpm=60, weights={"map": 3})
+    assert limiter.weight("crawl") == 2
+    assert limiter.weight("crawl", "GET") == 1
+    assert limiter.weight("map") == 3
+    assert limiter.weight("scrape") == 1
+
+
+def test_rate_limiter_disabled_without_rpm(clock):
+    limiter = RateLimiter()
+    assert all(limiter.reserve("key", "scrape") == 0 for _ in range(1000))
+
+
+def test_rate_limiter_separates_keys_and_endpoints(clock):
+    limiter = RateLimiter(rpm=60, burst=2, endpoint_rpm={"crawl": 6})
+    assert limiter.reserve("a", "scrape") == 0
+    assert limiter.reserve("a", "scrape") == 0
+    assert limiter.reserve("a", "scrape") == pytest.approx(1.0)
+    # 不同密钥各有独立的桶
+    assert limiter.reserve("b", "scrape") == 0
+    # crawl 权重为2, 同时受总桶和接口桶限制
+    assert limiter.reserve("b", "crawl") == pytest.approx(1.0)
+    assert limiter.reserve("b", "crawl") == pytest.approx(20.0)
+
+
+def test_api_key_from_headers():
+    assert api_key_from_headers({"Authorization": "Bearer fc-1"}) == "fc-1"
+    assert api_key_from_headers(None) == ""
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import (CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry,
+                        endpoint_name, retryable_for)
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.01)
+
+
+class StatusError(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(status)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def failing(*statuses, result="ok"):
+    """依次抛出给定状态码的异常, 之后返回 result"""
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) <= len(statuses):
+            raise StatusError(statuses[len(calls) - 1])
+        return result
+
+    return attempt, calls
+
+
+def test_endpoint_name():
+    assert endpoint_name("https://api.x.dev/v1/batch/scrape/abc") == "batch/scrape"
+    assert endpoint_name("https://api.x.dev/v1/crawl/abc") == "crawl"
+    assert endpoint_name("https://api.x.dev/") == "root"
+
+
+def test_non_idempotent_retries_only_when_not_accepted():
+    assert retryable_for(StatusError(500), idempotent=True)[0]
+    assert not retryable_for(StatusError(500), idempotent=False)[0]
+    assert retryable_for(StatusError(429), idempotent=False)[0]
+    assert not retryable_for(StatusError(400))[0]
+
+
+def test_retry_policy_honours_retry_after():
+    policy = RetryPolicy(base_delay=0.001, max_delay=5)
+    assert policy.delay(0, retry_after=2) == 2
+    assert policy.delay(0, retry_after=60) == 5
+
+
+def test_call_with_retry_recovers():
+    attempt, calls = failing(503, 429)
+    assert asyncio.run(call_with_retry("scrape", attempt, FAST)) == ("ok", 2)
+    assert len(calls) == 3
+
+
+def test_call_with_retry_gives_up_with_retry_count():
+    attempt, calls = failing(502, 502, 502, 502)
+    with pytest.raises(StatusError) as info:
+        asyncio.run(call_with_retry("scrape", attempt, FAST))
+    assert info.value.retries == 2
+    assert len(calls) == 3
+
+
+def test_non_idempotent_500_is_not_retried():
+    attempt, calls = failing(500)
+    with pytest.raises(StatusError) as info:
+        asyncio.run(call_with_retry("crawl", attempt, FAST, idempotent=False))
+    assert info.value.retries == 0
+    assert len(calls) == 1
+
+
+def test_breaker_opens_and_recovers_through_half_open(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("scrape", failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    now[0] += 10
+    breaker.before_request()
+    assert breaker.state == "half_open"
+    # 半开状态只放行一个试探请求
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 10
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_request()
+
+
+def test_breaker_rejects_calls_once_open():
+    breaker = resilience.get_breaker("map")
+    breaker.failure_threshold = 2
+    attempt, _ = failing(503, 503, 503)
+    with pytest.raises(StatusError):
+        asyncio.run(call_with_retry("map", attempt, RetryPolicy(max_attempts=2, base_delay=0.001)))
+    assert breaker.state == "open"
+    attempt, calls = failing()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_retry("map", attempt, FAST))
+    assert calls == []
+    # 429 表示限流, 不计入熔断失败
+    other = resilience.get_breaker("search")
+    attempt, _ = failing(429, 429, 429)
+    with pytest.raises(StatusError):
+        asyncio.run(call_with_retry("search", attempt, FAST))
+    assert other.state == "closed"
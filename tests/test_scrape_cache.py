@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+import scrape_cache
+from scrape_cache import ScrapeCache, normalize_url
+
+DOC = {"markdown": "# hello", "metadata": {"statusCode": 200}}
+
+
+def test_normalize_url():
+    assert normalize_url(" HTTPS://Example.com:443#top") == "https://example.com/"
+    assert normalize_url("http://a.com:80/x?b=1") == "http://a.com/x?b=1"
+
+
+def test_get_set_and_stats(tmp_path):
+    cache = ScrapeCache(str(tmp_path))
+    assert cache.get("https://a.com/x", {"formats": ["markdown"]}) is None
+    cache.set("https://a.com/x", {"formats": ["markdown"]}, DOC)
+    # 规范化后相同的URL和 formats 顺序不同的选项命中同一条目
+    assert cache.get("https://A.com/x#frag", {"formats": ["markdown"]}) == DOC
+    assert cache.get("https://a.com/x", {"formats": ["html"]}) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    # 重新打开时从磁盘重建索引
+    assert ScrapeCache(str(tmp_path)).get("https://a.com/x", {"formats": ["markdown"]}) == DOC
+
+
+def test_expired_entry_is_dropped(tmp_path, monkeypatch):
+    cache = ScrapeCache(str(tmp_path), ttl=10)
+    cache.set("https://a.com/", None, DOC)
+    now = scrape_cache.time.time()
+    monkeypatch.setattr(scrape_cache.time, "time", lambda: now + 11)
+    assert cache.get("https://a.com/") is None
+    assert cache.stats()["entries"] == 0
+    assert not os.path.exists(cache._path(cache.make_key("https://a.com/")))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ScrapeCache(str(tmp_path))
+    cache.set("https://a.com/1", None, DOC)
+    size = cache.stats()["bytes"]
+    # 条目大小随写入时间戳的位数略有出入, 容量取两条半
+    cache.max_bytes = size * 5 // 2
+    cache.set("https://a.com/2", None, DOC)
+    cache._index[cache.make_key("https://a.com/1")][0] += 100
+    cache.set("https://a.com/3", None, DOC)
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("https://a.com/2") is None
+    assert cache.get("https://a.com/1") == DOC
+    assert cache.get("https://a.com/3") == DOC
+
+
+def test_async_variants_and_clear(tmp_path):
+    cache = ScrapeCache(str(tmp_path))
+
+    async def main():
+        await cache.set_async("https://a.com/", None, DOC)
+        return await cache.get_async("https://a.com/"), await cache.get_async("https://b.com/")
+
+    assert asyncio.run(main()) == (DOC, None)
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.get("https://a.com/") is None
@@ -0,0 +1,70 @@
+import itertools
+import random
+import re
+import time
+
+import pytest
+
+from url_canon import CanonRules, canonicalize, canonicalize_many, dedup_urls
+
+ALL_RULES = [CanonRules(*flags) for flags in itertools.product([False, True], repeat=7)]
+PIECES = [
+    "http", "https", "HTTPS", "://", "a.com", "A.com", "www.a.com", ":443", ":80", ":8080", "u@",
+    "/", "/x", "/x/", "?", "q=1", "utm_source=1", "&", "&&", "#f", "#f/", " ", "\t", "é", "fbclid",
+]
+
+
+def test_canonicalize_rewrites_authority_query_and_slash():
+    url = " HTTP://WWW.Example.COM:80/a/b/?utm_source=x&id=1&fbclid=2#top "
+    assert canonicalize(url) == "https://www.example.com/a/b?id=1"
+    assert canonicalize("https://example.com") == "https://example.com/"
+    assert canonicalize("https://example.com/?utm_medium=x") == "https://example.com/"
+    # 路径和查询参数值里的 ://Host 不改写
+    assert canonicalize("https://a.com/r?next=https://B.com/X") == "https://a.com/r?next=https://B.com/X"
+    assert canonicalize("https://User@A.com/x") == "https://User@a.com/x"
+    assert canonicalize("?://A.com") == "?://a.com/"
+
+
+def test_custom_rules():
+    rules = CanonRules(force_https=False, strip_www=True, strip_trailing_slash=False,
+                       drop_fragment=False, sort_query=True)
+    assert canonicalize("http://www.a.com/x/?b=2&a=1#f", rules) == "http://a.com/x/?a=1&b=2#f"
+
+
+@pytest.mark.parametrize("rules", ALL_RULES)
+def test_fast_path_matches_full_rewrite(rules):
+    """整体正则判为规范形式的URL, 完整改写后必须不变"""
+    rng = random.Random(0)
+    urls = ["".join(rng.choice(PIECES) for _ in range(rng.randint(0, 8))) for _ in range(1000)]
+    urls += ["https://a.com/" + "".join(rng.choice(PIECES[11:]) for _ in range(rng.randint(0, 5)))
+             for _ in range(2000)]
+    fast = canonicalize_many(urls, rules)
+    clean_re, rules._clean_re = rules._clean_re, re.compile("(?!)")
+    try:
+        slow = canonicalize_many(urls, rules)
+    finally:
+        rules._clean_re = clean_re
+    assert fast == slow
+
+
+def test_dedup_keeps_first_original():
+    urls = ["https://a.com/x/", "", "HTTPS://A.com/x", " https://a.com/y ", "https://a.com/x#f"]
+    unique, stats = dedup_urls(urls)
+    assert unique == ["https://a.com/x/", "https://a.com/y"]
+    assert stats == {"input": 4, "unique": 2, "duplicates": 2, "bloom": False}
+    assert dedup_urls(urls, use_bloom=True)[0] == unique
+
+
+def test_dedup_500k_urls_within_budget():
+    """50 万条站点地图式URL(约一成需要改写)去重应在 1 秒内完成"""
+    urls = [
+        f"http://WWW.Example.com/p/{i}/?utm_source=x" if i % 10 == 0 else f"https://www.example.com/blog/{i}"
+        for i in range(500_000)
+    ]
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        unique, _ = dedup_urls(urls)
+        best = min(best, time.perf_counter() - start)
+    assert len(unique) == 500_000
+    assert best < 1.0, f"dedup_urls took {best:.2f}s for 500k URLs"
@@ -0,0 +1,208 @@
+import re
+import math
+import hashlib
+from collections import deque
+from itertools import filterfalse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 默认去除的跟踪参数
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_hsenc", "_hsmi", "spm"})
+# 超过该数量时默认改用布隆过滤器去重
+BLOOM_THRESHOLD = 5_000_000
+
+# authority 的结束字符, 片段已先行分出
+_AUTHORITY_END_RE = re.compile(r"[/?]")
+
+
+class CanonRules:
+    """URL 规范化规则"""
+
+    def __init__(self, force_https: bool = True, lowercase_host: bool = True,
+                 strip_www: bool = False, strip_trailing_slash: bool = True,
+                 drop_fragment: bool = True, strip_tracking: bool = True,
+                 sort_query: bool = False,
+                 tracking_prefixes: Tuple[str, ...] = TRACKING_PREFIXES,
+                 tracking_params: Iterable[str] = TRACKING_PARAMS):
+        self.force_https = force_https
+        self.lowercase_host = lowercase_host
+        self.strip_www = strip_www
+        self.strip_trailing_slash = strip_trailing_slash
+        self.drop_fragment = drop_fragment
+        self.strip_tracking = strip_tracking
+        self.sort_query = sort_query
+        self.tracking_prefixes = tuple(tracking_prefixes)
+        self.tracking_params = frozenset(tracking_params)
+        self._markers = self.tracking_prefixes + tuple(f"{p}=" for p in self.tracking_params)
+        self._marker_re = re.compile("|".join(map(re.escape, self._markers)) or "(?!)")
+        # 整个参数(名或 名=值)是否为跟踪参数
+        names = [re.escape(p) + "[^=]*" for p in self.tracking_prefixes]
+        names += map(re.escape, self.tracking_params)
+        self._tracking_re = re.compile(r"(?:{})(?:=.*)?".format("|".join(names) or "(?!)"), re.S)
+        self._clean_re = _clean_pattern(self)
+
+
+def _clean_pattern(rules: "CanonRules") -> "re.Pattern":
+    """匹配按规则已是规范形式的URL, 这类URL无需逐条解析
+
+    只认最常见的写法: 小写协议、无 userinfo 和端口、有路径、不含跟踪参数;
+    其余URL一律走完整改写, 判定宁严勿宽。
+    """
+    scheme = "https" if rules.force_https else "https?"
+    host = r"[a-z0-9.-]+" if rules.lowercase_host else r"[^\s/?#@:]+"
+    if rules.strip_www:
+        host = r"(?!www\.)" + host
+    # 改写只去首尾空白和换行, 中间的空白不影响结果
+    path = r"/(?:[^?#\n]*(?<!/))?" if rules.strip_trailing_slash else r"/[^?#\n]*"
+    query = ""
+    if not rules.sort_query:
+        tracking = ""
+        if rules.strip_tracking:
+            tracking = rf"(?![^#\n]*?(?:{rules._marker_re.pattern}))"
+        query = rf"(?:\?{tracking}[^#\n]+)?"
+    fragment = "" if rules.drop_fragment else r"(?:#[^\n]*)?"
+    return re.compile(rf"{scheme}://{host}{path}{query}{fragment}(?<!\s)")
+
+
+DEFAULT_RULES = CanonRules()
+
+
+def canonicalize_many(urls: Iterable[str], rules: CanonRules = DEFAULT_RULES) -> List[str]:
+    """按规则批量规范化URL, 返回与输入一一对应的列表
+
+    只改写协议和 authority(主机转小写、去默认端口、升级 https、去 www),
+    userinfo 以及路径和查询参数值中出现的 ://Host 形式保持原样。已是规范
+    形式的URL只经一次正则整体匹配即原样返回, 不逐段解析; 其余URL逐条改写,
+    同一 authority 的改写结果会被缓存。
+    首尾空白会被去掉, 无法识别协议的输入只按片段、查询串和末尾斜杠规则处理。
+    """
+    authorities: Dict[str, str] = {}
+    drop_fragment = rules.drop_fragment
+    strip_slash = rules.strip_trailing_slash
+
+    def canonical(url: str) -> str:
+        url = url.strip()
+        if "\n" in url:
+            url = url.replace("\n", "")
+        fragment = ""
+        if "#" in url:
+            k = url.index("#")
+            url, fragment = url[:k], ("" if drop_fragment else url[k:])
+        i = url.find("://")
+        if i < 0:
+            head, rest = "", url
+        else:
+            j = url.find("/", i + 3)
+            authority = url if j < 0 else url[:j]
+            if "?" in authority:
+                # 只在 "://" 之后找结束字符, 之前的 ? 不算
+                end = _AUTHORITY_END_RE.search(authority, i + 3)
+                if end:
+                    authority = url[:end.start()]
+            head = authorities.get(authority)
+            if head is None:
+                head = authorities[authority] = _rewrite_authority(authority, rules)
+            rest = url[len(authority):]
+        query = ""
+        if "?" in rest:
+            rest, _, query = rest.partition("?")
+            query = _rewrite_query(query, rules)
+        if strip_slash and rest[-1:] == "/":
+            rest = rest.rstrip("/")
+        # 去掉末尾斜杠或原本没有路径的URL补回根路径
+        if not rest and head and head[-1] != "/":
+            rest = "/"
+        return f"{head}{rest}?{query}{fragment}" if query else head + rest + fragment
+
+    clean = rules._clean_re.fullmatch
+    return [url if clean(url) else canonical(url) for url in urls]
+
+
+def _rewrite_authority(prefix: str, rules: CanonRules) -> str:
+    """改写 "协议://authority" 部分, userinfo 保持原样"""
+    scheme, _, authority = prefix.partition("://")
+    scheme = scheme.lower()
+    userinfo, at, host = authority.rpartition("@")
+    if rules.lowercase_host:
+        host = host.lower()
+    if scheme == "https" and host.endswith(":443"):
+        host = host[:-4]
+    elif scheme == "http" and host.endswith(":80"):
+        host = host[:-3]
+    if rules.force_https and scheme == "http":
+        scheme = "https"
+    if rules.strip_www and host.startswith("www."):
+        host = host[4:]
+    return f"{scheme}://{userinfo}{at}{host}"
+
+
+def _rewrite_query(query: str, rules: CanonRules) -> str:
+    """去除跟踪参数并按需排序, 返回空串时调用方连同问号一起去掉"""
+    if rules.strip_tracking and rules._marker_re.search(query):
+        query = "&".join(filterfalse(rules._tracking_re.fullmatch, filter(None, query.split("&"))))
+    if rules.sort_query:
+        query = "&".join(sorted(p for p in query.split("&") if p))
+    return query
+
+
+def canonicalize(url: str, rules: CanonRules = DEFAULT_RULES) -> str:
+    """按规则规范化单个URL"""
+    return canonicalize_many([url], rules)[0]
+
+
+class BloomFilter:
+    """用于超大URL列表的布隆过滤器, 内存固定, 存在极小的误判率"""
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / max(1, capacity) * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: str) -> bool:
+        """加入元素, 返回加入前是否可能已存在"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        present = True
+        for i in range(self.hashes):
+            bit = (h1 + i * h2) % self.size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+
+def dedup_urls(urls: Iterable[str], rules: CanonRules = DEFAULT_RULES,
+               use_bloom: Optional[bool] = None) -> Tuple[List[str], Dict]:
+    """按规范化形式去重URL, 跳过空行并保持首次出现的顺序
+
+    规范化形式只用作去重键, 返回的是每组中首次出现的原始URL(去掉首尾空白),
+    以免强制 https、去末尾斜杠等规则改变实际抓取的地址。
+    返回 (去重后的URL列表, 统计信息)。默认用集合精确去重;
+    use_bloom 为 None 时, 输入超过 BLOOM_THRESHOLD 条才改用布隆过滤器,
+    以少量误判换取固定内存, 但逐条哈希明显更慢。
+    """
+    if not isinstance(urls, list):
+        urls = list(urls)
+    if use_bloom is None:
+        use_bloom = len(urls) > BLOOM_THRESHOLD
+
+    canonical = canonicalize_many(urls, rules)
+    empty = canonical.count("")
+    if use_bloom:
+        seen = BloomFilter(len(canonical))
+        unique = [url.strip() for url, key in zip(urls, canonical) if key and not seen.add(key)]
+    else:
+        # setdefault 只保留每个键首次出现的原始URL, deque 在 C 层面耗尽迭代器
+        first: Dict[str, str] = {}
+        deque(map(first.setdefault, canonical, urls), maxlen=0)
+        first.pop("", None)
+        unique = [url.strip() for url in first.values()]
+
+    return unique, {
+        "input": len(urls) - empty,
+        "unique": len(unique),
+        "duplicates": len(urls) - empty - len(unique),
+        "bloom": use_bloom,
+    }
@@ -0,0 +1,145 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+import secrets
+from typing import Callable, Dict, List, Optional
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Firecrawl 回调时带上的校验头, 值为接收器的共享密钥
+TOKEN_HEADER = "X-Webhook-Token"
+# Firecrawl 以团队 webhook 密钥对请求体做的 HMAC-SHA256 签名
+SIGNATURE_HEADER = "X-Firecrawl-Signature"
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_EVENTS = ["started", "page", "completed", "failed"]
+# 单个回调请求体上限, page 事件携带整页内容
+MAX_BODY_BYTES = 32 * 1024 * 1024
+# 任务登记之前到达的事件最多保留的条数和时长(秒)
+EARLY_EVENT_LIMIT = 10000
+EARLY_EVENT_TTL = 300
+
+
+def parse_event(payload: Dict) -> Optional[Dict]:
+    """将回调请求体规范为 {"id", "event", "data", "error"}, 无法识别时返回 None
+
+    type 形如 crawl.page、batch_scrape.completed, 取最后一段作为事件名。
+    """
+    job_id = payload.get("id") or payload.get("jobId")
+    event = str(payload.get("type") or payload.get("event") or "").rsplit(".", 1)[-1]
+    if not job_id or event not in WEBHOOK_EVENTS:
+        return None
+    data = payload.get("data") or []
+    if isinstance(data, dict):
+        data = [data]
+    return {"id": job_id, "event": event, "data": data, "error": payload.get("error")}
+
+
+class WebhookReceiver:
+    """接收 Firecrawl 任务回调的内嵌 HTTP 服务
+
+    运行在任务管理器的事件循环中。提交任务时把 spec() 作为 webhook 选项
+    发给 Firecrawl, 回调须带上 TOKEN_HEADER 共享密钥; 配置了 signing_secret
+    时还须带有效的 HMAC 签名。校验通过的事件交给 on_event, 任务尚未登记时
+    先暂存, 登记后由 take_early 取回。
+    """
+
+    def __init__(self, public_url: str, host: str = "0.0.0.0", port: int = 8765,
+                 token: Optional[str] = None, signing_secret: Optional[str] = None):
+        self.public_url = public_url.rstrip("/")
+        if not self.public_url.endswith(WEBHOOK_PATH):
+            self.public_url += WEBHOOK_PATH
+        self.host = host
+        self.port = port
+        self.token = token or secrets.token_urlsafe(32)
+        self.signing_secret = signing_secret
+        self.on_event: Optional[Callable[[Dict], bool]] = None
+        self.stats = {"received": 0, "rejected": 0, "early": 0}
+        self._early: Dict[str, List[Dict]] = {}
+        self._early_count = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["WebhookReceiver"]:
+        """按环境变量创建接收器, 未配置 WEBHOOK_PUBLIC_URL 时返回 None"""
+        public_url = os.getenv("WEBHOOK_PUBLIC_URL")
+        if not public_url:
+            return None
+        return cls(
+            public_url,
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", 8765)),
+            token=os.getenv("WEBHOOK_TOKEN") or None,
+            signing_secret=os.getenv("FIRECRAWL_WEBHOOK_SECRET") or None,
+        )
+
+    def spec(self, metadata: Optional[Dict] = None) -> Dict:
+        """返回提交任务时使用的 webhook 选项"""
+        return {
+            "url": self.public_url,
+            "headers": {TOKEN_HEADER: self.token},
+            "metadata": metadata or {},
+            "events": WEBHOOK_EVENTS,
+        }
+
+    async def start(self):
+        app = web.Application(client_max_size=MAX_BODY_BYTES)
+        app.router.add_post(WEBHOOK_PATH, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"webhook 接收器已启动: {self.host}:{self.port}{WEBHOOK_PATH} -> {self.public_url}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def take_early(self, job_id: str) -> List[Dict]:
+        """取回任务登记前到达的事件"""
+        events = self._early.pop(job_id, [])
+        self._early_count -= len(events)
+        return events
+
+    def verify(self, headers, body: bytes) -> bool:
+        if not hmac.compare_digest(headers.get(TOKEN_HEADER, ""), self.token):
+            return False
+        if self.signing_secret:
+            expected = hmac.new(self.signing_secret.encode(), body, hashlib.sha256).hexdigest()
+            signature = headers.get(SIGNATURE_HEADER, "")
+            if signature.startswith("sha256="):
+                signature = signature[7:]
+            return hmac.compare_digest(signature, expected)
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if not self.verify(request.headers, body):
+            self.stats["rejected"] += 1
+            return web.Response(status=401)
+        try:
+            event = parse_event(json.loads(body))
+        except (ValueError, AttributeError):
+            event = None
+        if event is None:
+            self.stats["rejected"] += 1
+            return web.Response(status=400)
+        self.stats["received"] += 1
+        if not (self.on_event and self.on_event(event)):
+            self._keep_early(event)
+        return web.Response(status=200)
+
+    def _keep_early(self, event: Dict):
+        now = time.time()
+        event["received_at"] = now
+        # 丢弃过期的暂存事件; 丢失的页面会在任务完成时的核对中补齐
+        for job_id in [k for k, v in self._early.items() if now - v[-1]["received_at"] > EARLY_EVENT_TTL]:
+            self.take_early(job_id)
+        if self._early_count >= EARLY_EVENT_LIMIT:
+            return
+        self._early.setdefault(event["id"], []).append(event)
+        self._early_count += 1
+        self.stats["early"] += 1